@@ -1,20 +1,68 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, send_file
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from dash import Dash, dcc, html, Input, Output, dash_table, State
+from dash import Dash, dcc, html, Input, Output, dash_table, State, ClientsideFunction, no_update, callback_context
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
 import plotly.express as px
-import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import hmac
 import json
-from models import db, User, PageView, ActivityLog, get_thailand_time
+from urllib.parse import urlencode
+from models import db, User, PageView, ActivityLog, get_thailand_time, get_user_login_stats
+from sqlalchemy.orm import joinedload
+from config import get_config
+from dataset import get_dataset
+from client_data import client_mode_enabled, client_payload, store_covers
+from filter_engine import FilterSequence, FilteredRowCache, sorted_positions, filter_state_from_args, filter_state_id, filter_state_to_args, normalize_filter_state, query_etag
+from batch_logger import BatchLogWriter
+from page_views import COUNT_ATTEMPTS, PageViewCounter
+from schema_upgrade import ensure_log_partitions
+from dataset_files import ARROW_AVAILABLE, FORMATS, DatasetFiles
+from vector_tiles import MAX_ZOOM, MVT_MIMETYPE, LAYER_NAME, TileCache, TilePrewarmer
+from log_retention import ARCHIVE_AVAILABLE, query_archive, retention_cutoff, run_retention
+from background import PeriodicTask
+from db_pool import engine_options, instrument_engine, check_liveness, pool_status
+from user_cache import CachedUser, UserCache
+from passwords import PasswordPool, PasswordPoolBusy
+from rate_limit import FailedLoginAggregator, LoginThrottle, create_store
+from request_routing import RequestClassifier, make_dashboard_guard
+from instrumentation import Instrumentation, LatencyStats, phase
+from query_profiler import QueryProfiler, query_budget
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsExporter, MetricsSnapshot, process_rss_bytes
+from jobs import DONE, FINISHED, JobRunner, JobStore, public_job
+from job_tasks import JOB_TASKS
+from exporter import iter_csv, iter_xlsx, CSV_MIMETYPE, XLSX_MIMETYPE, XLSX_AVAILABLE, EXPORT_COLUMNS
 import pytz
 
+app_config = get_config()
+
 # Flask server setup
 server = Flask(__name__)
+if app_config.TRUSTED_PROXY_COUNT:
+    # remote_addr / scheme from the X-Forwarded-* hops our own proxies added
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=app_config.TRUSTED_PROXY_COUNT,
+                               x_proto=app_config.TRUSTED_PROXY_COUNT)
 server.secret_key = os.environ.get("SECRET_KEY", "your_secret_key_change_in_production")
 
+# Per-phase timings (Server-Timing header) and rolling p50/p95/p99 per Dash
+# callback and route; registered first so the other hooks are included
+latency_stats = LatencyStats(window=app_config.LATENCY_WINDOW)
+instrumentation = Instrumentation(server, latency_stats, server_timing=app_config.SERVER_TIMING_ENABLED)
+
+# Statements per request, repeated statements (N+1) and query budgets;
+# QUERY_BUDGET_STRICT turns an exceeded budget into an error (for tests)
+query_profiler = QueryProfiler(
+    slow_ms=app_config.QUERY_SLOW_MS,
+    slow_log_path=app_config.QUERY_SLOW_LOG or None,
+    strict=app_config.QUERY_BUDGET_STRICT,
+    default_budget=app_config.QUERY_BUDGET_DEFAULT or None,
+    duplicate_threshold=app_config.QUERY_DUPLICATE_THRESHOLD,
+)
+if app_config.QUERY_PROFILER_ENABLED:
+    query_profiler.init_app(server)
+
 # Jinja2 filter for timezone conversion
 @server.template_filter('to_thailand_time')
 def to_thailand_time(dt):
@@ -42,104 +90,153 @@ else:
     server.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
 
 server.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-server.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
-}
+# Pool sized from the gunicorn thread count (see db_pool.py)
+server.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app_config, server.config["SQLALCHEMY_DATABASE_URI"])
 
 # Initialize database
 db.init_app(server)
+with server.app_context():
+    instrument_engine(db.engine)
+    instrumentation.instrument_engine(db.engine)
+    if app_config.QUERY_PROFILER_ENABLED:
+        query_profiler.instrument(db.engine)
+
+# Without pre_ping, dead connections are detected by a background check
+def check_db_liveness():
+    with server.app_context():
+        check_liveness(db.engine)
+
+liveness_task = PeriodicTask('db-liveness', app_config.DB_POOL_LIVENESS_INTERVAL, check_db_liveness)
 
 # Flask-Login setup
 login_manager = LoginManager()
 login_manager.init_app(server)
 login_manager.login_view = "/login"
 
+def _load_user_record(user_id):
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    return CachedUser(user.id, user.username, user.role)
+
+# Every authenticated request (each Dash callback too) loads the user: cache it
+user_cache = UserCache(_load_user_record, ttl=app_config.USER_CACHE_TTL,
+                       shared_dir=app_config.SHARED_STATE_DIR)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(user_id)
+
+# Password hashing runs in worker processes so login bursts don't hold the GIL
+# (inline under `python app_sales_v2.py`: spawned workers would re-run this script)
+password_pool = PasswordPool(workers=app_config.PASSWORD_POOL_WORKERS,
+                             max_pending=app_config.PASSWORD_POOL_MAX_PENDING,
+                             timeout=app_config.PASSWORD_POOL_TIMEOUT,
+                             inline=__name__ == '__main__')
+
+def login_busy_response(template):
+    """Fast 503 while the password pool is saturated"""
+    return render_template(template, error="ระบบกำลังมีผู้เข้าใช้งานจำนวนมาก กรุณาลองใหม่อีกครั้งในไม่กี่วินาที"), \
+        503, {'Retry-After': '5'}
+
+# Activity logs are queued and bulk-inserted by a background thread
+activity_writer = BatchLogWriter(
+    'activity-log-writer', db, ActivityLog,
+    batch_size=app_config.LOG_BATCH_SIZE,
+    flush_interval_ms=app_config.LOG_FLUSH_INTERVAL_MS,
+    max_queue=app_config.LOG_QUEUE_SIZE,
+    enqueue_timeout_ms=app_config.LOG_ENQUEUE_TIMEOUT_MS,
+    app=server
+)
 
 # Helper functions
 def log_activity(user_id, action, details=None):
-    """Log user activity to database"""
-    try:
-        activity = ActivityLog(
-            user_id=user_id,
-            action=action,
-            details=json.dumps(details) if details else None,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity)
-        db.session.commit()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
-        db.session.rollback()
+    """Queue user activity for the background log writer"""
+    user_agent = request.headers.get('User-Agent')
+    activity_writer.enqueue({
+        'user_id': user_id,
+        'action': action,
+        'details': json.dumps(details) if details else None,
+        'ip_address': request.remote_addr,
+        'user_agent': user_agent[:255] if user_agent else None,
+        'timestamp': get_thailand_time()
+    })
+
+# Login attempts are throttled per IP / username before any DB or hash work
+login_throttle = LoginThrottle(
+    create_store(app_config.LOGIN_RATE_BACKEND, app_config.SHARED_STATE_DIR),
+    ip_burst=app_config.LOGIN_RATE_IP_BURST,
+    ip_per_minute=app_config.LOGIN_RATE_IP_PER_MINUTE,
+    user_burst=app_config.LOGIN_RATE_USER_BURST,
+    user_per_minute=app_config.LOGIN_RATE_USER_PER_MINUTE
+)
+
+def client_ip():
+    """
+    Client address for the per-IP login bucket
+
+    X-Forwarded-For is only honoured through ProxyFix (TRUSTED_PROXY_COUNT),
+    so a client reaching the app directly cannot pick a new IP per attempt.
+    """
+    return request.remote_addr
+
+# Failed logins are aggregated into one activity row per interval
+failed_logins = FailedLoginAggregator()
+
+def write_failed_login_summary():
+    login_throttle.prune()
+    summary = failed_logins.drain()
+    if summary is None:
+        return
+    summary['window_start'] = datetime.fromtimestamp(summary['window_start'], pytz.timezone('Asia/Bangkok')).isoformat()
+    summary['window_end'] = datetime.fromtimestamp(summary['window_end'], pytz.timezone('Asia/Bangkok')).isoformat()
+    activity_writer.enqueue({
+        'user_id': None,
+        'action': 'failed_login_summary',
+        'details': json.dumps(summary),
+        'ip_address': None,
+        'user_agent': None,
+        'timestamp': get_thailand_time()
+    })
+
+failed_login_task = PeriodicTask('failed-login-summary', app_config.FAILED_LOGIN_SUMMARY_INTERVAL,
+                                 write_failed_login_summary)
+
+# Page views are counted in memory and flushed with an atomic upsert
+page_view_counter = PageViewCounter(db, PageView, app=server,
+                                    flush_interval=app_config.PAGE_VIEW_FLUSH_INTERVAL)
 
 def increment_page_view(page_path):
     """Increment page view counter"""
-    try:
-        page_view = PageView.query.filter_by(page_path=page_path).first()
-        if page_view:
-            page_view.view_count += 1
-            page_view.last_viewed = get_thailand_time()
-        else:
-            page_view = PageView(page_path=page_path, view_count=1)
-            db.session.add(page_view)
+    page_view_counter.increment(page_path)
+
+# Monthly log partitions are created ahead of time (no-op unless partitioned)
+def maintain_log_partitions():
+    with server.app_context():
+        ensure_log_partitions(db)
         db.session.commit()
-    except Exception as e:
-        print(f"Error incrementing page view: {e}")
-        db.session.rollback()
 
-# Load Dataset - Use relative path that works on both Windows and Linux
-data_path = os.path.join(os.path.dirname(__file__), 'Prepared_True_Dataset_Updated.csv')
-data = pd.read_csv(data_path)
+partition_task = PeriodicTask('log-partition-maintenance', 24 * 3600, maintain_log_partitions)
 
-# Data Preprocessing
-if '%Port_Utilize' not in data.columns:
-    data['%Port_Utilize'] = 0.0
-else:
-    data['%Port_Utilize'] = data['%Port_Utilize'].replace(['-', ' -   ', ' '], np.nan)
-    data['%Port_Utilize'] = data['%Port_Utilize'].apply(
-        lambda x: str(x).rstrip('%') if isinstance(x, str) else x
-    ).apply(pd.to_numeric, errors='coerce')
-    data['%Port_Utilize'] = data['%Port_Utilize'].fillna(0)
-
-market_share_cols = ['Market Share True (%)', 'Market Share AIS (%)', 'Market Share 3BB (%)', 'Market Share NT (%)']
-for col in market_share_cols:
-    data[col] = pd.to_numeric(data[col], errors='coerce').fillna(0)
-
-data['L2 Inservice date'] = pd.to_datetime(data['L2 Inservice date'], errors='coerce')
-current_date = datetime.now()
-data['L2_Aging_Months'] = data['L2 Inservice date'].apply(
-    lambda x: (current_date.year - x.year) * 12 + (current_date.month - x.month) if pd.notnull(x) else None
-)
+# Old log rows are archived to Parquet once a day (opt-in, one worker at a time)
+def archive_old_logs():
+    with server.app_context():
+        run_retention(db.engine)
 
-data['Port Use'] = data['Port Use'].apply(lambda x: max(x, 0) if pd.notnull(x) else 0)
-data['Potential Score'] = data['Potential Score'].apply(lambda x: max(x, 0) if pd.notnull(x) else 0)
+retention_task = PeriodicTask('log-retention', 24 * 3600, archive_old_logs)
 
-# Calculate Household Density
-data['Household Density'] = data['Household'] / 0.25
-data['Installation Density'] = data['Install'] / data['Install'].sum()
+# Load Dataset (preprocessed once per process, see dataset.py)
+dataset = get_dataset()
+data = dataset.data
 
-# Normalize factors
-data['Normalized Household Density'] = (data['Household Density'] - data['Household Density'].min()) / (data['Household Density'].max() - data['Household Density'].min())
-data['Normalized Installation Density'] = (data['Installation Density'] - data['Installation Density'].min()) / (data['Installation Density'].max() - data['Installation Density'].min())
-data['Normalized Net Add'] = (data['Net Add'] - data['Net Add'].min()) / (data['Net Add'].max() - data['Net Add'].min())
-data['Normalized Market Share'] = (data['Market Share True (%)'] - data['Market Share True (%)'].min()) / (data['Market Share True (%)'].max() - data['Market Share True (%)'].min())
-data['Normalized True Speed'] = (data['True Speed'] - data['True Speed'].min()) / (data['True Speed'].max() - data['True Speed'].min())
+# Client-side filtering mode (opt-in; selections above CLIENTSIDE_MAX_ROWS use the server)
+CLIENTSIDE_MODE = client_mode_enabled(app_config)
 
-# Recalculate Potential Score
-data['Potential Score'] = (
-    0.4 * data['Normalized Household Density'] +
-    0.25 * data['Normalized Installation Density'] +
-    0.2 * data['Normalized Net Add'] +
-    0.05 * data['Normalized Market Share'] +
-    0.1 * data['Normalized True Speed']
-) * 100
+# Latest filter-state sequence per browser session (stale request dropping)
+filter_sequence = FilterSequence()
 
-# Adjust Potential Score to increment by 5%
-data['Potential Score'] = (data['Potential Score'] / 5).apply(np.ceil) * 5
+# Filtered row-sets shared by the map, table and header callbacks
+filtered_cache = FilteredRowCache(maxsize=app_config.FILTER_CACHE_SIZE, max_rows=app_config.FILTER_CACHE_MAX_ROWS)
 
 # Create Dash App with Bootstrap theme
 app = Dash(
@@ -153,8 +250,24 @@ app = Dash(
 )
 app.title = "TOL Sales Journey - Mobile Ready"
 
+# Every server-side callback is timed (counts + latency, see /admin/stats)
+instrumentation.instrument_dash(app)
+
+# Dashboard callbacks read the in-memory dataset; at most the user is loaded
+for callback_name in ('update_map', 'update_table', 'update_header', 'update_location_options',
+                      'update_district_options', 'update_subdistrict_options', 'update_happyblock_options'):
+    query_profiler.set_budget(f'callback:{callback_name}', 1)
+
 # Responsive Layout with DBC
 app.layout = dbc.Container([
+    dcc.Location(id='url', refresh=False),
+    # Columnar dataset for client-side filtering (filled once per session + dataset version)
+    dcc.Store(id='client-dataset', storage_type='session'),
+    # Consolidated filter state (single input of the map/table callback)
+    dcc.Store(id='filter-state'),
+    # Client-side mode: filter states too large for the browser, handled by the server callbacks
+    dcc.Store(id='server-filter-state'),
+
     # Navbar
     dbc.Navbar(
         dbc.Container([
@@ -325,8 +438,29 @@ app.layout = dbc.Container([
 
             # Table Card
             dbc.Card([
-                dbc.CardHeader("📋 Target Locations", className="fw-bold"),
+                dbc.CardHeader([
+                    html.Span("📋 Target Locations", className="fw-bold"),
+                    html.Span([
+                        html.A("⬇️ CSV", id='export-csv-link', href="/dashboard/export?format=csv",
+                               className="btn btn-outline-primary btn-sm me-1"),
+                        html.A("⬇️ Excel", id='export-xlsx-link', href="/dashboard/export?format=xlsx",
+                               className="btn btn-outline-success btn-sm me-1"),
+                        dbc.Button("⏳ Excel (background)", id='export-job-button',
+                                   color="secondary", outline=True, size="sm"),
+                    ], className="float-end")
+                ]),
                 dbc.CardBody([
+                    # Background export job: id of the submitted job, polled until it finishes
+                    dcc.Store(id='export-job'),
+                    dcc.Interval(id='export-job-poll', interval=1000, disabled=True),
+                    html.Div([
+                        dbc.Progress(id='export-job-progress', value=0, striped=True, animated=True,
+                                     className="mb-1"),
+                        html.Small(id='export-job-status', className="text-muted me-2"),
+                        html.A("⬇️ Download", id='export-job-download', href="#",
+                               className="btn btn-success btn-sm me-1", style={'display': 'none'}),
+                        dbc.Button("✖ Cancel", id='export-job-cancel', color="link", size="sm"),
+                    ], id='export-job-panel', className="mb-2", style={'display': 'none'}),
                     dash_table.DataTable(
                         id='location-table',
                         columns=[
@@ -400,20 +534,12 @@ def toggle_advanced_collapse(n, is_open):
         return not is_open
     return is_open
 
-@app.callback(
-    Output('district-filter', 'options'),
-    Input('province-filter', 'value')
-)
 def update_district_options(selected_province):
     if selected_province:
         filtered = data[data['Province'] == selected_province]
         return [{'label': dist, 'value': dist} for dist in filtered['District'].unique()]
     return []
 
-@app.callback(
-    Output('subdistrict-filter', 'options'),
-    [Input('province-filter', 'value'), Input('district-filter', 'value')]
-)
 def update_subdistrict_options(selected_province, selected_district):
     filtered = data.copy()
     if selected_province:
@@ -426,10 +552,6 @@ def update_subdistrict_options(selected_province, selected_district):
         if subdist is not None and isinstance(subdist, str) and subdist.strip() != ""
     ]
 
-@app.callback(
-    Output('happyblock-filter', 'options'),
-    [Input('province-filter', 'value'), Input('district-filter', 'value'), Input('subdistrict-filter', 'value')]
-)
 def update_happyblock_options(selected_province, selected_district, selected_subdistrict):
     filtered = data.copy()
     if selected_province:
@@ -441,10 +563,62 @@ def update_happyblock_options(selected_province, selected_district, selected_sub
     return [{'label': hb, 'value': hb} for hb in filtered['Happy Block'].unique()]
 
 @app.callback(
-    [Output('map', 'figure'),
-     Output('potential-score-slider', 'value'),
-     Output('location-table', 'data'),
-     Output('map-header', 'children')],
+    [Output('district-filter', 'options'),
+     Output('subdistrict-filter', 'options'),
+     Output('happyblock-filter', 'options'),
+     Output('district-filter', 'value'),
+     Output('subdistrict-filter', 'value'),
+     Output('happyblock-filter', 'value')],
+    [Input('province-filter', 'value'),
+     Input('district-filter', 'value'),
+     Input('subdistrict-filter', 'value')]
+)
+def update_location_options(province, district, subdistrict):
+    """
+    Cascade Province -> District -> Sub-district -> Happy Block in one callback
+
+    Child values are cleared in the same response as their new options, so
+    the filter-state store sees a single, final change per gesture.
+    """
+    triggered = callback_context.triggered_id
+
+    if triggered == 'province-filter':
+        return (update_district_options(province),
+                update_subdistrict_options(province, None),
+                update_happyblock_options(province, None, None),
+                None, None, None)
+    if triggered == 'district-filter':
+        return (no_update,
+                update_subdistrict_options(province, district),
+                update_happyblock_options(province, district, None),
+                no_update, None, None)
+    if triggered == 'subdistrict-filter':
+        return (no_update, no_update,
+                update_happyblock_options(province, district, subdistrict),
+                no_update, no_update, None)
+
+    # Initial load
+    return (update_district_options(province),
+            update_subdistrict_options(province, district),
+            update_happyblock_options(province, district, subdistrict),
+            no_update, no_update, no_update)
+
+# Quick Filter buttons only move the Potential Score slider (no server round-trip)
+app.clientside_callback(
+    ClientsideFunction(namespace='tolClient', function_name='quickFilter'),
+    Output('potential-score-slider', 'value'),
+    [Input('quick-high-potential', 'n_clicks'),
+     Input('quick-show-all', 'n_clicks')],
+    [State('potential-score-slider', 'min'),
+     State('potential-score-slider', 'max')],
+    prevent_initial_call=True
+)
+
+# All filter controls are consolidated into one store; unchanged states are
+# not re-emitted and every new state gets a per-session sequence number
+app.clientside_callback(
+    ClientsideFunction(namespace='tolClient', function_name='syncFilterState'),
+    Output('filter-state', 'data'),
     [Input('province-filter', 'value'),
      Input('district-filter', 'value'),
      Input('subdistrict-filter', 'value'),
@@ -453,60 +627,77 @@ def update_happyblock_options(selected_province, selected_district, selected_sub
      Input('potential-score-slider', 'value'),
      Input('port-utilization-slider', 'value'),
      Input('market-share-true-slider', 'value'),
-     Input('l2-aging-slider', 'value'),
-     Input('quick-high-potential', 'n_clicks'),
-     Input('quick-show-all', 'n_clicks')]
+     Input('l2-aging-slider', 'value')],
+    State('filter-state', 'data')
 )
-def update_map(province, district, subdistrict, happy_block, net_add_range, potential_score_range, port_util_range, market_share_true_range, l2_aging_range, high_potential_clicks, show_all_clicks):
-    from dash import callback_context
-    ctx = callback_context
-
-    # Handle Quick Filter buttons
-    if ctx.triggered:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        if button_id == 'quick-high-potential':
-            potential_score_range = [70, 100]
-        elif button_id == 'quick-show-all':
-            potential_score_range = [int(data['Potential Score'].min()), int(data['Potential Score'].max())]
 
-    filtered = data.copy()
+# Export links follow the current filter state
+app.clientside_callback(
+    ClientsideFunction(namespace='tolClient', function_name='exportLinks'),
+    [Output('export-csv-link', 'href'),
+     Output('export-xlsx-link', 'href')],
+    Input('filter-state', 'data')
+)
 
-    if province:
-        filtered = filtered[filtered['Province'] == province]
-    if district:
-        filtered = filtered[filtered['District'] == district]
-    if subdistrict:
-        filtered = filtered[filtered['Sub-district'] == subdistrict]
-    if happy_block:
-        filtered = filtered[filtered['Happy Block'] == happy_block]
-
-    filtered = filtered[
-        (filtered['Net Add'] >= net_add_range[0]) &
-        (filtered['Net Add'] <= net_add_range[1]) &
-        (filtered['Potential Score'] >= potential_score_range[0]) &
-        (filtered['Potential Score'] <= potential_score_range[1]) &
-        (filtered['%Port_Utilize'] >= port_util_range[0]) &
-        (filtered['%Port_Utilize'] <= port_util_range[1]) &
-        (filtered['Market Share True (%)'] >= market_share_true_range[0]) &
-        (filtered['Market Share True (%)'] <= market_share_true_range[1]) &
-        (filtered['L2_Aging_Months'] >= l2_aging_range[0]) &
-        (filtered['L2_Aging_Months'] <= l2_aging_range[1])
-    ]
+MAP_OUTPUTS = [
+    Output('map', 'figure'),
+    Output('location-table', 'data'),
+    Output('map-header', 'children'),
+]
+
+def filtered_targets(filter_state):
+    """
+    Shared filtered row-set for the map, table and header callbacks
+
+    Computed once per filter state (FilteredRowCache); requests superseded
+    by a newer gesture from the same browser are dropped.
+    """
+    if not filter_state:
+        raise PreventUpdate
+    if not filter_sequence.register(filter_state):
+        raise PreventUpdate
+
+    with phase('filter'):
+        filtered = filtered_cache.get(data, dataset.version, filter_state)
+    if filter_sequence.is_stale(filter_state):
+        raise PreventUpdate
+    return filtered
+
+def update_map(filter_state):
+    filtered = filtered_targets(filter_state)
 
     if filtered.empty:
-        empty_fig = {
+        return {
             "data": [],
             "layout": {
                 "title": "No data available",
                 "mapbox": {"style": "open-street-map", "center": {"lat": 8.5, "lon": 100}, "zoom": 6},
             },
         }
-        return empty_fig, potential_score_range, [], "📍 No locations found"
 
+    with phase('figure'):
+        return build_map_figure(filtered, filter_state)
+
+def public_url(path):
+    """Absolute URL of path as the browser sees it (ProxyFix sets the scheme behind TLS proxies)"""
+    return f"{request.scheme}://{request.host}{path}"
+
+def build_map_figure(filtered, filter_state=None):
+    """
+    Scatter mapbox figure of a non-empty filtered row-set
+
+    Above MAP_INLINE_MAX_POINTS rows the remaining points come from vector
+    tiles of the same filter state (its arguments are in the tile URL).
+    """
     # Calculate center
     center_lat = filtered['Latitude'].mean()
     center_lon = filtered['Longitude'].mean()
 
+    # National-scale results: inline only the best points, the rest come from vector tiles
+    use_tiles = app_config.MAP_VECTOR_TILES and len(filtered) > app_config.MAP_INLINE_MAX_POINTS
+    if use_tiles:
+        filtered = filtered.head(app_config.MAP_INLINE_MAX_POINTS)
+
     fig = px.scatter_mapbox(
         filtered,
         lat="Latitude",
@@ -547,19 +738,194 @@ def update_map(province, district, subdistrict, happy_block, net_add_range, pote
         )
     )
 
-    # Prepare table data
-    table_data = filtered.sort_values('Potential Score', ascending=False).copy()
-    table_data['Navigate'] = table_data.apply(
-        lambda row: f"[🗺️]( https://www.google.com/maps/dir/?api=1&destination={row['Latitude']},{row['Longitude']})",
-        axis=1
+    if use_tiles:
+        fig.update_layout(mapbox_layers=[{
+            "sourcetype": "vector",
+            "source": [public_url("/tiles/{z}/{x}/{y}.mvt")
+                       + ("?" + urlencode(filter_state_to_args(filter_state)) if filter_state else "")],
+            "sourcelayer": LAYER_NAME,
+            "type": "circle",
+            "color": "#78c679",
+            "opacity": 0.6,
+            "circle": {"radius": 2},
+            "below": "traces",
+        }])
+
+    return fig
+
+TABLE_COLUMNS = ['Potential Score', 'Sub-district', 'Happy Block', 'Port Use', 'Port Available', 'Navigate']
+
+def update_table(filter_state):
+    filtered = filtered_targets(filter_state)
+
+    with phase('table'):
+        # Rows are already sorted by Potential Score (high -> low)
+        table_data = filtered[TABLE_COLUMNS[:-1]].copy()
+        table_data['Navigate'] = [
+            f"[🗺️]( https://www.google.com/maps/dir/?api=1&destination={lat},{lon})"
+            for lat, lon in zip(filtered['Latitude'], filtered['Longitude'])
+        ]
+        return table_data.to_dict('records')
+
+def update_header(filter_state):
+    filtered = filtered_targets(filter_state)
+
+    if filtered.empty:
+        return "📍 No locations found"
+    return f"📍 {len(filtered)} locations | Avg Score: {filtered['Potential Score'].mean():.1f}"
+
+def load_client_dataset(filter_state, stored):
+    """
+    Send the columnar rows of the selection once per session, dataset version
+    and scope (whole dataset or province); too-large selections get a marker
+    """
+    if store_covers(stored, dataset.version, filter_state):
+        return no_update
+    return client_payload(data, dataset.version, filter_state, app_config.CLIENTSIDE_MAX_ROWS)
+
+if CLIENTSIDE_MODE:
+    # Filtering runs in the browser when the shipped rows cover the selection
+    app.callback(
+        Output('client-dataset', 'data'),
+        Input('filter-state', 'data'),
+        State('client-dataset', 'data')
+    )(load_client_dataset)
+    app.clientside_callback(
+        ClientsideFunction(namespace='tolClient', function_name='filterTargets'),
+        MAP_OUTPUTS + [Output('server-filter-state', 'data')],
+        [Input('filter-state', 'data'),
+         Input('client-dataset', 'data')]
     )
+    # ...and on the server for the selections it hands over
+    for output, func in zip(MAP_OUTPUTS, (update_map, update_table, update_header)):
+        app.callback(Output(output.component_id, output.component_property, allow_duplicate=True),
+                     Input('server-filter-state', 'data'), prevent_initial_call=True)(func)
+else:
+    # Independent callbacks so Dash can run them concurrently on the worker threads
+    app.callback(Output('map', 'figure'), Input('filter-state', 'data'))(update_map)
+    app.callback(Output('location-table', 'data'), Input('filter-state', 'data'))(update_table)
+    app.callback(Output('map-header', 'children'), Input('filter-state', 'data'))(update_header)
+
+# Background jobs (long exports / reports): shared SQLite job table, low-priority process pool
+job_store = JobStore(os.path.join(app_config.SHARED_STATE_DIR, 'jobs.sqlite3'))
+with server.app_context():
+    _job_database_url = db.engine.url.render_as_string(hide_password=False)
+job_runner = JobRunner(
+    job_store,
+    {kind: func for kind, (func, _) in JOB_TASKS.items()},
+    app_config.JOB_RESULT_DIR,
+    workers=app_config.JOB_WORKERS,
+    max_concurrent=app_config.JOB_MAX_CONCURRENT,
+    stale_seconds=app_config.JOB_STALE_SECONDS,
+    result_ttl=app_config.JOB_RESULT_TTL_HOURS * 3600,
+    options={'database_url': _job_database_url}
+)
+
+def job_params(kind, raw):
+    """Validate submitted job parameters (raises ValueError)"""
+    raw = raw or {}
+    if kind == 'export':
+        export_format = str(raw.get('format', 'csv')).lower()
+        if export_format not in ('csv', 'xlsx'):
+            raise ValueError("Unsupported export format")
+        if export_format == 'xlsx' and not XLSX_AVAILABLE:
+            raise ValueError("XLSX export requires openpyxl")
+        # Pool processes load the dataset themselves: point them at this version's snapshot
+        snapshot = dataset_files.get(dataset, 'parquet')[0] if ARROW_AVAILABLE else None
+        return {'format': export_format, 'filters': normalize_filter_state(raw.get('filters')),
+                'dataset': {'version': dataset.version, 'path': dataset.path, 'snapshot': snapshot}}
+    if kind == 'activity_report':
+        for key in ('start', 'end'):
+            datetime.strptime(raw.get(key) or '', '%Y-%m-%d')
+        return {'start': raw['start'], 'end': raw['end'], 'action': raw.get('action') or None}
+    raise ValueError(f"Unknown job kind: {kind}")
+
+def submit_job(kind, raw_params):
+    """
+    Queue a job for the current user
+
+    Returns:
+        (job, None) or (None, (error message, HTTP status))
+    """
+    if kind not in JOB_TASKS:
+        return None, (f"Unknown job kind: {kind}", 400)
+    if JOB_TASKS[kind][1] and current_user.role != "admin":
+        return None, ("Unauthorized", 403)
+    try:
+        params = job_params(kind, raw_params)
+    except (ValueError, TypeError) as e:
+        return None, (str(e) or "Invalid job parameters", 400)
+    if job_store.count_active(current_user.id) >= app_config.JOB_MAX_ACTIVE_PER_USER:
+        return None, ("Too many jobs in progress", 429)
+
+    job = job_runner.submit(kind, current_user.id, params)
+    log_activity(current_user.id, 'job_submitted', {'job_id': job['id'], 'kind': kind})
+    return job, None
+
+def user_job(job_id):
+    """The job if it belongs to the current user (admins see every job)"""
+    job = job_store.get(job_id)
+    if job is None or (job['user_id'] != current_user.id and current_user.role != "admin"):
+        return None
+    return job
 
-    table_columns = ['Potential Score', 'Sub-district', 'Happy Block', 'Port Use', 'Port Available', 'Navigate']
-    table_dict = table_data[table_columns].to_dict('records')
+@app.callback(
+    Output('export-job', 'data'),
+    Input('export-job-button', 'n_clicks'),
+    State('filter-state', 'data'),
+    prevent_initial_call=True
+)
+def submit_export_job(n_clicks, filter_state):
+    job, error = submit_job('export', {'format': 'xlsx', 'filters': filter_state})
+    if job is None:
+        return {'error': error[0]}
+    return {'id': job['id']}
 
-    header_text = f"📍 {len(filtered)} locations | Avg Score: {filtered['Potential Score'].mean():.1f}"
+@app.callback(
+    [Output('export-job-panel', 'style'),
+     Output('export-job-progress', 'value'),
+     Output('export-job-progress', 'label'),
+     Output('export-job-status', 'children'),
+     Output('export-job-download', 'href'),
+     Output('export-job-download', 'style'),
+     Output('export-job-cancel', 'style'),
+     Output('export-job-poll', 'disabled')],
+    [Input('export-job', 'data'),
+     Input('export-job-poll', 'n_intervals')],
+    prevent_initial_call=True
+)
+def poll_export_job(job_ref, n_intervals):
+    """Progress of the submitted export job (polling stops once it finishes)"""
+    shown, hidden = {'display': 'block'}, {'display': 'none'}
+    if not job_ref:
+        raise PreventUpdate
+    if job_ref.get('error'):
+        return shown, 0, "", f"❌ {job_ref['error']}", "#", hidden, hidden, True
+
+    job = user_job(job_ref['id'])
+    if job is None:
+        return shown, 0, "", "❌ Job not found", "#", hidden, hidden, True
+
+    percent = round(job['progress'] * 100)
+    status = f"{job['status']}" + (f" - {job['message']}" if job['message'] else "")
+    if job['status'] == DONE:
+        return (shown, 100, "100%", f"✅ {job['result_name']}", f"/api/jobs/{job['id']}/result",
+                {'display': 'inline-block'}, hidden, True)
+    if job['status'] in FINISHED:
+        return shown, percent, f"{percent}%", f"❌ {job['error'] or job['status']}", "#", hidden, hidden, True
+    return shown, percent, f"{percent}%", status, "#", hidden, {'display': 'inline-block'}, False
 
-    return fig, potential_score_range, table_dict, header_text
+@app.callback(
+    Output('export-job-cancel', 'disabled'),
+    Input('export-job-cancel', 'n_clicks'),
+    State('export-job', 'data'),
+    prevent_initial_call=True
+)
+def cancel_export_job(n_clicks, job_ref):
+    """The next poll shows the cancelled state"""
+    if job_ref and job_ref.get('id') and user_job(job_ref['id']) is not None:
+        job_store.cancel(job_ref['id'])
+    raise PreventUpdate
 
 # Flask Routes
 @server.route("/health")
@@ -582,15 +948,39 @@ def login():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
+
+        ip = client_ip()
+        try:
+            retry_after = login_throttle.check(ip, username)
+        except Exception as e:
+            # Never lock everyone out because the shared backend is unavailable
+            print(f"❌ Login throttle unavailable: {e}")
+            retry_after = 0
+        if retry_after:
+            failed_logins.record(username, ip, throttled=True)
+            return render_template("login.html", error="พยายามเข้าสู่ระบบบ่อยเกินไป กรุณารอสักครู่แล้วลองใหม่"), \
+                429, {'Retry-After': str(int(retry_after) + 1)}
+
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        ok = False
+        if user:
+            try:
+                ok, new_hash = password_pool.verify(user.password_hash, password)
+            except PasswordPoolBusy:
+                return login_busy_response("login.html")
+            if new_hash:
+                # Stored hash uses outdated parameters: upgrade it transparently
+                user.password_hash = new_hash
+                db.session.commit()
+
+        if ok:
             login_user(user)
             log_activity(user.id, 'login')
             increment_page_view('/login')
             return redirect("/dashboard/")
 
-        log_activity(None, 'failed_login', {'username': username})
+        failed_logins.record(username, ip)
         return render_template("login.html", error="Invalid credentials")
 
     increment_page_view('/login')
@@ -619,8 +1009,12 @@ def register():
         if User.query.filter_by(username=username).first():
             return render_template("register.html", error="Username already exists")
 
-        user = User(username=username, role=role)
-        user.set_password(password)
+        try:
+            password_hash = password_pool.hash(password)
+        except PasswordPoolBusy:
+            return login_busy_response("register.html")
+
+        user = User(username=username, role=role, password_hash=password_hash)
         db.session.add(user)
         db.session.commit()
 
@@ -630,35 +1024,33 @@ def register():
 
 @server.route("/admin/stats")
 @login_required
+@query_budget(4 + COUNT_ATTEMPTS)
 def admin_stats():
     """Admin page to view statistics"""
     if current_user.role != "admin":
         return "Unauthorized", 403
 
-    # Get page views
-    page_views = PageView.query.all()
+    # Get page views (flushed + pending in this worker)
+    page_views = page_view_counter.counts()
 
-    # Get recent activity logs
-    recent_logs = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(100).all()
+    # Get recent activity logs (with their users in the same query); the time
+    # bound lets PostgreSQL prune to the current monthly partitions
+    recent_since = get_thailand_time() - timedelta(days=app_config.RECENT_ACTIVITY_DAYS)
+    recent_logs = ActivityLog.query.options(
+        joinedload(ActivityLog.user)
+    ).filter(
+        ActivityLog.timestamp >= recent_since
+    ).order_by(ActivityLog.timestamp.desc()).limit(100).all()
 
-    # Get user statistics
-    users = User.query.all()
-    user_stats = []
-    for user in users:
-        login_count = ActivityLog.query.filter_by(user_id=user.id, action='login').count()
-        last_login = ActivityLog.query.filter_by(user_id=user.id, action='login').order_by(ActivityLog.timestamp.desc()).first()
-        user_stats.append({
-            'id': user.id,
-            'username': user.username,
-            'role': user.role,
-            'login_count': login_count,
-            'last_login': last_login.timestamp if last_login else None
-        })
+    # Get user statistics (one aggregated query for all users)
+    user_stats = get_user_login_stats()
 
     return render_template("admin_stats.html",
                          page_views=page_views,
                          recent_logs=recent_logs,
-                         user_stats=user_stats)
+                         user_stats=user_stats,
+                         latency=latency_stats.snapshot(),
+                         worker_pid=os.getpid())
 
 @server.route("/admin/user/delete/<int:user_id>", methods=["POST"])
 @login_required
@@ -676,6 +1068,7 @@ def delete_user(user_id):
         username = user.username
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(user_id)
         log_activity(current_user.id, 'delete_user', {'deleted_username': username})
 
     return redirect(url_for('admin_stats'))
@@ -700,6 +1093,7 @@ def edit_user_role(user_id):
         old_role = user.role
         user.role = new_role
         db.session.commit()
+        user_cache.invalidate(user_id)
         log_activity(current_user.id, 'edit_user_role', {
             'username': user.username,
             'old_role': old_role,
@@ -710,26 +1104,399 @@ def edit_user_role(user_id):
 
 @server.route("/api/page-views")
 @login_required
+@query_budget(1 + COUNT_ATTEMPTS)
 def api_page_views():
     """API endpoint to get page view stats"""
-    page_views = PageView.query.all()
+    page_views = page_view_counter.counts()
     return jsonify([{
-        'page_path': pv.page_path,
-        'view_count': pv.view_count,
-        'last_viewed': pv.last_viewed.isoformat() if pv.last_viewed else None
+        'page_path': pv['page_path'],
+        'view_count': pv['view_count'],
+        'last_viewed': pv['last_viewed'].isoformat() if pv['last_viewed'] else None
     } for pv in page_views])
 
+@server.route("/dashboard/export")
+@login_required
+@query_budget(2)
+def export_targets():
+    """
+    Stream the filtered target list as CSV or XLSX
+
+    Filters directly (not through filtered_cache) and streams from row
+    positions, so an export does not keep another row-set in memory. XLSX
+    above EXPORT_XLSX_MAX_ROWS rows must go through a background job.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        return "Unsupported export format", 400
+    if export_format == 'xlsx' and not XLSX_AVAILABLE:
+        return "XLSX export requires openpyxl", 501
+
+    try:
+        state = filter_state_from_args(request.args)
+    except ValueError:
+        return "Invalid filter range", 400
+
+    with phase('filter'):
+        positions = sorted_positions(data, state)
+    if (export_format == 'xlsx' and app_config.JOBS_ENABLED
+            and len(positions) > app_config.EXPORT_XLSX_MAX_ROWS):
+        return (f"{len(positions):,} rows are too many for a direct XLSX export; "
+                "use the background export (POST /api/jobs)"), 413
+    log_activity(current_user.id, 'export', {
+        'format': export_format,
+        'rows': len(positions),
+        'filters': normalize_filter_state(state)
+    })
+
+    filename = f"tol_targets_{datetime.now():%Y%m%d_%H%M}.{export_format}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if export_format == 'csv':
+        return Response(iter_csv(data, positions=positions), mimetype=CSV_MIMETYPE, headers=headers)
+    return Response(iter_xlsx(data, positions=positions), mimetype=XLSX_MIMETYPE, headers=headers)
+
+# /api/targets: same filters as the dashboard, paginated JSON
+API_FIELDS = [col for col in EXPORT_COLUMNS if col in data.columns]
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+@server.route("/api/targets")
+@login_required
+@query_budget(2)
+def api_targets():
+    """
+    Filtered targets as paginated JSON
+
+    Query: hierarchy levels (?province=...), ranges as "min,max"
+    (?potential_score=70,100), page, page_size and fields (comma-separated).
+    Responses carry a strong ETag; If-None-Match polls for an unchanged
+    dataset and query get 304 without filtering.
+    """
+    try:
+        state = filter_state_from_args(request.args)
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter range or paging parameter'}), 400
+
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or API_FIELDS
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}", 'fields': API_FIELDS}), 400
+
+    etag = query_etag(dataset.version, state, page=page, page_size=page_size, fields=fields)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        with phase('filter'):
+            positions = filtered_cache.positions(data, dataset.version, state)
+        # Copy only this page's rows and fields, not the whole filtered frame
+        page_rows = data.iloc[positions[(page - 1) * page_size:page * page_size], data.columns.get_indexer(fields)]
+        response = jsonify({
+            'dataset_version': dataset.version,
+            'filters': normalize_filter_state(state),
+            'total': len(positions),
+            'page': page,
+            'page_size': page_size,
+            'pages': (len(positions) + page_size - 1) // page_size,
+            'fields': fields,
+            'items': json.loads(page_rows.to_json(orient='records', force_ascii=False)),
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# /api/dataset: whole scored dataset for analysts (Arrow IPC / Parquet)
+dataset_files = DatasetFiles(app_config.DATASET_FILE_CACHE_DIR, max_files=app_config.DATASET_FILE_CACHE_MAX)
+
+@server.route("/api/dataset")
+@login_required
+def api_dataset():
+    """
+    Current scored dataset as an Arrow IPC stream or a Parquet file
+
+    Query: format (arrow | parquet), columns (comma-separated) and the
+    hierarchy filters (?province=...). Files are cached per dataset version
+    and served with ETag / Range support.
+    """
+    file_format = request.args.get('format', 'arrow').lower()
+    if file_format not in FORMATS:
+        return jsonify({'error': 'Unsupported format', 'formats': list(FORMATS)}), 400
+    if not ARROW_AVAILABLE:
+        return "Arrow / Parquet export requires pyarrow", 501
+
+    available = dataset_files.columns(dataset)
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or None
+    unknown = [c for c in columns or [] if c not in available]
+    if unknown:
+        return jsonify({'error': f"Unknown columns: {', '.join(unknown)}", 'columns': available}), 400
+
+    state = {key: request.args.get(key) or None for key in ('province', 'district', 'subdistrict', 'happy_block')}
+    extension, mimetype = FORMATS[file_format]
+    for attempt in range(2):
+        path, cache_key = dataset_files.get(dataset, file_format, columns, state)
+        try:
+            # send_file opens the file right away; once open, pruning cannot break the download
+            response = send_file(path, mimetype=mimetype, as_attachment=True,
+                                 download_name=f"tol_dataset_{dataset.version}.{extension}",
+                                 conditional=True, etag=cache_key, max_age=0)
+            break
+        except FileNotFoundError:
+            if attempt:
+                raise   # pruned twice in a row: give up
+
+    log_activity(current_user.id, 'dataset_download', {
+        'format': file_format,
+        'columns': columns,
+        'filters': {key: value for key, value in state.items() if value}
+    })
+    return response
+
+@server.route("/api/jobs", methods=["GET", "POST"])
+@login_required
+def api_jobs():
+    """
+    GET: recent jobs of the current user
+    POST: submit a job - JSON {"kind": "export" | "activity_report", "params": {...}}
+    """
+    if request.method == "GET":
+        return jsonify({'jobs': [public_job(job) for job in job_store.list(current_user.id)]})
+
+    payload = request.get_json(silent=True) or {}
+    job, error = submit_job(payload.get('kind'), payload.get('params'))
+    if job is None:
+        return jsonify({'error': error[0]}), error[1]
+    response = jsonify(public_job(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('api_job', job_id=job['id'])
+    return response
+
+@server.route("/api/jobs/<job_id>")
+@login_required
+def api_job(job_id):
+    """Status and progress (0..1) of one job"""
+    job = user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    response = jsonify(public_job(job))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@server.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+def api_cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report"""
+    if user_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(public_job(job_store.cancel(job_id)))
+
+@server.route("/api/jobs/<job_id>/result")
+@login_required
+def api_job_result(job_id):
+    """Download the output file of a finished job"""
+    job = user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != DONE or not job['result_path'] or not os.path.exists(job['result_path']):
+        return jsonify({'error': 'Result not available', 'status': job['status']}), 409
+
+    log_activity(current_user.id, 'job_download', {'job_id': job_id, 'kind': job['kind']})
+    return send_file(job['result_path'], mimetype=job['mimetype'], as_attachment=True,
+                     download_name=job['result_name'], conditional=True, max_age=0)
+
+# Vector tiles of all target points, generated lazily per dataset version
+tile_cache = TileCache(app_config.TILE_CACHE_DIR, maxsize=app_config.TILE_CACHE_SIZE,
+                       max_features=app_config.TILE_MAX_FEATURES)
+tile_prewarmer = TilePrewarmer(tile_cache, dataset,
+                               [float(v) for v in app_config.TILE_PREWARM_BOUNDS.split(',')],
+                               app_config.TILE_PREWARM_MAX_ZOOM)
+
+@server.route("/tiles/<int:z>/<int:x>/<int:y>.mvt")
+@login_required
+def vector_tile(z, x, y):
+    """
+    Mapbox vector tile of the target points (layer 'targets')
+
+    Filter arguments (same as /api/targets) restrict the tile to the
+    matching rows, so the tile layer follows the dashboard filters.
+    """
+    if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return "Tile out of range", 404
+    try:
+        state = filter_state_from_args(request.args)
+    except ValueError:
+        return "Invalid filter range", 400
+
+    etag = f"{dataset.version}-{filter_state_id(state)}-{z}-{x}-{y}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(tile_cache.get(dataset, z, x, y, state), mimetype=MVT_MIMETYPE)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+def collect_metrics():
+    """Metrics of this worker (merged with the other workers by metrics_exporter)"""
+    snapshot = MetricsSnapshot()
+
+    for key, histogram in latency_stats.histograms().items():
+        kind, _, name = key.partition(':')
+        snapshot.histogram('tol_request_duration_seconds', 'Request duration by route / Dash callback',
+                           histogram, {'kind': kind, 'name': name})
+
+    tile_stats = tile_cache.stats()
+    for cache, stats in (('filter', filtered_cache.stats()), ('user', user_cache.stats()), ('tile', tile_stats)):
+        labels = {'cache': cache}
+        snapshot.counter('tol_cache_hits_total', 'Cache hits', stats['hits'], labels)
+        snapshot.counter('tol_cache_misses_total', 'Cache misses', stats['misses'], labels)
+        snapshot.gauge('tol_cache_entries', 'Entries in the cache (sum over workers)', stats['size'], labels)
+        snapshot.gauge('tol_cache_max_entries', 'Cache capacity per worker', stats.get('maxsize'), labels, merge='max')
+    snapshot.counter('tol_cache_disk_hits_total', 'Cache hits served from the on-disk store',
+                     tile_stats['disk_hits'], {'cache': 'tile'})
+
+    queries = instrumentation.query_stats()
+    snapshot.counter('tol_db_queries_total', 'SQL statements executed', queries['count'])
+    snapshot.histogram('tol_db_query_duration_seconds', 'SQL statement duration', queries)
+    with server.app_context():
+        pool = pool_status(db.engine)
+    snapshot.gauge('tol_db_pool_checked_out', 'Connections checked out of the pool', pool.get('checked_out'))
+    snapshot.gauge('tol_db_pool_size', 'Configured pool size', pool.get('size'))
+    snapshot.counter('tol_db_pool_checkout_timeouts_total', 'Pool checkouts that timed out', pool['timeouts'])
+
+    log_stats = activity_writer.stats()
+    labels = {'queue': 'activity'}
+    snapshot.gauge('tol_log_queue_depth', 'Log events waiting to be written', log_stats['queue_depth'], labels)
+    snapshot.counter('tol_log_events_written_total', 'Log events written', log_stats['written'], labels)
+    snapshot.counter('tol_log_events_dropped_total', 'Log events dropped (queue full)', log_stats['dropped'], labels)
+    snapshot.gauge('tol_page_views_pending', 'Page views not yet flushed',
+                   sum(count for count, _ in page_view_counter.pending().values()))
+
+    snapshot.gauge('tol_dataset_info', 'Loaded dataset version', 1, {'version': dataset.version}, merge='max')
+    snapshot.gauge('tol_dataset_rows', 'Rows in the loaded dataset', len(data), merge='max')
+    snapshot.gauge('tol_dataset_load_seconds', 'Time to read and preprocess the dataset',
+                   dataset.load_seconds, merge='max')
+    snapshot.gauge('tol_process_resident_memory_bytes', 'Resident memory per worker',
+                   process_rss_bytes(), merge='worker')
+    return snapshot
+
+metrics_exporter = MetricsExporter(app_config.SHARED_STATE_DIR, collect_metrics,
+                                   interval=app_config.METRICS_WRITE_INTERVAL,
+                                   stale_seconds=app_config.METRICS_STALE_SECONDS)
+
+@server.route("/metrics")
+def prometheus_metrics():
+    """Prometheus metrics of every worker on this host (requires Bearer METRICS_TOKEN)"""
+    if not (app_config.METRICS_ENABLED and app_config.METRICS_TOKEN):
+        return "Not found", 404
+    if not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f"Bearer {app_config.METRICS_TOKEN}"):
+        return "Unauthorized", 401
+    response = Response(metrics_exporter.render(), content_type=METRICS_CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@server.route("/admin/callback-counts")
+@login_required
+def admin_callback_counts():
+    """Callback execution counters for this worker (Admin only)"""
+    if current_user.role != "admin":
+        return "Unauthorized", 403
+    return jsonify({'pid': os.getpid(), 'counts': latency_stats.counts('callback:')})
+
+@server.route("/admin/query-profile")
+@login_required
+def admin_query_profile():
+    """SQL statements per route / callback, repeated statements and slow queries for this worker (Admin only)"""
+    if current_user.role != "admin":
+        return "Unauthorized", 403
+    return jsonify(dict(query_profiler.report(), pid=os.getpid(), enabled=app_config.QUERY_PROFILER_ENABLED))
+
+@server.route("/admin/db-pool")
+@login_required
+def admin_db_pool():
+    """Connection pool state and checkout metrics for this worker (Admin only)"""
+    if current_user.role != "admin":
+        return "Unauthorized", 403
+    return jsonify({'pid': os.getpid(), 'pool': pool_status(db.engine)})
+
+@server.route("/admin/activity-logs")
+@login_required
+@query_budget(2)
+def admin_activity_logs():
+    """
+    Activity logs for a date range (Admin only)
+
+    Query: start, end (YYYY-MM-DD, end exclusive), user_id, action, limit.
+    Ranges reaching past the retention window also read the Parquet archives.
+    """
+    if current_user.role != "admin":
+        return "Unauthorized", 403
+
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else get_thailand_time().replace(tzinfo=None)
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else end - timedelta(days=app_config.RECENT_ACTIVITY_DAYS)
+        user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+    except ValueError:
+        return "Invalid query parameters", 400
+    action = request.args.get('action')
+
+    query = ActivityLog.query.filter(ActivityLog.timestamp >= start, ActivityLog.timestamp < end)
+    filters = {}
+    if user_id is not None:
+        query = query.filter(ActivityLog.user_id == user_id)
+        filters['user_id'] = user_id
+    if action:
+        query = query.filter(ActivityLog.action == action)
+        filters['action'] = action
+
+    logs = [{
+        'user_id': log.user_id,
+        'action': log.action,
+        'details': log.details,
+        'ip_address': log.ip_address,
+        'timestamp': log.timestamp.isoformat() if log.timestamp else None
+    } for log in query.order_by(ActivityLog.timestamp.desc()).limit(limit).all()]
+
+    archived = 0
+    if app_config.LOG_RETENTION_ENABLED and start < retention_cutoff() and len(logs) < limit:
+        for row in query_archive('activity_logs', start, min(end, retention_cutoff()), filters, limit=limit - len(logs)):
+            logs.append({
+                'user_id': row['user_id'],
+                'action': row['action'],
+                'details': row['details'],
+                'ip_address': row['ip_address'],
+                'timestamp': row['timestamp'].isoformat() if row['timestamp'] else None
+            })
+            archived += 1
+
+    return jsonify({'logs': logs, 'archived_rows': archived, 'archive_available': ARCHIVE_AVAILABLE})
+
 @server.before_request
-def restrict_dashboard():
-    """Track page views and restrict access"""
-    # Track dashboard views - only log main page load, not Dash AJAX requests
-    if request.path == "/dashboard/" and current_user.is_authenticated:
-        increment_page_view('/dashboard')
-        log_activity(current_user.id, 'view_dashboard')
-
-    # Restrict dashboard access to authenticated users only
-    if request.path.startswith("/dashboard") and not current_user.is_authenticated:
-        return redirect("/login")
+def start_background_tasks():
+    """Start per-worker maintenance threads (cheap check after the first request)"""
+    partition_task.ensure_started()
+    failed_login_task.ensure_started()
+    if app_config.METRICS_ENABLED and app_config.METRICS_TOKEN:
+        metrics_exporter.ensure_started()
+    if app_config.JOBS_ENABLED:
+        job_runner.ensure_started()
+    if app_config.MAP_VECTOR_TILES and app_config.TILE_PREWARM_MAX_ZOOM >= 0:
+        tile_prewarmer.ensure_started()
+    if not app_config.DB_POOL_PRE_PING:
+        liveness_task.ensure_started()
+    if app_config.LOG_RETENTION_ENABLED and ARCHIVE_AVAILABLE:
+        retention_task.ensure_started()
+
+def track_dashboard_view(user):
+    """Track dashboard views - only the main page load, not Dash AJAX requests"""
+    increment_page_view('/dashboard')
+    log_activity(user.id, 'view_dashboard')
+
+# Restrict dashboard access to authenticated users only; paths are classified
+# once so static assets and Dash AJAX requests take the cheap path
+request_classifier = RequestClassifier(app.config.requests_pathname_prefix, server.static_url_path)
+restrict_dashboard = server.before_request(make_dashboard_guard(request_classifier, track_dashboard_view))
 
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=8051)
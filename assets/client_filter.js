@@ -0,0 +1,277 @@
+/*
+ * Client-side filtering for the TOL Sales Journey dashboard.
+ * Decodes the columnar dataset shipped by client_data.encode_columnar()
+ * and applies the same hierarchy + range filters as update_map().
+ * Selections the shipped rows do not cover are handed to the server
+ * callbacks through the `server-filter-state` store.
+ * Also hosts the filter-state / quick-filter callbacks used in both modes.
+ */
+(function () {
+    var decoded = {version: null, columns: null};
+
+    var ARRAY_TYPES = {
+        float32: Float32Array,
+        float64: Float64Array,
+        int16: Int16Array,
+        int32: Int32Array
+    };
+
+    function decodeArray(col) {
+        var raw = atob(col.data);
+        var bytes = new Uint8Array(raw.length);
+        for (var i = 0; i < raw.length; i++) {
+            bytes[i] = raw.charCodeAt(i);
+        }
+        return new ARRAY_TYPES[col.dtype](bytes.buffer);
+    }
+
+    function getColumns(store) {
+        if (decoded.version !== store.version) {
+            var columns = {};
+            Object.keys(store.columns).forEach(function (name) {
+                var col = store.columns[name];
+                columns[name] = {values: decodeArray(col), categories: col.categories || null};
+            });
+            decoded = {version: store.version, columns: columns};
+        }
+        return decoded.columns;
+    }
+
+    function categoryCode(col, value) {
+        // -2 never matches a code (-1 is used for missing values)
+        var idx = col.categories.indexOf(value);
+        return idx === -1 ? -2 : idx;
+    }
+
+    function emptyFigure() {
+        return {
+            data: [],
+            layout: {
+                title: 'No data available',
+                mapbox: {style: 'open-street-map', center: {lat: 8.5, lon: 100}, zoom: 6}
+            }
+        };
+    }
+
+    function label(col, i) {
+        var code = col.values[i];
+        return code < 0 ? '' : col.categories[code];
+    }
+
+    function buildFigure(cols, idx, colorscale) {
+        var lat = [], lon = [], size = [], score = [], text = [], custom = [];
+        var maxSize = 0;
+        idx.forEach(function (i) {
+            var use = cols['Port Use'].values[i];
+            lat.push(cols['Latitude'].values[i]);
+            lon.push(cols['Longitude'].values[i]);
+            size.push(use);
+            score.push(cols['Potential Score'].values[i]);
+            text.push(label(cols['Sub-district'], i));
+            custom.push([
+                label(cols['Happy Block'], i),
+                use,
+                cols['Port Available'].values[i],
+                cols['%Port_Utilize'].values[i],
+                cols['Net Add'].values[i],
+                cols['Market Share True (%)'].values[i],
+                cols['L2_Aging_Months'].values[i]
+            ]);
+            if (use > maxSize) {
+                maxSize = use;
+            }
+        });
+
+        var meanLat = lat.reduce(function (a, b) { return a + b; }, 0) / lat.length;
+        var meanLon = lon.reduce(function (a, b) { return a + b; }, 0) / lon.length;
+
+        return {
+            data: [{
+                type: 'scattermapbox',
+                mode: 'markers',
+                lat: lat,
+                lon: lon,
+                text: text,
+                customdata: custom,
+                marker: {
+                    size: size,
+                    sizemode: 'area',
+                    // Same sizing rule as px.scatter_mapbox (size_max=20)
+                    sizeref: maxSize > 0 ? 2.0 * maxSize / (20 * 20) : 1,
+                    color: score,
+                    colorscale: colorscale.map(function (c, k) {
+                        return [k / (colorscale.length - 1), c];
+                    }),
+                    showscale: true,
+                    colorbar: {title: {text: 'Potential Score'}}
+                },
+                hovertemplate: '<b>%{text}</b><br>' +
+                    'Happy Block=%{customdata[0]}<br>' +
+                    'Port Use=%{customdata[1]}<br>' +
+                    'Port Available=%{customdata[2]}<br>' +
+                    '%Port_Utilize=%{customdata[3]}<br>' +
+                    'Net Add=%{customdata[4]}<br>' +
+                    'Market Share True (%)=%{customdata[5]:.2f}<br>' +
+                    'L2_Aging_Months=%{customdata[6]}<br>' +
+                    'Potential Score=%{marker.color}<extra></extra>'
+            }],
+            layout: {
+                mapbox: {style: 'open-street-map', center: {lat: meanLat, lon: meanLon}, zoom: 10},
+                margin: {r: 0, t: 0, l: 0, b: 0},
+                dragmode: 'pan'
+            }
+        };
+    }
+
+    function buildTable(cols, idx) {
+        var sorted = idx.slice().sort(function (a, b) {
+            return cols['Potential Score'].values[b] - cols['Potential Score'].values[a];
+        });
+        return sorted.map(function (i) {
+            var lat = cols['Latitude'].values[i].toFixed(6);
+            var lon = cols['Longitude'].values[i].toFixed(6);
+            return {
+                'Potential Score': cols['Potential Score'].values[i],
+                'Sub-district': label(cols['Sub-district'], i),
+                'Happy Block': label(cols['Happy Block'], i),
+                'Port Use': cols['Port Use'].values[i],
+                'Port Available': cols['Port Available'].values[i],
+                'Navigate': '[🗺️]( https://www.google.com/maps/dir/?api=1&destination=' + lat + ',' + lon + ')'
+            };
+        });
+    }
+
+    function inRange(value, range) {
+        // NaN never matches, same as the pandas comparison on the server
+        return value >= range[0] && value <= range[1];
+    }
+
+    function covers(store, state) {
+        // Same rule as client_data.store_covers() (a marker has no columns)
+        return store.columns && (store.scope === null || store.scope === undefined ||
+                                 store.scope === state.province);
+    }
+
+    function filterTargets(state, store) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!state || !store) {
+            return [noUpdate, noUpdate, noUpdate, noUpdate];
+        }
+        if (!covers(store, state)) {
+            // Too large for the browser (or not shipped yet): filter on the server
+            return [noUpdate, noUpdate, noUpdate, state];
+        }
+
+        var cols = getColumns(store);
+        var hierarchy = [
+            ['Province', state.province],
+            ['District', state.district],
+            ['Sub-district', state.subdistrict],
+            ['Happy Block', state.happy_block]
+        ].filter(function (h) { return h[1]; }).map(function (h) {
+            return [cols[h[0]].values, categoryCode(cols[h[0]], h[1])];
+        });
+        var ranges = [
+            [cols['Net Add'].values, state.net_add],
+            [cols['Potential Score'].values, state.potential_score],
+            [cols['%Port_Utilize'].values, state.port_utilize],
+            [cols['Market Share True (%)'].values, state.market_share_true],
+            [cols['L2_Aging_Months'].values, state.l2_aging]
+        ].filter(function (r) { return r[1]; });
+
+        var idx = [];
+        for (var i = 0; i < store.rows; i++) {
+            var keep = true;
+            for (var h = 0; keep && h < hierarchy.length; h++) {
+                keep = hierarchy[h][0][i] === hierarchy[h][1];
+            }
+            for (var r = 0; keep && r < ranges.length; r++) {
+                keep = inRange(ranges[r][0][i], ranges[r][1]);
+            }
+            if (keep) {
+                idx.push(i);
+            }
+        }
+
+        if (idx.length === 0) {
+            return [emptyFigure(), [], '📍 No locations found', noUpdate];
+        }
+
+        var total = idx.reduce(function (acc, i) {
+            return acc + cols['Potential Score'].values[i];
+        }, 0);
+        var header = '📍 ' + idx.length + ' locations | Avg Score: ' + (total / idx.length).toFixed(1);
+
+        return [buildFigure(cols, idx, store.colorscale), buildTable(cols, idx), header, noUpdate];
+    }
+
+    function quickFilter(highPotentialClicks, showAllClicks, scoreMin, scoreMax) {
+        var triggered = window.dash_clientside.callback_context.triggered;
+        if (!triggered || !triggered.length) {
+            return window.dash_clientside.no_update;
+        }
+        var buttonId = triggered[0].prop_id.split('.')[0];
+        if (buttonId === 'quick-high-potential') {
+            return [70, 100];
+        }
+        return [scoreMin, scoreMax];
+    }
+
+    function randomId() {
+        return Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+    }
+
+    function syncFilterState(province, district, subdistrict, happyBlock,
+                             netAdd, potentialScore, portUtilize, marketShareTrue, l2Aging, previous) {
+        // Same keys as filter_engine.HIERARCHY_FILTERS / RANGE_FILTERS
+        var filters = {
+            province: province || null,
+            district: district || null,
+            subdistrict: subdistrict || null,
+            happy_block: happyBlock || null,
+            net_add: netAdd || null,
+            potential_score: potentialScore || null,
+            port_utilize: portUtilize || null,
+            market_share_true: marketShareTrue || null,
+            l2_aging: l2Aging || null
+        };
+        var fingerprint = JSON.stringify(filters);
+
+        if (previous && previous.fingerprint === fingerprint) {
+            return window.dash_clientside.no_update;
+        }
+
+        filters.fingerprint = fingerprint;
+        filters.sid = (previous && previous.sid) || randomId();
+        filters.seq = ((previous && previous.seq) || 0) + 1;
+        return filters;
+    }
+
+    function exportLinks(state) {
+        // Same query format as filter_engine.filter_state_from_args()
+        var params = [];
+        if (state) {
+            ['province', 'district', 'subdistrict', 'happy_block'].forEach(function (key) {
+                if (state[key]) {
+                    params.push(key + '=' + encodeURIComponent(state[key]));
+                }
+            });
+            ['net_add', 'potential_score', 'port_utilize', 'market_share_true', 'l2_aging'].forEach(function (key) {
+                if (state[key]) {
+                    params.push(key + '=' + state[key][0] + ',' + state[key][1]);
+                }
+            });
+        }
+        var query = params.length ? '&' + params.join('&') : '';
+        return ['/dashboard/export?format=csv' + query, '/dashboard/export?format=xlsx' + query];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        tolClient: {
+            filterTargets: filterTargets,
+            quickFilter: quickFilter,
+            syncFilterState: syncFilterState,
+            exportLinks: exportLinks
+        }
+    });
+})();
@@ -0,0 +1,86 @@
+"""
+Background worker threads
+Each worker starts lazily in the process that uses it (gunicorn forks its
+workers after import), and is stopped - with a final flush - at exit.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+
+def process_context():
+    """
+    multiprocessing context for process pools created in a gunicorn worker
+
+    The worker runs request and background threads, and forking it can copy
+    a lock held by one of them into the child (deadlock; a DeprecationWarning
+    on Python 3.12+). forkserver children are forked from a clean
+    single-threaded server instead; spawn where forkserver is unavailable.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+class BackgroundWorker:
+    """Base class for a daemon thread owned by the current process"""
+
+    def __init__(self, name):
+        self.name = name
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+
+    def is_running(self):
+        return (self._thread is not None and self._pid == os.getpid()
+                and self._thread.is_alive())
+
+    def ensure_started(self):
+        """Start the thread if it is not running in this process"""
+        if self.is_running():
+            return
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._pid = os.getpid()
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stopping(self):
+        return self._stop_event.is_set()
+
+    def wait(self, seconds):
+        """Sleep up to `seconds`; returns True if the worker is stopping"""
+        return self._stop_event.wait(seconds)
+
+    def stop(self, timeout=5.0):
+        """Ask the thread to finish and wait for it"""
+        self._stop_event.set()
+        if self.is_running():
+            self._thread.join(timeout)
+
+    def run(self):
+        raise NotImplementedError
+
+class PeriodicTask(BackgroundWorker):
+    """Run func every `interval` seconds (and once more when stopping)"""
+
+    def __init__(self, name, interval, func):
+        super().__init__(name)
+        self.interval = interval
+        self.func = func
+
+    def run(self):
+        while not self.wait(self.interval):
+            self._run_once()
+        self._run_once()
+
+    def _run_once(self):
+        try:
+            self.func()
+        except Exception as e:
+            print(f"❌ Background task {self.name} failed: {e}")
@@ -0,0 +1,163 @@
+"""
+Asynchronous, batched writer for activity log tables
+Requests only enqueue a row; a background thread bulk-inserts batches so
+request latency does not depend on the database.
+"""
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from background import BackgroundWorker
+
+class BatchLogWriter(BackgroundWorker):
+    """
+    Bounded in-process queue of log rows flushed with bulk inserts
+
+    A batch is written every `batch_size` rows or `flush_interval_ms`,
+    whichever comes first. When the queue is full, enqueue() blocks for at
+    most `enqueue_timeout_ms` (backpressure) and then drops the row.
+    """
+
+    def __init__(self, name, db, model, batch_size=100, flush_interval_ms=500,
+                 max_queue=10000, enqueue_timeout_ms=0, app=None):
+        super().__init__(name)
+        self.db = db
+        self.model = model
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flush_callbacks = []
+
+        self._counter_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def init_app(self, app):
+        """Bind the Flask app used for the writer thread's app context"""
+        self.app = app
+
+    def on_flush(self, callback):
+        """Register callback(rows) called after each successful batch"""
+        self.flush_callbacks.append(callback)
+        return callback
+
+    def _count(self, name, n=1):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def enqueue(self, row):
+        """
+        Queue one row (dict of column values)
+
+        Returns:
+            True if queued, False if dropped because the queue is full
+        """
+        self.ensure_started()
+        try:
+            if self.enqueue_timeout > 0:
+                self.queue.put(row, timeout=self.enqueue_timeout)
+            else:
+                self.queue.put_nowait(row)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def run(self):
+        while not self.stopping():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+        # Drain whatever is left on shutdown
+        self.flush()
+
+    def _collect_batch(self):
+        """Wait for up to batch_size rows or until the flush interval ends"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything currently queued (synchronously)"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, rows):
+        if self.app is None:
+            print(f"❌ {self.name}: no app bound, dropping {len(rows)} log rows")
+            self._count('failed', len(rows))
+            return
+
+        with self._write_lock, self.app.app_context():
+            session = self.db.session
+            try:
+                session.execute(insert(self.model), rows)
+                session.commit()
+                self._count('written', len(rows))
+                self._count('flushes')
+            except Exception as e:
+                session.rollback()
+                print(f"❌ {self.name}: batch insert failed ({e}), retrying row by row")
+                rows = self._write_rows_individually(rows)
+            finally:
+                session.remove()
+
+            for callback in self.flush_callbacks:
+                try:
+                    callback(rows)
+                except Exception as e:
+                    print(f"❌ {self.name}: flush callback failed: {e}")
+                    self.db.session.rollback()
+
+    def _write_rows_individually(self, rows):
+        """Fallback so one bad row does not lose the whole batch"""
+        written = []
+        session = self.db.session
+        for row in rows:
+            try:
+                session.execute(insert(self.model), [row])
+                session.commit()
+                written.append(row)
+            except Exception:
+                session.rollback()
+                self._count('failed')
+        self._count('written', len(written))
+        return written
+
+    def stats(self):
+        """Queue depth and counters for monitoring"""
+        with self._counter_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_max': self.queue.maxsize,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+            }
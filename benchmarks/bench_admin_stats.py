@@ -0,0 +1,98 @@
+"""
+Benchmark: /admin/stats user statistics on a synthetic activity_logs table
+
+Compares the old per-user loop (2N+1 queries) with get_user_login_stats()
+(one aggregated query), with and without ix_activity_logs_user_action_ts.
+
+Usage:
+    python benchmarks/bench_admin_stats.py --users 300 --rows 1000000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from common import count_queries, default_database_url, make_app, report, timed
+
+from sqlalchemy import insert, text
+
+from models import db, User, ActivityLog, get_user_login_stats
+
+ACTIONS = ['login'] * 2 + ['view_dashboard'] * 6 + ['logout', 'export']
+
+def seed(users, rows, chunk=10000):
+    """Create users and `rows` activity log rows"""
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(User), [
+        {'username': f'rep{i:05d}', 'password_hash': 'x', 'role': 'user'}
+        for i in range(users)
+    ])
+    db.session.commit()
+
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+    start = datetime.utcnow() - timedelta(days=365)
+    for offset in range(0, rows, chunk):
+        db.session.execute(insert(ActivityLog), [{
+            'user_id': random.choice(user_ids),
+            'action': random.choice(ACTIONS),
+            'ip_address': '10.0.0.1',
+            'timestamp': start + timedelta(seconds=random.randint(0, 365 * 86400))
+        } for _ in range(min(chunk, rows - offset))])
+        db.session.commit()
+        print(f"  seeded {min(offset + chunk, rows):,} / {rows:,}", end="\r")
+    print()
+
+def legacy_user_stats():
+    """The previous admin_stats loop (2 queries per user)"""
+    user_stats = []
+    for user in User.query.all():
+        login_count = ActivityLog.query.filter_by(user_id=user.id, action='login').count()
+        last_login = ActivityLog.query.filter_by(user_id=user.id, action='login').order_by(ActivityLog.timestamp.desc()).first()
+        user_stats.append({
+            'id': user.id,
+            'login_count': login_count,
+            'last_login': last_login.timestamp if last_login else None
+        })
+    return user_stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the existing benchmark database')
+    parser.add_argument('--database-url', default=default_database_url('admin_stats'))
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        if not args.skip_seed:
+            print(f"Seeding {args.users} users / {args.rows:,} activity rows into {args.database_url}")
+            seed(args.users, args.rows)
+
+        results = {'users': args.users, 'rows': args.rows}
+
+        db.session.execute(text("DROP INDEX IF EXISTS ix_activity_logs_user_action_ts"))
+        db.session.commit()
+        results['legacy loop, no index'] = timed(legacy_user_stats, repeat=1)
+        results['aggregated, no index'] = timed(get_user_login_stats, repeat=args.repeat)
+
+        db.session.execute(text(
+            "CREATE INDEX ix_activity_logs_user_action_ts ON activity_logs (user_id, action, timestamp)"
+        ))
+        db.session.commit()
+        results['legacy loop, with index'] = timed(legacy_user_stats, repeat=1)
+        results['aggregated, with index'] = timed(get_user_login_stats, repeat=args.repeat)
+
+        results['queries: legacy loop'] = count_queries(db.engine, legacy_user_stats)
+        results['queries: aggregated'] = count_queries(db.engine, get_user_login_stats)
+
+        assert sorted((s['id'], s['login_count']) for s in results['legacy loop, with index']['result']) == \
+            sorted((s['id'], s['login_count']) for s in results['aggregated, with index']['result'])
+
+    report('admin_stats user statistics', results, args.output)
+
+if __name__ == '__main__':
+    main()
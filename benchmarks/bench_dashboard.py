@@ -0,0 +1,139 @@
+"""
+Benchmark: dashboard hot paths on a synthetic dataset
+
+Generates (or reuses) a dataset with generate_dataset.py, points the app at
+it and times preprocessing, the location dropdown helpers and the
+update_location_options callback that cascades them, update_map /
+update_table for a set of filter mixes (cold = filter cache cleared, warm =
+cached row-set) and the JSON serialization Dash does on their output.
+
+Usage:
+    python benchmarks/bench_dashboard.py --rows 100000 --output before.json
+    python benchmarks/bench_dashboard.py --rows 100000 --output after.json --compare before.json
+"""
+import argparse
+import os
+import platform
+import sys
+import tempfile
+
+from common import compare_results, load_results, report, timed
+from generate_dataset import ensure_dataset
+
+def isolate_app(dataset_path):
+    """Point the app at the synthetic dataset and throwaway state (before importing it)"""
+    workdir = tempfile.mkdtemp(prefix='tol_bench_dashboard_')
+    os.environ['DATASET_PATH'] = dataset_path
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'app.db')
+    os.environ['CLIENTSIDE_FILTERING'] = 'False'
+    os.environ['MAP_VECTOR_TILES'] = 'False'
+    os.environ['JOBS_ENABLED'] = 'False'
+    for name in ('SHARED_STATE_DIR', 'JOB_RESULT_DIR', 'TILE_CACHE_DIR', 'DATASET_FILE_CACHE_DIR'):
+        os.environ[name] = os.path.join(workdir, name.lower())
+
+def set_triggered(component_id):
+    """Make callback_context.triggered_id return component_id outside a Dash request"""
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    triggered = [{'prop_id': f'{component_id}.value', 'value': None}] if component_id else []
+    context_value.set(AttributeDict(triggered_inputs=triggered))
+
+def filter_mixes(data):
+    """Representative filter states, from national view down to one sub-district"""
+    province = data['Province'].value_counts().index[0]
+    in_province = data[data['Province'] == province]
+    district = in_province['District'].value_counts().index[0]
+    in_district = in_province[in_province['District'] == district]
+    subdistrict = in_district['Sub-district'].value_counts().index[0]
+    return {
+        'all': {'province': None},   # an empty state is ignored by filtered_targets()
+        'high_potential': {'potential_score': [70, 100]},
+        'province': {'province': province},
+        'district': {'province': province, 'district': district},
+        'subdistrict': {'province': province, 'district': district, 'subdistrict': subdistrict},
+        'province+ranges': {'province': province, 'potential_score': [50, 100],
+                            'port_utilize': [0, 80], 'market_share_true': [0, 50]},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dataset', help='Use this CSV instead of a generated one')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Regression threshold for --compare')
+    args = parser.parse_args()
+
+    dataset_path = args.dataset or ensure_dataset(args.rows, args.seed)
+    isolate_app(dataset_path)
+
+    from dataset import load_dataset
+    results = {}
+    loaded = timed(lambda: load_dataset(dataset_path), repeat=min(args.repeat, 3))
+    results['preprocess (read_csv + preprocess_data)'] = loaded
+    results['rows'] = len(loaded['result'].data)
+
+    import app_sales_v2 as dashboard
+    from plotly.io.json import to_json_plotly
+
+    data = dashboard.data
+    mixes = filter_mixes(data)
+    location = mixes['subdistrict']
+
+    results['options/district'] = timed(
+        lambda: dashboard.update_district_options(location['province']), args.repeat)
+    results['options/subdistrict (no province)'] = timed(
+        lambda: dashboard.update_subdistrict_options(None, None), args.repeat)
+    results['options/subdistrict'] = timed(
+        lambda: dashboard.update_subdistrict_options(location['province'], location['district']), args.repeat)
+    results['options/happyblock'] = timed(
+        lambda: dashboard.update_happyblock_options(location['province'], location['district'],
+                                                    location['subdistrict']), args.repeat)
+
+    # The live callback: one response per dropdown change, cascading to every child
+    for trigger, values in (('province-filter', (location['province'], None, None)),
+                            ('district-filter', (location['province'], location['district'], None)),
+                            ('subdistrict-filter', (location['province'], location['district'],
+                                                    location['subdistrict']))):
+        def cascade(trigger=trigger, values=values):
+            set_triggered(trigger)
+            return dashboard.update_location_options(*values)
+
+        results[f'update_location_options/{trigger}'] = timed(cascade, args.repeat)
+    set_triggered(None)
+
+    for name, state in mixes.items():
+        def cold_map(state=state):
+            dashboard.filtered_cache.clear()
+            return dashboard.update_map(state)
+
+        results[f'update_map/{name} (cold)'] = timed(cold_map, args.repeat)
+        warm = timed(lambda state=state: dashboard.update_map(state), args.repeat)
+        results[f'update_map/{name} (warm)'] = warm
+        table = timed(lambda state=state: dashboard.update_table(state), args.repeat)
+        results[f'update_table/{name} (warm)'] = table
+
+        results[f'serialize/figure {name}'] = timed(lambda fig=warm['result']: to_json_plotly(fig), args.repeat)
+        results[f'serialize/table {name}'] = timed(lambda rows=table['result']: to_json_plotly(rows), args.repeat)
+        results[f'points/{name}'] = len(table['result'])
+
+    meta = {
+        'rows': results['rows'],
+        'dataset': dataset_path,
+        'dataset_version': dashboard.dataset.version,
+        'repeat': args.repeat,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+    }
+    report('dashboard hot paths', results, args.output, meta=meta)
+
+    if args.compare:
+        current = {'benchmark': 'dashboard hot paths', 'results': results}
+        regressions = compare_results(load_results(args.compare), current, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
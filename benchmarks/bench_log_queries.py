@@ -0,0 +1,90 @@
+"""
+Benchmark: activity_logs query latency (recent activity, per-user queries)
+
+Times the admin queries on the current schema, then - with --upgrade -
+runs schema_upgrade (indexes + monthly partitions on PostgreSQL) and times
+them again. Seed first with seed_logs.py (or pass --seed).
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/seed_logs.py --rows 10000000
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_log_queries.py --upgrade
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from common import default_database_url, make_app, report, timed
+
+from sqlalchemy import func, text
+
+from models import db, User, ActivityLog, get_user_login_stats
+from schema_upgrade import LOG_TABLE_INDEXES, upgrade_schema
+from seed_logs import seed_activity_logs
+
+def run_queries(user_ids, repeat, label):
+    """Time the log queries used by the admin pages"""
+    now = datetime.utcnow()
+    results = {}
+
+    results[f'{label}: recent 100 (no time bound)'] = timed(lambda: ActivityLog.query.order_by(
+        ActivityLog.timestamp.desc()).limit(100).all(), repeat)
+
+    results[f'{label}: recent 100 (last 30 days)'] = timed(lambda: ActivityLog.query.filter(
+        ActivityLog.timestamp >= now - timedelta(days=30)
+    ).order_by(ActivityLog.timestamp.desc()).limit(100).all(), repeat)
+
+    user_id = random.choice(user_ids)
+    results[f'{label}: user last 50 (last 30 days)'] = timed(lambda: ActivityLog.query.filter(
+        ActivityLog.user_id == user_id,
+        ActivityLog.timestamp >= now - timedelta(days=30)
+    ).order_by(ActivityLog.timestamp.desc()).limit(50).all(), repeat)
+
+    results[f'{label}: actions last 7 days'] = timed(lambda: db.session.query(
+        ActivityLog.action, func.count()
+    ).filter(
+        ActivityLog.timestamp >= now - timedelta(days=7)
+    ).group_by(ActivityLog.action).all(), repeat)
+
+    results[f'{label}: login stats (all users)'] = timed(get_user_login_stats, repeat)
+    return results
+
+def drop_log_indexes():
+    for name, _ in LOG_TABLE_INDEXES['activity_logs']:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, metavar='ROWS', help='Seed ROWS activity rows first')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--upgrade', action='store_true', help='Also time after schema_upgrade')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=default_database_url('logs'))
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        if args.seed:
+            seed_activity_logs(args.seed, args.users)
+
+        user_ids = [uid for (uid,) in db.session.query(User.id)]
+        results = {
+            'dialect': db.engine.dialect.name,
+            'rows': db.session.query(func.count(ActivityLog.id)).scalar(),
+        }
+
+        if args.upgrade:
+            drop_log_indexes()
+            results.update(run_queries(user_ids, args.repeat, 'before'))
+            upgrade_schema(db)
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+            results.update(run_queries(user_ids, args.repeat, 'after'))
+        else:
+            results.update(run_queries(user_ids, args.repeat, 'current'))
+
+    report('activity_logs query latency', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: dashboard callback latency during a login storm
+
+A pool of threads (like gunicorn --threads) serves a steady stream of
+CPU-bound "callbacks" (a pandas filter over a synthetic dataset) while a
+burst of logins verifies passwords either inline (check_password_hash on
+the request thread) or through passwords.PasswordPool.
+
+Usage:
+    python benchmarks/bench_login_storm.py --logins 60 --threads 4
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import report
+
+import numpy as np
+import pandas as pd
+from werkzeug.security import check_password_hash
+
+from passwords import PasswordPool, PasswordPoolBusy, hash_password
+
+def make_callback(rows):
+    """A callback-sized unit of work: filter + sort a DataFrame"""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'Potential Score': rng.uniform(0, 100, rows),
+        'Net Add': rng.integers(-50, 50, rows),
+    })
+
+    def callback():
+        started = time.perf_counter()
+        subset = data[(data['Potential Score'] >= 70) & (data['Net Add'] > 0)]
+        subset.sort_values('Potential Score', ascending=False).head(100)
+        return time.perf_counter() - started
+
+    return callback
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+def run_storm(verify, callback, logins, callbacks, threads):
+    """Interleave logins and callbacks on one thread pool; callback latencies in ms"""
+    latencies = []
+    rejected = []
+
+    def login():
+        try:
+            verify()
+        except PasswordPoolBusy:
+            rejected.append(1)
+
+    def timed_callback(submitted):
+        callback()
+        latencies.append((time.perf_counter() - submitted) * 1000)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for i in range(max(logins, callbacks)):
+            if i < logins:
+                executor.submit(login)
+            if i < callbacks:
+                executor.submit(timed_callback, time.perf_counter())
+                time.sleep(0.002)
+
+    return {
+        'callback_p50_ms': statistics.median(latencies),
+        'callback_p99_ms': percentile(latencies, 99),
+        'callback_max_ms': max(latencies),
+        'logins_rejected_503': len(rejected),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=60)
+    parser.add_argument('--callbacks', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--pool-workers', type=int, default=2)
+    parser.add_argument('--max-pending', type=int, default=16)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    password = 'Sales1234'
+    stored = hash_password(password)
+    callback = make_callback(args.rows)
+
+    results = {'logins': args.logins, 'callbacks': args.callbacks, 'threads': args.threads}
+    results['baseline (no logins)'] = run_storm(lambda: None, callback, 0, args.callbacks, args.threads)
+    results['inline check_password_hash'] = run_storm(
+        lambda: check_password_hash(stored, password), callback, args.logins, args.callbacks, args.threads)
+
+    pool = PasswordPool(workers=args.pool_workers, max_pending=args.max_pending)
+    pool.verify(stored, password)  # start the worker processes
+    results['PasswordPool'] = run_storm(
+        lambda: pool.verify(stored, password), callback, args.logins, args.callbacks, args.threads)
+
+    report('callback latency during a login storm', results, args.output)
+
+if __name__ == '__main__':
+    main()
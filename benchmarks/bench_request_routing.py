@@ -0,0 +1,103 @@
+"""
+Benchmark: before_request overhead per route
+
+Runs the previous restrict_dashboard hook (path string checks + a user load on
+every /dashboard request) and request_routing.make_dashboard_guard against
+the same stub routes, reporting time and SQL queries per request.
+
+Usage:
+    python benchmarks/bench_request_routing.py --requests 2000
+"""
+import argparse
+
+from common import count_queries, default_database_url, make_app, report, timed
+
+from flask import redirect, request
+from flask_login import LoginManager, current_user, login_user
+
+from models import db, User
+from request_routing import RequestClassifier, make_dashboard_guard
+
+ROUTES = [
+    ('GET', '/dashboard/'),
+    ('POST', '/dashboard/_dash-update-component'),
+    ('GET', '/dashboard/_dash-layout'),
+    ('GET', '/dashboard/_dash-component-suites/dash/dcc/dash_core_components.js'),
+    ('GET', '/dashboard/assets/client_filter.js'),
+    ('GET', '/static/style.css'),
+]
+
+def legacy_guard():
+    """The previous restrict_dashboard hook (page-view tracking stubbed out)"""
+    if request.path == "/dashboard/" and current_user.is_authenticated:
+        pass
+    if request.path.startswith("/dashboard") and not current_user.is_authenticated:
+        return redirect("/login")
+
+def build_app(database_url, guard):
+    app = make_app(database_url)
+    app.secret_key = 'bench'
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(lambda user_id: User.query.get(int(user_id)))
+    app.before_request(guard)
+
+    @app.route('/login-as/<int:user_id>')
+    def login_as(user_id):
+        login_user(User.query.get(user_id))
+        return 'ok'
+
+    # One catch-all stub so only the hook differs between routes
+    @app.route('/dashboard/', defaults={'path': ''}, methods=['GET', 'POST'])
+    @app.route('/dashboard/<path:path>', methods=['GET', 'POST'])
+    def dashboard_stub(path):
+        return 'ok'
+
+    return app
+
+def measure(app, requests):
+    client = app.test_client()
+    client.get('/login-as/1')
+    with app.app_context():
+        engine = db.engine
+
+    results = {}
+    for method, path in ROUTES:
+        def burst(method=method, path=path):
+            for _ in range(requests):
+                client.open(path, method=method)
+        queries = count_queries(engine, burst)
+        timing = timed(burst, repeat=3)
+        results[path] = {
+            'us_per_request': timing['median_s'] / requests * 1e6,
+            'queries_per_request': queries / requests,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--database-url', default=default_database_url('request_routing'))
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    seed_app = make_app(args.database_url)
+    with seed_app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='rep00001', role='user', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+
+    classifier = RequestClassifier('/dashboard/', '/static')
+    legacy = measure(build_app(args.database_url, legacy_guard), args.requests)
+    classified = measure(build_app(args.database_url, make_dashboard_guard(classifier)), args.requests)
+
+    results = {'requests per route': args.requests}
+    for _, path in ROUTES:
+        results[f'legacy     {path}'] = legacy[path]
+        results[f'classified {path}'] = classified[path]
+    report('before_request overhead per route', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: SQL queries per authenticated Dash callback request
+
+Simulates a burst of _dash-update-component requests from one logged-in
+user with the plain user_loader (User.query.get) and with the UserCache
+loader used by app_sales_v2.
+
+Usage:
+    python benchmarks/bench_user_loader.py --requests 500
+"""
+import argparse
+import tempfile
+
+from common import count_queries, default_database_url, make_app, report, timed
+
+from flask import jsonify
+from flask_login import LoginManager, current_user, login_user
+
+from models import db, User
+from user_cache import CachedUser, UserCache
+
+def build_app(database_url, loader):
+    """Minimal app with a login route and a fake Dash callback endpoint"""
+    app = make_app(database_url)
+    app.secret_key = 'bench'
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(loader)
+
+    @app.route('/login-as/<int:user_id>')
+    def login_as(user_id):
+        login_user(User.query.get(user_id))
+        return 'ok'
+
+    @app.route('/_dash-update-component', methods=['POST'])
+    def dash_update():
+        return jsonify({'user': current_user.id, 'role': current_user.role})
+
+    return app
+
+def record_loader(user_id):
+    user = User.query.get(user_id)
+    return CachedUser(user.id, user.username, user.role) if user else None
+
+def run_burst(app, requests):
+    client = app.test_client()
+    client.get('/login-as/1')
+
+    def burst():
+        for _ in range(requests):
+            client.post('/_dash-update-component', json={})
+
+    with app.app_context():
+        engine = db.engine
+    queries = count_queries(engine, burst)
+    return {'queries': queries, 'queries_per_request': queries / requests, 'timing': timed(burst, repeat=3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--database-url', default=default_database_url('user_loader'))
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    seed_app = make_app(args.database_url)
+    with seed_app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='rep00001', role='user')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+    results = {'requests': args.requests}
+
+    plain = run_burst(build_app(args.database_url, lambda user_id: User.query.get(int(user_id))), args.requests)
+    cache = UserCache(record_loader, ttl=60, shared_dir=tempfile.mkdtemp())
+    cached = run_burst(build_app(args.database_url, cache.get), args.requests)
+
+    results['queries per callback: User.query.get'] = plain['queries_per_request']
+    results['queries per callback: UserCache'] = cached['queries_per_request']
+    results['burst: User.query.get'] = plain['timing']
+    results['burst: UserCache'] = cached['timing']
+    results['cache'] = cache.stats()
+
+    report('user_loader per callback', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Shared helpers for the benchmark scripts
+Run scripts from the repository root, e.g. python benchmarks/bench_admin_stats.py
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Make the app modules importable when run as a script
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def default_database_url(name):
+    """SQLite file in the temp directory (override with BENCH_DATABASE_URL)"""
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if url:
+        return url.replace('postgres://', 'postgresql://', 1)
+    return 'sqlite:///' + os.path.join(tempfile.gettempdir(), f'tol_bench_{name}.db')
+
+def make_app(database_url):
+    """Minimal Flask app bound to models.db (no dataset loading)"""
+    from flask import Flask
+    from models import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def count_queries(engine, func):
+    """Number of SQL statements executed on engine by func()"""
+    from sqlalchemy import event
+
+    statements = []
+    listener = lambda *args, **kwargs: statements.append(1)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+def timed(func, repeat=5):
+    """
+    Run func `repeat` times
+
+    Returns:
+        dict with min/median/max seconds and the last result
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    return {
+        'min_s': min(durations),
+        'median_s': statistics.median(durations),
+        'max_s': max(durations),
+        'repeat': repeat,
+        'result': result,
+    }
+
+def report(name, results, output=None, meta=None):
+    """Print results and optionally write them as JSON (meta: run parameters)"""
+    print(f"\n=== {name} ===")
+    for key, value in results.items():
+        if isinstance(value, dict) and 'median_s' in value:
+            print(f"{key:45s} median {value['median_s'] * 1000:10.2f} ms  "
+                  f"(min {value['min_s'] * 1000:.2f}, max {value['max_s'] * 1000:.2f})")
+        else:
+            print(f"{key:45s} {value}")
+    if output:
+        serializable = {
+            key: ({k: v for k, v in value.items() if k != 'result'} if isinstance(value, dict) else value)
+            for key, value in results.items()
+        }
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': name, 'meta': meta or {}, 'results': serializable}, f, indent=2, default=str)
+        print(f"Results written to {output}")
+
+def load_results(path):
+    """Results dict of a JSON file written by report()"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Print median timings of two report() JSON documents side by side
+
+    Args:
+        baseline, current: dicts as written by report()
+        threshold: Relative slowdown reported as a regression (0.10 = 10%)
+
+    Returns:
+        List of keys that regressed by more than threshold
+    """
+    regressions = []
+    print(f"\n=== {current.get('benchmark')} vs baseline ===")
+    for key, value in current['results'].items():
+        old = baseline['results'].get(key)
+        if not (isinstance(value, dict) and 'median_s' in value and isinstance(old, dict) and 'median_s' in old):
+            continue
+        change = (value['median_s'] - old['median_s']) / old['median_s'] if old['median_s'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  ❌ slower'
+            regressions.append(key)
+        elif change < -threshold:
+            flag = '  ✅ faster'
+        print(f"{key:45s} {old['median_s'] * 1000:10.2f} -> {value['median_s'] * 1000:10.2f} ms  ({change:+.1%}){flag}")
+    return regressions
@@ -0,0 +1,28 @@
+"""
+Compare two benchmark JSON files written with --output
+
+Exits with status 1 when any timing is slower than the threshold, so it
+can gate a CI job.
+
+Usage:
+    python benchmarks/compare_results.py before.json after.json --threshold 0.1
+"""
+import argparse
+import sys
+
+from common import compare_results, load_results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Generate a synthetic Prepared_True_Dataset_Updated.csv
+
+Same columns and value quirks as the real file: a Province -> District ->
+Sub-district -> Happy Block hierarchy with Thai names, lat/lon clustered
+around each sub-district, port counts, market shares that sum to at most
+100, and messy %Port_Utilize / date / market-share strings. Output is
+deterministic for a given --seed and --rows.
+
+Usage:
+    python benchmarks/generate_dataset.py --rows 100000 --output /tmp/tol_100k.csv
+    DATASET_PATH=/tmp/tol_100k.csv python app_sales_v2.py
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# (province, centre latitude, centre longitude, weight) - weight ~ share of ports
+PROVINCES = [
+    ('กรุงเทพมหานคร', 13.7563, 100.5018, 18),
+    ('นนทบุรี', 13.8621, 100.5144, 6),
+    ('ปทุมธานี', 14.0208, 100.5250, 5),
+    ('สมุทรปราการ', 13.5991, 100.5998, 5),
+    ('ชลบุรี', 13.3611, 100.9847, 6),
+    ('ระยอง', 12.6814, 101.2816, 3),
+    ('นครปฐม', 13.8199, 100.0443, 3),
+    ('สมุทรสาคร', 13.5475, 100.2744, 3),
+    ('พระนครศรีอยุธยา', 14.3532, 100.5684, 2),
+    ('ฉะเชิงเทรา', 13.6904, 101.0780, 2),
+    ('นครราชสีมา', 14.9799, 102.0977, 5),
+    ('ขอนแก่น', 16.4419, 102.8360, 4),
+    ('อุดรธานี', 17.4138, 102.7872, 3),
+    ('อุบลราชธานี', 15.2287, 104.8564, 3),
+    ('เชียงใหม่', 18.7883, 98.9853, 5),
+    ('เชียงราย', 19.9105, 99.8406, 2),
+    ('พิษณุโลก', 16.8211, 100.2659, 2),
+    ('นครสวรรค์', 15.7047, 100.1372, 2),
+    ('สงขลา', 7.1897, 100.5954, 4),
+    ('ภูเก็ต', 7.8804, 98.3923, 3),
+    ('สุราษฎร์ธานี', 9.1382, 99.3215, 3),
+    ('นครศรีธรรมราช', 8.4304, 99.9631, 3),
+    ('ประจวบคีรีขันธ์', 11.8126, 99.7957, 2),
+    ('กาญจนบุรี', 14.0228, 99.5328, 2),
+]
+
+DISTRICT_NAMES = [
+    'บางพลี', 'บางใหญ่', 'ปากเกร็ด', 'บางบัวทอง', 'สามพราน', 'ลำลูกกา', 'ธัญบุรี', 'คลองหลวง',
+    'บ้านโป่ง', 'ศรีราชา', 'บางละมุง', 'สัตหีบ', 'หาดใหญ่', 'สะเดา', 'แม่ริม', 'สันทราย',
+    'หางดง', 'บ้านไผ่', 'ชุมแพ', 'พิมาย', 'ปากช่อง', 'วารินชำราบ', 'กระทุ่มแบน', 'บางปะอิน',
+]
+SUBDISTRICT_PREFIXES = ['บาง', 'หนอง', 'บ้าน', 'ท่า', 'โคก', 'ดอน', 'คลอง', 'นา', 'ห้วย', 'วัง', 'สวน', 'ทุ่ง']
+SUBDISTRICT_SUFFIXES = ['ใหญ่', 'น้อย', 'แก้ว', 'ทอง', 'ใหม่', 'เก่า', 'หลวง', 'พระ', 'ขาม', 'ม่วง', 'ไผ่', 'กลาง']
+
+PORT_CAPACITIES = [8, 16, 32, 64]
+SPEEDS = [100, 300, 500, 1000]
+ROWS_PER_HAPPY_BLOCK = 25
+
+def build_hierarchy(rng, rows):
+    """
+    Sub-district table: province, district, sub-district, centre and weight
+
+    The number of districts / sub-districts grows with the row count so
+    both small and national-scale files have a realistic fan-out.
+    """
+    scale = min(max(rows / 100000, 0.2), 4.0)
+    records = []
+    for province, lat, lon, weight in PROVINCES:
+        n_districts = max(2, int(rng.integers(4, 12) * scale ** 0.5))
+        names = [f'เมือง{province}'] + [
+            f'{DISTRICT_NAMES[(i * 7 + len(province)) % len(DISTRICT_NAMES)]}'
+            + (f' {i // len(DISTRICT_NAMES) + 1}' if i >= len(DISTRICT_NAMES) else '')
+            for i in range(n_districts - 1)
+        ]
+        for d, district in enumerate(names):
+            d_lat = lat + (0 if d == 0 else rng.normal(0, 0.15))
+            d_lon = lon + (0 if d == 0 else rng.normal(0, 0.15))
+            n_sub = max(2, int(rng.integers(4, 10) * scale ** 0.5))
+            combos = rng.choice(len(SUBDISTRICT_PREFIXES) * len(SUBDISTRICT_SUFFIXES), size=n_sub, replace=False)
+            for combo in combos:
+                name = SUBDISTRICT_PREFIXES[combo // len(SUBDISTRICT_SUFFIXES)] + SUBDISTRICT_SUFFIXES[combo % len(SUBDISTRICT_SUFFIXES)]
+                records.append((
+                    province, district, name,
+                    d_lat + rng.normal(0, 0.03), d_lon + rng.normal(0, 0.03),
+                    # the provincial capital district is denser
+                    weight * (3.0 if d == 0 else 1.0) * rng.uniform(0.5, 1.5),
+                ))
+    return pd.DataFrame(records, columns=['Province', 'District', 'Sub-district', 'lat', 'lon', 'weight'])
+
+def _messy_percent(rng, values):
+    """'%Port_Utilize' as exported: '45.31%', plain numbers, '-', ' -   ' and blanks"""
+    out = np.char.add(np.round(values, 2).astype(str), '%').astype(object)
+    kind = rng.random(len(values))
+    out[kind < 0.10] = np.round(values[kind < 0.10], 2)
+    out[(kind >= 0.10) & (kind < 0.13)] = '-'
+    out[(kind >= 0.13) & (kind < 0.15)] = ' -   '
+    out[(kind >= 0.15) & (kind < 0.16)] = ' '
+    return out
+
+def generate_chunk(rng, hierarchy, rows, offset, chunk_no=0):
+    """
+    `rows` synthetic ports, grouped by sub-district
+
+    Ports of one Happy Block (ROWS_PER_HAPPY_BLOCK of them) are neighbours in
+    the same sub-district; `offset` / `chunk_no` keep ids unique across chunks.
+    """
+    probabilities = hierarchy['weight'].to_numpy() / hierarchy['weight'].sum()
+    sub = np.sort(rng.choice(len(hierarchy), size=rows, p=probabilities))
+    h = hierarchy.iloc[sub].reset_index(drop=True)
+    block = (np.arange(rows) - np.searchsorted(sub, sub)) // ROWS_PER_HAPPY_BLOCK
+
+    ids = np.arange(offset, offset + rows)
+    capacity = rng.choice(PORT_CAPACITIES, size=rows, p=[0.2, 0.45, 0.25, 0.1])
+    use = np.minimum((capacity * rng.beta(2, 2, size=rows)).astype(int), capacity)
+    use[rng.random(rows) < 0.005] = -1   # negative counts exist in the export
+    utilize = np.clip(use, 0, None) / capacity * 100
+
+    shares = rng.dirichlet([4, 3, 2, 1], size=rows) * rng.uniform(60, 100, size=(rows, 1))
+    market_share_true = np.round(shares[:, 0], 2).astype(object)
+    market_share_true[rng.random(rows) < 0.02] = '-'
+
+    days = rng.integers(0, 10 * 365, size=rows)
+    inservice = (pd.Timestamp('2015-01-01') + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    inservice[rng.random(rows) < 0.03] = ''
+
+    household = rng.integers(20, 2000, size=rows)
+    return pd.DataFrame({
+        'Province': h['Province'],
+        'District': h['District'],
+        'Sub-district': h['Sub-district'],
+        'Happy Block': [f'HB-{s:05d}-{chunk_no:03d}{b:04d}' for s, b in zip(sub, block)],
+        'L2': [f'L2-{n:08d}' for n in ids],
+        'Latitude': np.round(h['lat'].to_numpy() + rng.normal(0, 0.006, size=rows), 6),
+        'Longitude': np.round(h['lon'].to_numpy() + rng.normal(0, 0.006, size=rows), 6),
+        'Household': household,
+        'Install': np.minimum(rng.poisson(household * 0.15), household),
+        'Port Capacity': capacity,
+        'Port Use': use,
+        'Port Available': capacity - np.clip(use, 0, None),
+        '%Port_Utilize': _messy_percent(rng, utilize),
+        'Net Add': rng.integers(-20, 61, size=rows),
+        'Market Share True (%)': market_share_true,
+        'Market Share AIS (%)': np.round(shares[:, 1], 2),
+        'Market Share 3BB (%)': np.round(shares[:, 2], 2),
+        'Market Share NT (%)': np.round(shares[:, 3], 2),
+        'True Speed': rng.choice(SPEEDS, size=rows),
+        'Competitor Speed': rng.choice(SPEEDS, size=rows),
+        'L2 Inservice date': inservice,
+        'Potential Score': np.round(rng.uniform(0, 100, size=rows), 1),  # recomputed by preprocess_data
+    })
+
+def generate_dataset(rows, output, seed=42, chunk_rows=250000):
+    """
+    Write `rows` synthetic rows to `output` (CSV, written in chunks)
+
+    Returns:
+        Path of the written file
+    """
+    rng = np.random.default_rng(seed)
+    hierarchy = build_hierarchy(rng, rows)
+    tmp = output + '.tmp'
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        chunk = generate_chunk(rng, hierarchy, n, written, written // chunk_rows)
+        chunk.to_csv(tmp, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += n
+    os.replace(tmp, output)
+    return output
+
+def default_output(rows, seed=42):
+    return os.path.join(tempfile.gettempdir(), f'tol_dataset_{rows}_{seed}.csv')
+
+def ensure_dataset(rows, seed=42, path=None):
+    """Path of a generated dataset, generating it only if it does not exist yet"""
+    path = path or default_output(rows, seed)
+    if not os.path.exists(path):
+        generate_dataset(rows, path, seed)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='1,000 to 5,000,000')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='CSV path (default: temp directory)')
+    args = parser.parse_args()
+
+    if not 1000 <= args.rows <= 5000000:
+        parser.error('--rows must be between 1,000 and 5,000,000')
+
+    output = args.output or default_output(args.rows, args.seed)
+    started = time.perf_counter()
+    generate_dataset(args.rows, output, args.seed)
+    size_mb = os.path.getsize(output) / 1024 / 1024
+    print(f"✅ {args.rows:,} rows written to {output} ({size_mb:.1f} MB, {time.perf_counter() - started:.1f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Seed a database with synthetic users and activity_logs rows
+
+Rows are spread evenly over the last `--months` months. On PostgreSQL rows
+are loaded with COPY, elsewhere with batched INSERTs.
+
+Usage:
+    python benchmarks/seed_logs.py --rows 10000000 --users 500 --months 24
+"""
+import argparse
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+
+from common import default_database_url, make_app
+
+from sqlalchemy import insert
+
+from models import db, User, ActivityLog
+
+ACTIONS = ['login'] * 2 + ['view_dashboard'] * 6 + ['logout', 'export']
+USER_AGENT = 'Mozilla/5.0 (Linux; Android 14) Mobile Safari/537.36'
+
+def _rows(count, user_ids, start, span_seconds):
+    for _ in range(count):
+        yield (
+            random.choice(user_ids),
+            random.choice(ACTIONS),
+            None,
+            f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}',
+            USER_AGENT,
+            start + timedelta(seconds=random.randint(0, span_seconds)),
+        )
+
+def _copy_chunk(rows):
+    """Load one chunk with PostgreSQL COPY"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user_id, action, details, ip, agent, ts in rows:
+        writer.writerow([user_id, action, '' if details is None else details, ip, agent, ts.isoformat(sep=' ')])
+    buffer.seek(0)
+
+    raw = db.session.connection().connection
+    with raw.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY activity_logs (user_id, action, details, ip_address, user_agent, timestamp) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+def _insert_chunk(rows):
+    db.session.execute(insert(ActivityLog), [{
+        'user_id': user_id, 'action': action, 'details': details,
+        'ip_address': ip, 'user_agent': agent, 'timestamp': ts
+    } for user_id, action, details, ip, agent, ts in rows])
+
+def seed_activity_logs(rows, users=500, months=24, chunk=50000, reset=True):
+    """
+    Create `users` users and `rows` activity log rows (inside an app context)
+
+    Returns:
+        list of user ids
+    """
+    if reset:
+        db.drop_all()
+        db.create_all()
+
+    db.session.execute(insert(User), [
+        {'username': f'rep{i:05d}', 'password_hash': 'x', 'role': 'user'}
+        for i in range(users)
+    ])
+    db.session.commit()
+    user_ids = [uid for (uid,) in db.session.query(User.id)]
+
+    span = timedelta(days=30 * months)
+    start = datetime.utcnow() - span
+    load_chunk = _copy_chunk if db.engine.dialect.name == 'postgresql' else _insert_chunk
+
+    for offset in range(0, rows, chunk):
+        load_chunk(list(_rows(min(chunk, rows - offset), user_ids, start, int(span.total_seconds()))))
+        db.session.commit()
+        print(f"  seeded {min(offset + chunk, rows):,} / {rows:,}", end='\r')
+    print()
+    return user_ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--database-url', default=default_database_url('logs'))
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        print(f"Seeding {args.users} users / {args.rows:,} activity rows over {args.months} months into {args.database_url}")
+        seed_activity_logs(args.rows, args.users, args.months)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Compact columnar encoding of the dataset for client-side filtering
+Numeric columns are shipped as base64 little-endian typed arrays and the
+location hierarchy as categorical codes, so the browser can filter without
+a server round-trip. Only selections of at most CLIENTSIDE_MAX_ROWS rows are
+shipped (the whole dataset, or the selected province); larger selections
+fall back to the server callbacks.
+"""
+import base64
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Location hierarchy (categorical codes + category list)
+CATEGORY_COLUMNS = ['Province', 'District', 'Sub-district', 'Happy Block']
+
+# Filterable / displayed numeric columns (Float32Array in the browser)
+NUMERIC_COLUMNS = [
+    'Latitude',
+    'Longitude',
+    'Port Use',
+    'Port Available',
+    'Net Add',
+    'Potential Score',
+    '%Port_Utilize',
+    'Market Share True (%)',
+    'L2_Aging_Months',
+]
+
+def _encode_array(values, dtype):
+    """Encode a numpy array as {'dtype', 'data'} with base64 little-endian bytes"""
+    arr = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {
+        'dtype': np.dtype(dtype).name,
+        'data': base64.b64encode(arr.tobytes()).decode('ascii')
+    }
+
+def _encode_category(series):
+    """Encode a text column as sorted categories + integer codes (-1 = missing)"""
+    codes, categories = pd.factorize(series, sort=True)
+    dtype = 'int16' if len(categories) < np.iinfo(np.int16).max else 'int32'
+    encoded = _encode_array(codes, dtype)
+    encoded['categories'] = [str(c) for c in categories]
+    return encoded
+
+def encode_columnar(data, version, scope=None):
+    """
+    Build the payload stored in the `client-dataset` dcc.Store
+
+    Args:
+        data: Preprocessed dataset (or the rows of `scope`)
+        version: Dataset version (the browser re-downloads only when it changes)
+        scope: Province the rows are limited to (None = whole dataset)
+
+    Returns:
+        JSON-serializable dict
+    """
+    columns = {}
+    for col in CATEGORY_COLUMNS:
+        columns[col] = _encode_category(data[col])
+    for col in NUMERIC_COLUMNS:
+        values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        columns[col] = _encode_array(values, 'float32')
+
+    return {
+        'version': version,
+        'scope': scope,
+        'rows': int(len(data)),
+        'columns': columns,
+        'score_range': [int(data['Potential Score'].min()), int(data['Potential Score'].max())],
+        'colorscale': px.colors.sequential.YlGn,
+    }
+
+def client_mode_enabled(config):
+    """Client-side filtering is opt-in (per selection, see client_payload)"""
+    return bool(config.CLIENTSIDE_FILTERING)
+
+def store_covers(stored, version, state):
+    """True if the stored payload already answers this selection (rows or server fallback)"""
+    if not stored or stored.get('version') != version:
+        return False
+    province = (state or {}).get('province')
+    if stored.get('scope') is None:
+        # Whole dataset shipped, or too large with no province selected
+        return stored.get('columns') is not None or province is None
+    return stored['scope'] == province
+
+def client_payload(data, version, state, max_rows):
+    """
+    Payload for the browser's selection
+
+    The whole dataset when it fits, else the selected province's rows when
+    they fit, else a marker without columns: the browser then hands the
+    filter state to the server callbacks.
+    """
+    if len(data) <= max_rows:
+        return encode_columnar(data, version)
+    province = (state or {}).get('province')
+    if province:
+        rows = data[data['Province'] == province]
+        if len(rows) <= max_rows:
+            return encode_columnar(rows, version, scope=province)
+    return {'version': version, 'scope': province or None, 'rows': int(len(data)), 'columns': None}
@@ -31,9 +31,139 @@ class Config:
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 8051))
 
+    # Gunicorn (also read by the Procfile / render.yaml start command)
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 2))
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+
+    # Database connection pool (per worker); DB_POOL_SIZE=0 derives it from
+    # GUNICORN_THREADS + DB_POOL_BACKGROUND_CONNECTIONS (see db_pool.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+    DB_POOL_BACKGROUND_CONNECTIONS = int(os.environ.get('DB_POOL_BACKGROUND_CONNECTIONS', 2))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 2))
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 0))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))
+    # pre_ping checks every checkout (one round-trip); with DB_POOL_PRE_PING=False a
+    # background thread pings one connection per interval instead (opt-in, weaker)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True') == 'True'
+    DB_POOL_LIVENESS_INTERVAL = int(os.environ.get('DB_POOL_LIVENESS_INTERVAL', 30))
+
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
 
+    # Activity log writer (queued in memory, bulk-inserted by a background thread)
+    LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 100))
+    LOG_FLUSH_INTERVAL_MS = int(os.environ.get('LOG_FLUSH_INTERVAL_MS', 500))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_ENQUEUE_TIMEOUT_MS = int(os.environ.get('LOG_ENQUEUE_TIMEOUT_MS', 50))
+
+    # Log tables: monthly range partitions on PostgreSQL (see schema_upgrade.py)
+    LOG_PARTITIONING = os.environ.get('LOG_PARTITIONING', 'True') == 'True'
+    LOG_PARTITION_MONTHS_AHEAD = int(os.environ.get('LOG_PARTITION_MONTHS_AHEAD', 3))
+    RECENT_ACTIVITY_DAYS = int(os.environ.get('RECENT_ACTIVITY_DAYS', 30))
+
+    # Log retention: rows older than N days move to monthly Parquet archives (see log_retention.py)
+    LOG_RETENTION_ENABLED = os.environ.get('LOG_RETENTION_ENABLED', 'False') == 'True'
+    LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 180))
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'logs'))
+    LOG_ARCHIVE_BATCH_SIZE = int(os.environ.get('LOG_ARCHIVE_BATCH_SIZE', 5000))
+
+    # State shared by the workers of one host (version stamps, counters)
+    SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'shared'))
+
+    # Password hashing (werkzeug method string; stored hashes with other
+    # parameters are rehashed on the next successful login)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # Login-time hashing runs in a small process pool; beyond the pending limit logins get a 503
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', 2))
+    PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 16))
+    PASSWORD_POOL_TIMEOUT = int(os.environ.get('PASSWORD_POOL_TIMEOUT', 10))
+
+    # Login throttling: token buckets per IP and per username ('memory' or
+    # 'sqlite' to share them between workers through SHARED_STATE_DIR)
+    LOGIN_RATE_BACKEND = os.environ.get('LOGIN_RATE_BACKEND', 'memory')
+    LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', 20))
+    LOGIN_RATE_IP_PER_MINUTE = int(os.environ.get('LOGIN_RATE_IP_PER_MINUTE', 10))
+    LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', 10))
+    LOGIN_RATE_USER_PER_MINUTE = int(os.environ.get('LOGIN_RATE_USER_PER_MINUTE', 5))
+    # Reverse proxies in front of the app (Render: 1) whose X-Forwarded-For / -Proto
+    # are trusted; 0 = use the socket address (direct access, development)
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+    # Failed logins are written as one summary row per interval (seconds)
+    FAILED_LOGIN_SUMMARY_INTERVAL = int(os.environ.get('FAILED_LOGIN_SUMMARY_INTERVAL', 60))
+
+    # Logged-in users are cached per worker by the user_loader (seconds)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Session heartbeats: persisted at most once per interval, swept in the background
+    SESSION_PERSIST_INTERVAL = int(os.environ.get('SESSION_PERSIST_INTERVAL', 60))
+    SESSION_TIMEOUT_MINUTES = int(os.environ.get('SESSION_TIMEOUT_MINUTES', 30))
+    ONLINE_WINDOW_MINUTES = int(os.environ.get('ONLINE_WINDOW_MINUTES', 5))
+    ONLINE_COUNT_REFRESH = int(os.environ.get('ONLINE_COUNT_REFRESH', 5))
+
+    # Page view counters are kept in memory and flushed every N seconds
+    PAGE_VIEW_FLUSH_INTERVAL = int(os.environ.get('PAGE_VIEW_FLUSH_INTERVAL', 10))
+
+    # Client-side filtering (opt-in): ship the dataset (or the selected province) to the browser
+    # once per session; selections above CLIENTSIDE_MAX_ROWS rows are filtered on the server
+    CLIENTSIDE_FILTERING = os.environ.get('CLIENTSIDE_FILTERING', 'False') == 'True'
+    CLIENTSIDE_MAX_ROWS = int(os.environ.get('CLIENTSIDE_MAX_ROWS', 20000))
+
+    # /api/dataset files (Arrow IPC / Parquet) cached on disk per dataset version
+    DATASET_FILE_CACHE_DIR = os.environ.get('DATASET_FILE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'dataset_cache'))
+    DATASET_FILE_CACHE_MAX = int(os.environ.get('DATASET_FILE_CACHE_MAX', 200))
+
+    # /tiles/{z}/{x}/{y}.mvt vector tiles (LRU per worker + on-disk store per dataset version)
+    TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'tile_cache'))
+    TILE_CACHE_SIZE = int(os.environ.get('TILE_CACHE_SIZE', 512))
+    TILE_MAX_FEATURES = int(os.environ.get('TILE_MAX_FEATURES', 5000))
+    # Region (west,south,east,north) whose tiles up to TILE_PREWARM_MAX_ZOOM are generated at startup
+    # when MAP_VECTOR_TILES is on (-1 = off)
+    TILE_PREWARM_BOUNDS = os.environ.get('TILE_PREWARM_BOUNDS', '97.3,5.6,105.7,20.5')
+    TILE_PREWARM_MAX_ZOOM = int(os.environ.get('TILE_PREWARM_MAX_ZOOM', 6))
+    # Map: above MAP_INLINE_MAX_POINTS filtered points, draw the rest from the vector tiles
+    MAP_VECTOR_TILES = os.environ.get('MAP_VECTOR_TILES', 'False') == 'True'
+    MAP_INLINE_MAX_POINTS = int(os.environ.get('MAP_INLINE_MAX_POINTS', 5000))
+
+    # Background jobs (exports / reports): job table in SHARED_STATE_DIR, output files in JOB_RESULT_DIR
+    JOBS_ENABLED = os.environ.get('JOBS_ENABLED', 'True') == 'True'
+    JOB_RESULT_DIR = os.environ.get('JOB_RESULT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs'))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))               # pool processes per gunicorn worker
+    JOB_MAX_CONCURRENT = int(os.environ.get('JOB_MAX_CONCURRENT', 1))  # running jobs per host
+    JOB_MAX_ACTIVE_PER_USER = int(os.environ.get('JOB_MAX_ACTIVE_PER_USER', 3))
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 60))
+    JOB_RESULT_TTL_HOURS = int(os.environ.get('JOB_RESULT_TTL_HOURS', 24))
+    # /dashboard/export builds an XLSX completely before sending it: larger ones must be jobs
+    EXPORT_XLSX_MAX_ROWS = int(os.environ.get('EXPORT_XLSX_MAX_ROWS', 50000))
+
+    # Latency instrumentation: Server-Timing header on every response and the
+    # last LATENCY_WINDOW durations per callback / route for the admin percentiles
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'True') == 'True'
+    LATENCY_WINDOW = int(os.environ.get('LATENCY_WINDOW', 1000))
+
+    # Prometheus /metrics: each worker writes its snapshot to SHARED_STATE_DIR/metrics
+    # every METRICS_WRITE_INTERVAL seconds. Served only with METRICS_TOKEN set, as
+    # "Authorization: Bearer <token>" (404 while the token is empty)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_WRITE_INTERVAL = int(os.environ.get('METRICS_WRITE_INTERVAL', 15))
+    METRICS_STALE_SECONDS = int(os.environ.get('METRICS_STALE_SECONDS', 60))
+
+    # SQL profiler: statements >= QUERY_SLOW_MS go to QUERY_SLOW_LOG (values redacted;
+    # empty = stdout), requests over their query budget (QUERY_BUDGET_DEFAULT when a
+    # route has none, 0 = unlimited) are reported - or raise with QUERY_BUDGET_STRICT
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', 'True') == 'True'
+    QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 200))
+    QUERY_SLOW_LOG = os.environ.get('QUERY_SLOW_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'slow_queries.log'))
+    QUERY_BUDGET_DEFAULT = int(os.environ.get('QUERY_BUDGET_DEFAULT', 0))
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False') == 'True'
+    QUERY_DUPLICATE_THRESHOLD = int(os.environ.get('QUERY_DUPLICATE_THRESHOLD', 3))
+
+    # Filtered row-sets cached per worker (shared by map, table and header callbacks)
+    FILTER_CACHE_SIZE = int(os.environ.get('FILTER_CACHE_SIZE', 64))
+    # ...holding at most this many row positions in total (4 bytes each)
+    FILTER_CACHE_MAX_ROWS = int(os.environ.get('FILTER_CACHE_MAX_ROWS', 10000000))
+
     @staticmethod
     def init_app(app):
         """Initialize application with config"""
@@ -0,0 +1,120 @@
+"""
+Dataset loading and preprocessing for the sales dashboard
+Keeps one preprocessed snapshot per process, identified by a content version
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Use relative path that works on both Windows and Linux (override with DATASET_PATH)
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), 'Prepared_True_Dataset_Updated.csv')
+
+MARKET_SHARE_COLS = ['Market Share True (%)', 'Market Share AIS (%)', 'Market Share 3BB (%)', 'Market Share NT (%)']
+
+def get_data_path():
+    """Get dataset path (DATASET_PATH environment variable or bundled CSV)"""
+    return os.environ.get('DATASET_PATH', DEFAULT_DATA_PATH)
+
+def preprocess_data(data):
+    """
+    Clean raw columns and calculate Potential Score
+
+    Args:
+        data: Raw DataFrame read from Prepared_True_Dataset_Updated.csv
+
+    Returns:
+        The same DataFrame with derived columns added
+    """
+    if '%Port_Utilize' not in data.columns:
+        data['%Port_Utilize'] = 0.0
+    else:
+        data['%Port_Utilize'] = data['%Port_Utilize'].replace(['-', ' -   ', ' '], np.nan)
+        data['%Port_Utilize'] = data['%Port_Utilize'].apply(
+            lambda x: str(x).rstrip('%') if isinstance(x, str) else x
+        ).apply(pd.to_numeric, errors='coerce')
+        data['%Port_Utilize'] = data['%Port_Utilize'].fillna(0)
+
+    for col in MARKET_SHARE_COLS:
+        data[col] = pd.to_numeric(data[col], errors='coerce').fillna(0)
+
+    data['L2 Inservice date'] = pd.to_datetime(data['L2 Inservice date'], errors='coerce')
+    current_date = datetime.now()
+    data['L2_Aging_Months'] = data['L2 Inservice date'].apply(
+        lambda x: (current_date.year - x.year) * 12 + (current_date.month - x.month) if pd.notnull(x) else None
+    )
+
+    data['Port Use'] = data['Port Use'].apply(lambda x: max(x, 0) if pd.notnull(x) else 0)
+    data['Potential Score'] = data['Potential Score'].apply(lambda x: max(x, 0) if pd.notnull(x) else 0)
+
+    # Calculate Household Density
+    data['Household Density'] = data['Household'] / 0.25
+    data['Installation Density'] = data['Install'] / data['Install'].sum()
+
+    # Normalize factors
+    data['Normalized Household Density'] = (data['Household Density'] - data['Household Density'].min()) / (data['Household Density'].max() - data['Household Density'].min())
+    data['Normalized Installation Density'] = (data['Installation Density'] - data['Installation Density'].min()) / (data['Installation Density'].max() - data['Installation Density'].min())
+    data['Normalized Net Add'] = (data['Net Add'] - data['Net Add'].min()) / (data['Net Add'].max() - data['Net Add'].min())
+    data['Normalized Market Share'] = (data['Market Share True (%)'] - data['Market Share True (%)'].min()) / (data['Market Share True (%)'].max() - data['Market Share True (%)'].min())
+    data['Normalized True Speed'] = (data['True Speed'] - data['True Speed'].min()) / (data['True Speed'].max() - data['True Speed'].min())
+
+    # Recalculate Potential Score
+    data['Potential Score'] = (
+        0.4 * data['Normalized Household Density'] +
+        0.25 * data['Normalized Installation Density'] +
+        0.2 * data['Normalized Net Add'] +
+        0.05 * data['Normalized Market Share'] +
+        0.1 * data['Normalized True Speed']
+    ) * 100
+
+    # Adjust Potential Score to increment by 5%
+    data['Potential Score'] = (data['Potential Score'] / 5).apply(np.ceil) * 5
+
+    return data
+
+class Dataset:
+    """Preprocessed dataset snapshot"""
+
+    def __init__(self, data, version, path, load_seconds):
+        self.data = data
+        self.version = version
+        self.path = path
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.utcnow()
+
+    def __repr__(self):
+        return f'<Dataset {self.version} rows={len(self.data)}>'
+
+def load_dataset(path=None):
+    """
+    Read and preprocess the dataset
+
+    The version is a hash of the raw file content, so it only changes
+    when a new CSV is deployed.
+    """
+    path = path or get_data_path()
+    started = time.perf_counter()
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha1(raw).hexdigest()[:12]
+    data = preprocess_data(pd.read_csv(io.BytesIO(raw)))
+
+    return Dataset(data, version, path, time.perf_counter() - started)
+
+_dataset = None
+_dataset_lock = threading.Lock()
+
+def get_dataset():
+    """Get the process-wide dataset snapshot (loaded on first use)"""
+    global _dataset
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None:
+                _dataset = load_dataset()
+    return _dataset
@@ -0,0 +1,159 @@
+"""
+Bulk dataset downloads as Arrow IPC streams or Parquet files
+The scored snapshot is converted to an Arrow table once per dataset version;
+column projection and hierarchy filters are applied on that table and each
+distinct result is written once to a per-version disk cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from filter_engine import HIERARCHY_FILTERS
+
+# Arrow / Parquet output needs pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+FORMATS = {
+    'arrow': ('arrows', 'application/vnd.apache.arrow.stream'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+def _column_array(series):
+    """Arrow array for a pandas column (object columns with mixed types become strings)"""
+    try:
+        return pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.astype(str).where(series.notna(), None), from_pandas=True)
+
+class DatasetFiles:
+    """Per-version Arrow snapshot plus a bounded disk cache of exported files"""
+
+    def __init__(self, cache_dir, max_files=200):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._table = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def arrow_table(self, dataset):
+        """Arrow table for the dataset snapshot (numeric columns share the numpy buffers)"""
+        with self._lock:
+            if self._version != dataset.version:
+                data = dataset.data
+                self._table = pa.Table.from_arrays(
+                    [_column_array(data[col]) for col in data.columns],
+                    names=[str(col) for col in data.columns]
+                )
+                self._version = dataset.version
+            return self._table
+
+    def columns(self, dataset):
+        return [str(col) for col in dataset.data.columns]
+
+    def cache_key(self, version, fmt, columns, state):
+        payload = json.dumps({
+            'version': version,
+            'format': fmt,
+            'columns': columns,
+            'filters': {key: state.get(key) for key, _ in HIERARCHY_FILTERS},
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, dataset, fmt, columns=None, state=None):
+        """
+        Path of the file for this dataset version / format / projection / filters
+
+        Args:
+            fmt: 'arrow' (IPC stream) or 'parquet'
+            columns: Column names to keep (None = all)
+            state: Filter state; only the hierarchy levels are applied
+
+        Returns:
+            (path, cache_key)
+        """
+        state = state or {}
+        columns = list(columns) if columns else self.columns(dataset)
+        key = self.cache_key(dataset.version, fmt, columns, state)
+        version_dir = os.path.join(self.cache_dir, dataset.version)
+        path = os.path.join(version_dir, f"{key}.{FORMATS[fmt][0]}")
+        try:
+            os.utime(path)  # keep recently used files when pruning
+            return path, key
+        except FileNotFoundError:
+            pass   # not written yet, or just pruned by another worker: regenerate
+
+        table = self.arrow_table(dataset)
+        mask = None
+        for filter_key, col in HIERARCHY_FILTERS:
+            value = state.get(filter_key)
+            if value:
+                column = table[col]
+                if not pa.types.is_string(column.type):
+                    column = pc.cast(column, pa.string())
+                condition = pc.equal(column, value)
+                mask = condition if mask is None else pc.and_(mask, condition)
+        table = table.select(columns)
+        if mask is not None:
+            table = table.filter(mask)
+
+        os.makedirs(version_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=version_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            if fmt == 'parquet':
+                pq.write_table(table, tmp, compression='zstd')
+            else:
+                with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self._prune(dataset.version)
+        return path, key
+
+    def _prune(self, current_version):
+        """
+        Drop other versions and keep at most max_files for this one
+
+        Other workers prune the same directory concurrently: files that
+        vanish in between are skipped, never an error for the request.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name != current_version:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+        version_dir = os.path.join(self.cache_dir, current_version)
+        files = []
+        try:
+            names = os.listdir(version_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(version_dir, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue   # removed by another worker
+        files.sort()
+        for _, path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
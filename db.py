@@ -61,7 +61,7 @@ class UserLog(db.Model):
     __tablename__ = 'user_logs'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
     event_type = db.Column(db.String(50), nullable=False, index=True)  # login, logout, navigate, filter, error
     event_data = db.Column(db.JSON)  # Additional event data
     ip_address = db.Column(db.String(45))
@@ -82,6 +82,75 @@ class UserLog(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
+class DailyEventRollup(db.Model):
+    """Daily event counts per event type / user / destination (maintained by logger)"""
+    __tablename__ = 'daily_event_rollup'
+    __table_args__ = (
+        # Upsert key; 0 / '' stand for "no user" / "no destination" so the key is never NULL
+        db.Index('uq_daily_event_rollup_key', 'day', 'event_type', 'user_id', 'destination', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    destination = db.Column(db.String(255), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyEventRollup {self.day} {self.event_type} x{self.count}>'
+
+def rollup_key(event_type, user_id, event_data, timestamp):
+    """Rollup key for one log row"""
+    destination = ''
+    if event_type == 'navigate' and isinstance(event_data, dict):
+        destination = str(event_data.get('destination') or '')[:255]
+    return (timestamp.date(), event_type, user_id or 0, destination)
+
+def update_daily_rollup(rows):
+    """
+    Add freshly written log rows to the daily rollup (one upsert)
+
+    Args:
+        rows: list of dicts with event_type, user_id, event_data, timestamp
+    """
+    from db_upsert import upsert_increment
+
+    counts = {}
+    for row in rows:
+        key = rollup_key(row['event_type'], row.get('user_id'), row.get('event_data'), row['timestamp'])
+        counts[key] = counts.get(key, 0) + 1
+
+    upsert_increment(db.session, DailyEventRollup, [
+        {'day': day, 'event_type': event_type, 'user_id': user_id, 'destination': destination, 'count': count}
+        for (day, event_type, user_id, destination), count in counts.items()
+    ], key_columns=['day', 'event_type', 'user_id', 'destination'], increment_columns=['count'])
+    db.session.commit()
+
+def rebuild_daily_rollup():
+    """Recompute the whole rollup from user_logs (aggregated in the database)"""
+    from sqlalchemy import func
+
+    destination = func.coalesce(UserLog.event_data['destination'].as_string(), '')
+    day = func.date(UserLog.timestamp)
+    rows = db.session.query(
+        day, UserLog.event_type, func.coalesce(UserLog.user_id, 0), destination, func.count(UserLog.id)
+    ).group_by(day, UserLog.event_type, UserLog.user_id, destination).all()
+
+    DailyEventRollup.query.delete()
+    counts = {}
+    for row_day, event_type, user_id, dest, count in rows:
+        if isinstance(row_day, str):
+            row_day = datetime.strptime(row_day, '%Y-%m-%d').date()
+        key = (row_day, event_type, user_id, (dest if event_type == 'navigate' else '')[:255])
+        counts[key] = counts.get(key, 0) + count
+    db.session.bulk_insert_mappings(DailyEventRollup, [
+        {'day': d, 'event_type': e, 'user_id': u, 'destination': dest, 'count': c}
+        for (d, e, u, dest), c in counts.items()
+    ])
+    db.session.commit()
+    return len(counts)
+
 class ActiveSession(db.Model):
     """Track active user sessions for online counter"""
     __tablename__ = 'active_sessions'
@@ -118,20 +187,35 @@ def init_db(app):
             db.session.commit()
             print("✅ Default admin user created: admin / admin123")
 
-        # Clean up old sessions (> 30 minutes)
+        # Backfill the daily rollup for logs written before it existed
+        if DailyEventRollup.query.first() is None and UserLog.query.first() is not None:
+            print(f"✅ Daily event rollup rebuilt: {rebuild_daily_rollup()} rows")
+
+        # Clean up old sessions (> 30 minutes); while running, the
+        # SessionTracker sweeper does this in the background
         from datetime import timedelta
         timeout = datetime.utcnow() - timedelta(minutes=30)
         ActiveSession.query.filter(ActiveSession.last_activity < timeout).delete()
         db.session.commit()
 
 def get_active_users_count():
-    """Get count of active users (last 5 minutes)"""
+    """
+    Get count of active users (last 5 minutes)
+
+    Runs a COUNT on every call; the app uses the cached
+    logger.get_online_users_count() instead.
+    """
     from datetime import timedelta
     timeout = datetime.utcnow() - timedelta(minutes=5)
     return ActiveSession.query.filter(ActiveSession.last_activity >= timeout).count()
 
 def update_session_activity(user_id, session_id):
-    """Update or create active session"""
+    """
+    Update or create active session
+
+    Writes immediately; request handlers use logger.update_user_activity(),
+    which is throttled through session_tracker.SessionTracker.
+    """
     session = ActiveSession.query.filter_by(session_id=session_id).first()
     if session:
         session.last_activity = datetime.utcnow()
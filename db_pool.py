@@ -0,0 +1,146 @@
+"""
+Database connection pool configuration and metrics
+Pool sizes are derived from the gunicorn thread count (one connection per
+request thread plus the background writers), and checkout wait times,
+saturation and connection churn are recorded for /admin/db-pool.
+"""
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+class PoolMetrics:
+    """Counters and recent checkout wait times for one process"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.liveness_failures = 0
+
+    def count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._waits.append(seconds)
+            self.checkouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            counters = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'closes': self.closes,
+                'invalidations': self.invalidations,
+                'liveness_failures': self.liveness_failures,
+            }
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p / 100.0 * len(waits)))] * 1000
+
+        counters['wait_ms'] = {
+            'samples': len(waits),
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': waits[-1] * 1000 if waits else 0.0,
+        }
+        return counters
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout (including waits for a free slot)"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.count('timeouts')
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+def engine_options(config, database_url):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS derived from config
+
+    pool_size defaults to the request threads per worker plus the background
+    writer connections; with DB_MAX_CONNECTIONS set, it is capped so that all
+    workers together stay below the database's connection limit.
+    """
+    options = {
+        'pool_pre_ping': config.DB_POOL_PRE_PING,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+    }
+    if database_url.startswith('sqlite') and ':memory:' in database_url:
+        return options
+
+    pool_size = config.DB_POOL_SIZE or config.GUNICORN_THREADS + config.DB_POOL_BACKGROUND_CONNECTIONS
+    max_overflow = config.DB_MAX_OVERFLOW
+    if config.DB_MAX_CONNECTIONS:
+        per_worker = max(1, config.DB_MAX_CONNECTIONS // max(1, config.WEB_CONCURRENCY))
+        pool_size = max(1, min(pool_size, per_worker - max_overflow))
+        max_overflow = max(0, min(max_overflow, per_worker - pool_size))
+
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config.DB_POOL_TIMEOUT,
+    })
+    return options
+
+def instrument_engine(engine):
+    """Count connects, closes and invalidations (connection churn)"""
+    event.listen(engine, 'connect', lambda *args: pool_metrics.count('connects'))
+    event.listen(engine, 'close', lambda *args: pool_metrics.count('closes'))
+    event.listen(engine, 'invalidate', lambda *args: pool_metrics.count('invalidations'))
+
+def check_liveness(engine):
+    """
+    Background liveness check for DB_POOL_PRE_PING=False (opt-in)
+
+    Pings one pooled connection; if the database dropped it, the whole pool
+    is discarded. Connections dropped between two checks still fail on the
+    first checkout, which is why pre_ping stays the default.
+    """
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    except Exception as e:
+        pool_metrics.count('liveness_failures')
+        print(f"❌ Database liveness check failed, resetting pool: {e}")
+        engine.dispose()
+
+def pool_status(engine):
+    """Current pool state plus the process metrics"""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'timeout_s': pool.timeout(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'saturation': pool.checkedout() / capacity if capacity else None,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
@@ -0,0 +1,64 @@
+"""
+Dialect-aware INSERT ... ON CONFLICT DO UPDATE helpers
+Supports PostgreSQL and SQLite (3.24+), the two databases used by the app.
+"""
+from sqlalchemy import func
+
+SUPPORTED_DIALECTS = ('postgresql', 'sqlite')
+
+def dialect_insert(session, model):
+    """Return the dialect-specific insert() construct for model's table"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert is not supported on {dialect} (supported: {', '.join(SUPPORTED_DIALECTS)})")
+    return insert(model.__table__)
+
+def _upsert(session, model, rows, key_columns, increment_columns, replace_columns):
+    table = model.__table__
+    stmt = dialect_insert(session, model).values(rows)
+    excluded = stmt.excluded
+
+    updates = {
+        col: func.coalesce(table.c[col], 0) + excluded[col]
+        for col in increment_columns
+    }
+    updates.update({col: excluded[col] for col in replace_columns})
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[col] for col in key_columns],
+        set_=updates
+    )
+    session.execute(stmt)
+
+def upsert(session, model, rows, key_columns, replace_columns):
+    """
+    Insert rows, or overwrite replace_columns when the key already exists
+
+    Args:
+        session: SQLAlchemy session
+        model: Model class (its table needs a unique index on key_columns)
+        rows: list of dicts with key and replace columns
+        key_columns: Columns of the unique index
+        replace_columns: Columns overwritten with the new value
+    """
+    if rows:
+        _upsert(session, model, rows, key_columns, (), replace_columns)
+
+def upsert_increment(session, model, rows, key_columns, increment_columns, replace_columns=()):
+    """
+    Insert rows, or add to the existing counters when the key already exists
+
+    Args:
+        session: SQLAlchemy session
+        model: Model class (its table needs a unique index on key_columns)
+        rows: list of dicts with key, increment and replace columns
+        key_columns: Columns of the unique index
+        increment_columns: Columns added to the stored value (col = col + n)
+        replace_columns: Columns overwritten with the new value
+    """
+    if rows:
+        _upsert(session, model, rows, key_columns, increment_columns, replace_columns)
@@ -0,0 +1,114 @@
+"""
+Streaming export of the filtered target list (CSV / XLSX)
+Rows are written in fixed-size chunks so memory stays flat for large exports:
+pass the full dataset plus the sorted row positions and only one chunk of
+rows is materialized at a time.
+"""
+import csv
+import io
+import tempfile
+
+# XLSX export is optional (write-only openpyxl workbook)
+try:
+    from openpyxl import Workbook
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+EXPORT_COLUMNS = [
+    'Province',
+    'District',
+    'Sub-district',
+    'Happy Block',
+    'Potential Score',
+    'Latitude',
+    'Longitude',
+    'Port Capacity',
+    'Port Use',
+    'Port Available',
+    '%Port_Utilize',
+    'Net Add',
+    'Market Share True (%)',
+    'L2_Aging_Months',
+]
+
+CHUNK_ROWS = 1000
+CHUNK_BYTES = 64 * 1024
+
+# Werkzeug appends '; charset=utf-8' to text/* mimetypes itself
+CSV_MIMETYPE = 'text/csv'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def _export_columns(rows):
+    return [col for col in EXPORT_COLUMNS if col in rows.columns]
+
+def _iter_records(rows, columns, chunk_rows=CHUNK_ROWS, progress=None, positions=None):
+    """Yield lists of plain-Python row tuples, chunk_rows at a time (rows.take(positions) if given)"""
+    total = len(rows) if positions is None else len(positions)
+    for start in range(0, total, chunk_rows):
+        if progress is not None:
+            progress(start, total)
+        if positions is None:
+            chunk = rows.iloc[start:start + chunk_rows]
+        else:
+            chunk = rows.take(positions[start:start + chunk_rows])
+        records = []
+        for values in chunk[columns].itertuples(index=False, name=None):
+            lat, lon = values[columns.index('Latitude')], values[columns.index('Longitude')]
+            navigate = f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
+            records.append([None if v != v else v for v in values] + [navigate])
+        yield records
+
+def iter_csv(rows, chunk_rows=CHUNK_ROWS, progress=None, positions=None):
+    """
+    Generate CSV text for a filtered row-set
+
+    Starts with a UTF-8 BOM so Excel shows Thai names correctly.
+    progress(rows_done, total), if given, is called before each chunk.
+    positions, if given, selects (and orders) the exported rows of `rows`.
+    """
+    columns = _export_columns(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    writer.writerow(columns + ['Navigate'])
+    for records in _iter_records(rows, columns, chunk_rows, progress, positions):
+        writer.writerows(records)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_xlsx(rows, chunk_rows=CHUNK_ROWS, progress=None, positions=None):
+    """
+    Generate XLSX bytes for a filtered row-set
+
+    Uses a write-only workbook (rows are not kept in memory) saved to a
+    temporary file, which is then streamed back in CHUNK_BYTES pieces.
+    The whole workbook is built before the first byte is sent, so large
+    XLSX exports belong in a background job (the export route caps them).
+    progress(rows_done, total), if given, is called before each chunk;
+    positions, if given, selects (and orders) the exported rows of `rows`.
+    """
+    columns = _export_columns(rows)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Targets')
+    sheet.append(columns + ['Navigate'])
+    for records in _iter_records(rows, columns, chunk_rows, progress, positions):
+        for record in records:
+            sheet.append(record)
+
+    tmp = tempfile.TemporaryFile()
+    try:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            block = tmp.read(CHUNK_BYTES)
+            if not block:
+                break
+            yield block
+    finally:
+        tmp.close()
@@ -0,0 +1,244 @@
+"""
+Shared filtering engine for the target locations
+One place that turns a filter state (hierarchy + ranges) into rows, used by
+the dashboard callbacks and any other consumer of the filtered target list.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# (filter-state key, dataset column)
+HIERARCHY_FILTERS = [
+    ('province', 'Province'),
+    ('district', 'District'),
+    ('subdistrict', 'Sub-district'),
+    ('happy_block', 'Happy Block'),
+]
+
+RANGE_FILTERS = [
+    ('net_add', 'Net Add'),
+    ('potential_score', 'Potential Score'),
+    ('port_utilize', '%Port_Utilize'),
+    ('market_share_true', 'Market Share True (%)'),
+    ('l2_aging', 'L2_Aging_Months'),
+]
+
+def normalize_filter_state(state):
+    """
+    Canonical form of a filter state
+
+    Args:
+        state: dict with hierarchy values (str or None) and [min, max] ranges
+
+    Returns:
+        dict with every known key; empty values become None and range
+        bounds become floats, so equal filters compare (and hash) equal
+    """
+    state = state or {}
+    normalized = {}
+    for key, _ in HIERARCHY_FILTERS:
+        value = state.get(key)
+        normalized[key] = str(value) if value not in (None, '') else None
+    for key, _ in RANGE_FILTERS:
+        value = state.get(key)
+        normalized[key] = [float(value[0]), float(value[1])] if value else None
+    return normalized
+
+def filter_state_key(state):
+    """Stable string key for a filter state (cache keys, ETags, dedupe)"""
+    return json.dumps(normalize_filter_state(state), sort_keys=True, ensure_ascii=False)
+
+def is_filtered(state):
+    """True if the state filters anything (some hierarchy level or range is set)"""
+    return any(value is not None for value in normalize_filter_state(state).values())
+
+def filter_state_id(state):
+    """Short id of a filter state for URLs and cache paths ('all' when unfiltered)"""
+    if not is_filtered(state):
+        return 'all'
+    return hashlib.sha256(filter_state_key(state).encode('utf-8')).hexdigest()[:16]
+
+def query_etag(version, state, **params):
+    """
+    Strong ETag for a query over one dataset version
+
+    Args:
+        version: Dataset version (changes whenever the CSV changes)
+        state: Filter state (normalized, so equivalent queries share a tag)
+        params: Other response-shaping parameters (page, fields, ...)
+    """
+    payload = json.dumps({
+        'version': version,
+        'filters': normalize_filter_state(state),
+        'params': params,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def apply_filters(data, state):
+    """
+    Apply hierarchy and range filters
+
+    A range of None means "no filter" for that column. Rows with a missing
+    value never match a range (same as the pandas comparison).
+    """
+    state = normalize_filter_state(state)
+    mask = None
+
+    for key, col in HIERARCHY_FILTERS:
+        if state[key] is not None:
+            condition = data[col] == state[key]
+            mask = condition if mask is None else mask & condition
+
+    for key, col in RANGE_FILTERS:
+        if state[key] is not None:
+            low, high = state[key]
+            condition = (data[col] >= low) & (data[col] <= high)
+            mask = condition if mask is None else mask & condition
+
+    return data if mask is None else data[mask]
+
+class FilterSequence:
+    """
+    Latest filter-state sequence number seen per browser session
+
+    The dashboard stamps every filter state with (sid, seq). A request whose
+    seq is older than one already seen by this worker is stale and can be
+    dropped instead of computed.
+    """
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, state):
+        """Record state's seq; returns False if a newer one was already seen"""
+        sid, seq = state.get('sid'), state.get('seq', 0)
+        if sid is None:
+            return True
+        with self._lock:
+            latest = self._latest.get(sid)
+            if latest is not None and seq < latest:
+                return False
+            self._latest[sid] = seq
+            self._latest.move_to_end(sid)
+            while len(self._latest) > self.max_sessions:
+                self._latest.popitem(last=False)
+        return True
+
+    def is_stale(self, state):
+        """True if a newer filter state arrived for the same session"""
+        sid = state.get('sid')
+        with self._lock:
+            latest = self._latest.get(sid)
+        return latest is not None and state.get('seq', 0) < latest
+
+def sorted_positions(data, state):
+    """Row positions matching state, sorted by Potential Score (high -> low)"""
+    rows = apply_filters(data, state).sort_values('Potential Score', ascending=False)
+    positions = data.index.get_indexer(rows.index)
+    return positions.astype(np.int32) if len(data) < 2 ** 31 else positions
+
+class FilteredRowCache:
+    """
+    LRU cache of filtered row-sets keyed by (dataset version, filter state)
+
+    Entries are the sorted row positions (4 bytes per row), not copies of
+    the rows; the frame is taken from the dataset on every get(). The cache
+    holds at most `maxsize` entries and `max_rows` positions in total, so
+    broad filters on a national dataset cannot multiply the worker's RSS.
+
+    Concurrent callers asking for the same key wait for a single computation,
+    so the map, table and header callbacks of one gesture filter only once.
+    """
+
+    def __init__(self, maxsize=64, max_rows=10000000):
+        self.maxsize = maxsize
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._rows = 0
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def positions(self, data, version, state):
+        """Sorted row positions for state (cached); slice them to take only part of the rows"""
+        key = (version, filter_state_key(state))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+
+            try:
+                positions = sorted_positions(data, state)
+                with self._lock:
+                    self._entries[key] = positions
+                    self._rows += len(positions)
+                    while len(self._entries) > self.maxsize or (self._rows > self.max_rows and len(self._entries) > 1):
+                        _, evicted = self._entries.popitem(last=False)
+                        self._rows -= len(evicted)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return positions
+
+    def get(self, data, version, state):
+        """Filtered rows for state, sorted by Potential Score (high -> low)"""
+        return data.take(self.positions(data, version, state))
+
+    def clear(self):
+        """Drop all cached row-sets (e.g. after a dataset reload)"""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize,
+                    'rows': self._rows, 'max_rows': self.max_rows}
+
+def filter_state_from_args(args):
+    """
+    Build a filter state from query-string arguments
+
+    Hierarchy levels are passed by name (?province=...&district=...) and
+    ranges as "min,max" (?potential_score=70,100). Missing ranges are not
+    filtered.
+    """
+    state = {}
+    for key, _ in HIERARCHY_FILTERS:
+        state[key] = args.get(key) or None
+    for key, _ in RANGE_FILTERS:
+        value = args.get(key)
+        if value:
+            low, high = value.split(',', 1)
+            state[key] = [float(low), float(high)]
+    return state
+
+def filter_state_to_args(state):
+    """Query-string arguments for a filter state (inverse of filter_state_from_args)"""
+    state = normalize_filter_state(state)
+    args = {}
+    for key, _ in HIERARCHY_FILTERS:
+        if state[key] is not None:
+            args[key] = state[key]
+    for key, _ in RANGE_FILTERS:
+        if state[key] is not None:
+            args[key] = f'{state[key][0]},{state[key][1]}'
+    return args
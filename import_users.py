@@ -1,28 +1,127 @@
+"""
+Bulk user import from CSV (username,password,role)
+Existing usernames are looked up with batched IN queries, passwords are
+hashed in a process pool and new users are inserted in one transaction.
+
+Usage:
+    python import_users.py users.csv --workers 8
+"""
+import argparse
 import csv
-from applogin import db, server
-from auth.models import User
+import os
+import sys
+import time
+
+from sqlalchemy import insert, select
+
+from models import db, User
+from passwords import hash_passwords
+
+REQUIRED_HEADERS = {'username', 'password', 'role'}
+LOOKUP_CHUNK = 500
+
+def read_users_csv(file_path):
+    """
+    Read and validate users.csv
+
+    Returns:
+        list of dicts (username, password, role); duplicate usernames keep
+        the first row
+    """
+    with open(file_path, newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.DictReader(csvfile)
+        if not reader.fieldnames or not REQUIRED_HEADERS.issubset(reader.fieldnames):
+            raise ValueError("ไฟล์ CSV ต้องมีหัวข้อ 'username', 'password', และ 'role'")
+
+        users = {}
+        for row in reader:
+            username = (row['username'] or '').strip()
+            if not username or username in users:
+                continue
+            users[username] = {
+                'username': username,
+                'password': row['password'] or '',
+                'role': (row['role'] or '').strip() or 'user',
+            }
+    return list(users.values())
+
+def existing_usernames(usernames):
+    """Usernames already in the users table (one IN query per chunk)"""
+    found = set()
+    for start in range(0, len(usernames), LOOKUP_CHUNK):
+        chunk = usernames[start:start + LOOKUP_CHUNK]
+        found.update(db.session.execute(select(User.username).where(User.username.in_(chunk))).scalars())
+    return found
+
+def bulk_import_users(file_path, app=None, workers=None, batch_size=1000):
+    """
+    Import users from CSV into models.User
+
+    Args:
+        file_path: Path to a users.csv-style file
+        app: Flask app bound to models.db (defaults to app_sales_v2.server)
+        workers: Hashing processes (defaults to all cores)
+        batch_size: Rows per INSERT statement
+
+    Returns:
+        dict with rows, created, skipped, seconds and rows_per_sec
+    """
+    if app is None:
+        from app_sales_v2 import server as app
+
+    started = time.perf_counter()
+    users = read_users_csv(file_path)
+
+    with app.app_context():
+        existing = existing_usernames([u['username'] for u in users])
+        new_users = [u for u in users if u['username'] not in existing]
+
+        hash_started = time.perf_counter()
+        hashes = hash_passwords([u['password'] for u in new_users], workers=workers)
+        hash_seconds = time.perf_counter() - hash_started
+
+        rows = [
+            {'username': u['username'], 'password_hash': password_hash, 'role': u['role']}
+            for u, password_hash in zip(new_users, hashes)
+        ]
+        try:
+            for start in range(0, len(rows), batch_size):
+                db.session.execute(insert(User), rows[start:start + batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    seconds = time.perf_counter() - started
+    return {
+        'rows': len(users),
+        'created': len(rows),
+        'skipped': len(users) - len(rows),
+        'hash_seconds': round(hash_seconds, 3),
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(len(users) / seconds, 1) if seconds else None,
+    }
 
 def import_users_from_csv(file_path):
     """นำเข้าผู้ใช้จากไฟล์ CSV"""
-    with server.app_context():  # ใช้ app_context เพื่อให้โค้ดทำงานใน Flask application context
-        with open(file_path, newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            print(f"Headers: {reader.fieldnames}")  # แสดงหัวข้อสำหรับตรวจสอบ
-            required_headers = {'username', 'password', 'role'}
-            if not required_headers.issubset(reader.fieldnames):
-                raise ValueError("ไฟล์ CSV ต้องมีหัวข้อ 'username', 'password', และ 'role'")
-
-            for row in reader:
-                username = row['username']
-                password = row['password']
-                role = row['role']
-                if not User.query.filter_by(username=username).first():
-                    user = User(username=username, role=role)
-                    user.set_password(password)
-                    db.session.add(user)
-            db.session.commit()
-            print("นำเข้าผู้ใช้สำเร็จ!")
+    return bulk_import_users(file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_path', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'users.csv'))
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        result = bulk_import_users(args.file_path, workers=args.workers, batch_size=args.batch_size)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"นำเข้าผู้ใช้สำเร็จ! {result['created']} created, {result['skipped']} skipped "
+          f"({result['rows']} rows in {result['seconds']}s, {result['rows_per_sec']} rows/sec; "
+          f"hashing {result['hash_seconds']}s)")
 
 if __name__ == "__main__":
-    file_path = r"D:\2025\Dash\TOL_Login_Dash\users.csv"
-    import_users_from_csv(file_path)
+    main()
@@ -4,6 +4,7 @@ Run this script once before deploying or running the app
 """
 from app_sales_v2 import server, db
 from models import User
+from schema_upgrade import upgrade_schema
 import os
 import sys
 
@@ -19,6 +20,10 @@ def init_database():
         db.create_all()
         print("[OK] Database tables created successfully!")
 
+        print("Upgrading existing tables...")
+        upgrade_schema(db)
+        print("[OK] Schema is up to date!")
+
         # Check if admin user exists
         admin = User.query.filter_by(username='admin').first()
         if not admin:
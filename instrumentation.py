@@ -0,0 +1,243 @@
+"""
+Per-request and per-callback latency instrumentation
+Code marks its phases (filter, figure, table, ...) with `phase()`, SQL time
+is added as the `db` phase and Dash output serialization as `serialize`.
+Each response gets a Server-Timing header, and totals are kept per Dash
+callback and per route in rolling windows for p50 / p95 / p99.
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+def add_phase(name, ms):
+    """Add `ms` to phase `name` of the current request (no-op outside a request)"""
+    if not has_request_context():
+        return
+    timings = g.get('_phase_timings')
+    if timings is None:
+        timings = g._phase_timings = {}
+    timings[name] = timings.get(name, 0.0) + ms
+
+@contextmanager
+def phase(name):
+    """Time a block as phase `name` of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, (time.perf_counter() - started) * 1000)
+
+# Histogram bucket upper bounds in seconds (Prometheus `le`)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+class Histogram:
+    """Fixed-bucket histogram (not thread-safe; callers hold their own lock)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """{'buckets': [[le, cumulative count], ...], 'sum', 'count'} with le=+Inf last"""
+        cumulative, running = [], 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            running += count
+            cumulative.append([bound, running])
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class LatencyStats:
+    """
+    Rolling latency windows keyed by callback / route
+
+    Each key keeps its last `window` totals (and phase durations), so the
+    percentiles follow recent traffic; `count` is the lifetime total.
+    """
+
+    def __init__(self, window=1000, max_keys=500, buckets=REQUEST_BUCKETS):
+        self.window = window
+        self.max_keys = max_keys
+        self.buckets = buckets
+        self._entries = OrderedDict()   # key -> {'count', 'totals', 'phases', 'histogram'}
+        self._lock = threading.Lock()
+
+    def record(self, key, total_ms, phases=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {'count': 0, 'totals': deque(maxlen=self.window), 'phases': {},
+                                              'histogram': Histogram(self.buckets)}
+                while len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            entry['count'] += 1
+            entry['totals'].append(total_ms)
+            entry['histogram'].observe(total_ms / 1000)
+            for name, ms in (phases or {}).items():
+                entry['phases'].setdefault(name, deque(maxlen=self.window)).append(ms)
+
+    def counts(self, prefix=''):
+        """Lifetime counts of the keys starting with prefix (prefix stripped)"""
+        with self._lock:
+            return {key[len(prefix):]: entry['count'] for key, entry in self._entries.items()
+                    if key.startswith(prefix)}
+
+    def histograms(self):
+        """Lifetime duration histogram (seconds) per key"""
+        with self._lock:
+            return {key: entry['histogram'].snapshot() for key, entry in self._entries.items()}
+
+    def snapshot(self):
+        """
+        Returns:
+            list of dicts (key, count, p50, p95, p99, max in ms and the
+            p50 / p95 of every phase), sorted by key
+        """
+        with self._lock:
+            entries = [(key, entry['count'], list(entry['totals']),
+                        {name: list(values) for name, values in entry['phases'].items()})
+                       for key, entry in self._entries.items()]
+
+        rows = []
+        for key, count, totals, phases in sorted(entries):
+            totals.sort()
+            phase_stats = {}
+            for name, values in phases.items():
+                values.sort()
+                phase_stats[name] = {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+            rows.append({
+                'key': key,
+                'count': count,
+                'samples': len(totals),
+                'p50': percentile(totals, 50),
+                'p95': percentile(totals, 95),
+                'p99': percentile(totals, 99),
+                'max': totals[-1] if totals else None,
+                'phases': phase_stats,
+            })
+        return rows
+
+def server_timing_header(phases, total_ms, queries=0):
+    """Server-Timing value, e.g. 'filter;dur=3.1, db;dur=1.2;desc="2 queries", total;dur=9.8'"""
+    parts = []
+    for name, ms in phases.items():
+        entry = f'{name};dur={ms:.1f}'
+        if name == 'db' and queries:
+            entry += f';desc="{queries} quer{"y" if queries == 1 else "ies"}"'
+        parts.append(entry)
+    parts.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(parts)
+
+class Instrumentation:
+    """
+    Flask / Dash hooks feeding a LatencyStats
+
+    Create it before the other before_request hooks (so their time is
+    included) and call instrument_dash() before any callback is registered.
+    """
+
+    def __init__(self, server, stats, server_timing=True):
+        self.stats = stats
+        self.server_timing = server_timing
+        self.query_histogram = Histogram(QUERY_BUCKETS)   # every statement of this process
+        self._query_lock = threading.Lock()
+        server.before_request(self._before_request)
+        server.after_request(self._after_request)
+
+    def instrument_dash(self, dash_app):
+        """
+        Wrap every server-side callback registered through dash_app.callback
+
+        The wrapper times the callback function itself; what remains until
+        after_request (Dash serializing the outputs to JSON) is `serialize`.
+        """
+        register_callback = dash_app.callback
+
+        def callback(*args, **kwargs):
+            register = register_callback(*args, **kwargs)
+
+            def decorator(func):
+                @functools.wraps(func)
+                def timed_callback(*func_args, **func_kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return func(*func_args, **func_kwargs)
+                    finally:
+                        done = time.perf_counter()
+                        g._callback_name = func.__name__
+                        g._callback_done = done
+                        add_phase('callback', (done - started) * 1000)
+                return register(timed_callback)
+
+            return decorator
+
+        dash_app.callback = callback
+
+    def instrument_engine(self, engine):
+        """Add SQL execution time to the `db` phase of the current request"""
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['_query_started'].pop()
+            with self._query_lock:
+                self.query_histogram.observe(elapsed)
+            if has_request_context():
+                add_phase('db', elapsed * 1000)
+                g._query_count = g.get('_query_count', 0) + 1
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            if context.connection is not None and context.connection.info.get('_query_started'):
+                context.connection.info['_query_started'].pop()
+
+    def query_stats(self):
+        """Duration histogram (seconds) of all SQL statements of this process"""
+        with self._query_lock:
+            return self.query_histogram.snapshot()
+
+    def _before_request(self):
+        g._request_started = time.perf_counter()
+
+    def _after_request(self, response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        now = time.perf_counter()
+        total_ms = (now - started) * 1000
+        phases = dict(g.get('_phase_timings') or {})
+
+        callback_name = g.get('_callback_name')
+        if callback_name is not None:
+            phases['serialize'] = (now - g._callback_done) * 1000
+            key = f'callback:{callback_name}'
+        else:
+            key = f'route:{request.url_rule.rule if request.url_rule else "<unmatched>"}'
+
+        self.stats.record(key, total_ms, phases)
+        if self.server_timing:
+            response.headers['Server-Timing'] = server_timing_header(phases, total_ms, g.get('_query_count', 0))
+        return response
@@ -0,0 +1,133 @@
+"""
+Job functions run by the background job runner (jobs.py)
+Each function takes (params, context, **options), reports progress through
+context.progress() and returns (path, download name, mimetype).
+Pool processes start from forkserver / spawn, so they load what they need
+themselves instead of relying on state inherited from the web worker.
+"""
+import csv
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import NullPool
+
+from dataset import load_dataset
+from exporter import iter_csv, iter_xlsx, CSV_MIMETYPE, XLSX_MIMETYPE
+from filter_engine import sorted_positions
+
+REPORT_CHUNK_ROWS = 1000
+
+_job_dataset = None   # (version, DataFrame) loaded in this pool process
+
+def job_dataset(params):
+    """
+    Dataset a job was submitted against, loaded once per pool process
+
+    params['dataset'] (set at submit time) names the Parquet snapshot in the
+    dataset file cache; without one (no pyarrow, or already pruned) the CSV
+    is read and preprocessed.
+    """
+    global _job_dataset
+    source = params.get('dataset') or {}
+    version = source.get('version')
+    if _job_dataset is not None and version is not None and _job_dataset[0] == version:
+        return _job_dataset[1]
+
+    data = None
+    if source.get('snapshot'):
+        try:
+            data = pd.read_parquet(source['snapshot'])
+        except OSError:
+            pass
+    if data is None:
+        loaded = load_dataset(source.get('path'))
+        version, data = loaded.version, loaded.data
+    _job_dataset = (version, data)
+    return data
+
+def export_targets_job(params, context, **options):
+    """
+    Filtered target list as CSV / XLSX
+
+    Params:
+        format: 'csv' or 'xlsx'
+        filters: normalized filter state
+        dataset: version / path / Parquet snapshot of the dataset (see job_dataset)
+    """
+    export_format = params.get('format', 'csv')
+    data = job_dataset(params)
+    positions = sorted_positions(data, params.get('filters'))
+
+    def on_chunk(done, total):
+        # XLSX spends its last part saving the workbook
+        share = 0.9 if export_format == 'xlsx' else 1.0
+        context.progress(share * done / max(total, 1), f"{done:,} / {total:,} rows")
+
+    filename = f"tol_targets_{datetime.now():%Y%m%d_%H%M}.{export_format}"
+    path = context.output_path(filename)
+    if export_format == 'xlsx':
+        with open(path, 'wb') as f:
+            for block in iter_xlsx(data, progress=on_chunk, positions=positions):
+                f.write(block)
+        return path, filename, XLSX_MIMETYPE
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for text in iter_csv(data, progress=on_chunk, positions=positions):
+            f.write(text)
+    return path, filename, CSV_MIMETYPE
+
+def activity_report_job(params, context, database_url=None, **options):
+    """
+    Activity logs for a date range as CSV (admin report)
+
+    Params:
+        start, end: 'YYYY-MM-DD' (end exclusive)
+        action: optional action filter
+    """
+    from models import ActivityLog
+
+    table = ActivityLog.__table__
+    start = datetime.strptime(params['start'], '%Y-%m-%d')
+    end = datetime.strptime(params['end'], '%Y-%m-%d')
+    conditions = [table.c.timestamp >= start, table.c.timestamp < end]
+    if params.get('action'):
+        conditions.append(table.c.action == params['action'])
+
+    filename = f"activity_logs_{params['start']}_{params['end']}.csv"
+    path = context.output_path(filename)
+
+    # Own engine per job: pool processes share no connections with the web worker
+    engine = create_engine(database_url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            total = conn.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+            result = conn.execution_options(stream_results=True).execute(
+                select(table.c.timestamp, table.c.user_id, table.c.action, table.c.details, table.c.ip_address)
+                .where(*conditions).order_by(table.c.timestamp)
+            )
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write('\ufeff')  # Excel reads Thai correctly with a BOM
+                writer = csv.writer(f)
+                writer.writerow(['timestamp', 'user_id', 'action', 'details', 'ip_address'])
+                done = 0
+                while True:
+                    chunk = result.fetchmany(REPORT_CHUNK_ROWS)
+                    if not chunk:
+                        break
+                    writer.writerows(
+                        (row.timestamp.isoformat() if row.timestamp else '', row.user_id, row.action,
+                         row.details, row.ip_address)
+                        for row in chunk
+                    )
+                    done += len(chunk)
+                    context.progress(done / max(total, 1), f"{done:,} / {total:,} rows")
+    finally:
+        engine.dispose()
+    return path, filename, CSV_MIMETYPE
+
+# kind -> (function, admin only)
+JOB_TASKS = {
+    'export': (export_targets_job, False),
+    'activity_report': (activity_report_job, True),
+}
@@ -0,0 +1,378 @@
+"""
+Background jobs for long exports and reports
+Jobs are rows in a SQLite file in SHARED_STATE_DIR, so any gunicorn worker
+can submit, poll or cancel them and they survive worker restarts. Each
+worker runs a dispatcher thread that claims queued jobs (never more than
+max_concurrent running on the host) and executes them in a small,
+low-priority process pool.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from background import BackgroundWorker, process_context
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+MAX_ATTEMPTS = 3
+
+class JobCancelled(Exception):
+    """Raised inside a job when it was cancelled (or handed to another worker)"""
+
+class JobStore:
+    """Job table in one SQLite file shared by every process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    user_id INTEGER,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    result_path TEXT,
+                    result_name TEXT,
+                    mimetype TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    token TEXT,
+                    worker_pid INTEGER,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    heartbeat REAL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_user ON jobs (user_id, created)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _to_dict(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def create(self, kind, user_id, params):
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            'INSERT INTO jobs (id, kind, user_id, params, status, created) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, kind, user_id, json.dumps(params, ensure_ascii=False), QUEUED, time.time())
+        )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def list(self, user_id=None, limit=50):
+        """Most recent jobs (of one user, or all when user_id is None)"""
+        if user_id is None:
+            rows = self._connect().execute('SELECT * FROM jobs ORDER BY created DESC LIMIT ?', (limit,))
+        else:
+            rows = self._connect().execute('SELECT * FROM jobs WHERE user_id = ? ORDER BY created DESC LIMIT ?',
+                                           (user_id, limit))
+        return [self._to_dict(row) for row in rows.fetchall()]
+
+    def count_active(self, user_id):
+        row = self._connect().execute(
+            'SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN (?, ?)', (user_id, QUEUED, RUNNING)
+        ).fetchone()
+        return row[0]
+
+    def claim(self, max_concurrent, pid):
+        """
+        Move the oldest queued job to running for this process
+
+        Returns:
+            The claimed job, or None if nothing is queued or max_concurrent
+            jobs are already running on the host
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            running = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (RUNNING,)).fetchone()[0]
+            row = None
+            if running < max_concurrent:
+                row = conn.execute('SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1',
+                                   (QUEUED,)).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    'UPDATE jobs SET status = ?, token = ?, worker_pid = ?, attempts = attempts + 1, '
+                    'started = ?, heartbeat = ?, progress = 0, message = NULL WHERE id = ?',
+                    (RUNNING, uuid.uuid4().hex, pid, now, now, row['id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id']) if row is not None else None
+
+    def report(self, job_id, token, progress, message=None):
+        """
+        Progress update from the running job
+
+        Returns:
+            False if the job should stop (cancel requested, or the claim
+            `token` is no longer current because the job was requeued)
+        """
+        conn = self._connect()
+        updated = conn.execute(
+            'UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat = ? '
+            'WHERE id = ? AND token = ? AND status = ?',
+            (progress, message, time.time(), job_id, token, RUNNING)
+        ).rowcount
+        if not updated:
+            return False
+        row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return not row['cancel_requested']
+
+    def finish(self, job_id, token, status, error=None, result=None):
+        """Record the outcome of one claim (ignored if the claim is stale)"""
+        path, name, mimetype = result or (None, None, None)
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, error = ?, result_path = ?, result_name = ?, mimetype = ?, '
+            'progress = CASE WHEN ? = ? THEN 1 ELSE progress END, finished = ? '
+            'WHERE id = ? AND token = ? AND status = ?',
+            (status, error, path, name, mimetype, status, DONE, time.time(), job_id, token, RUNNING)
+        )
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop"""
+        conn = self._connect()
+        conn.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                     (CANCELLED, time.time(), job_id, QUEUED))
+        conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, RUNNING))
+        return self.get(job_id)
+
+    def heartbeat(self, pid):
+        """Mark the jobs claimed by process `pid` as still owned"""
+        self._connect().execute('UPDATE jobs SET heartbeat = ? WHERE worker_pid = ? AND status = ?',
+                                (time.time(), pid, RUNNING))
+
+    def recover(self, stale_seconds):
+        """
+        Requeue running jobs whose worker stopped sending heartbeats
+        (gunicorn restarted or killed it); give up after MAX_ATTEMPTS
+
+        Returns:
+            Number of jobs requeued or failed
+        """
+        conn = self._connect()
+        cutoff = time.time() - stale_seconds
+        failed = conn.execute(
+            'UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status = ? AND heartbeat < ? AND attempts >= ?',
+            (FAILED, 'worker stopped', time.time(), RUNNING, cutoff, MAX_ATTEMPTS)
+        ).rowcount
+        requeued = conn.execute(
+            'UPDATE jobs SET status = ?, token = NULL, worker_pid = NULL WHERE status = ? AND heartbeat < ?',
+            (QUEUED, RUNNING, cutoff)
+        ).rowcount
+        conn.execute('UPDATE jobs SET status = ?, finished = ? WHERE status = ? AND cancel_requested = 1',
+                     (CANCELLED, time.time(), QUEUED))
+        return failed + requeued
+
+    def expired(self, older_than):
+        rows = self._connect().execute(
+            'SELECT * FROM jobs WHERE status IN (?, ?, ?) AND finished < ?', FINISHED + (older_than,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete(self, job_id):
+        self._connect().execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+class JobContext:
+    """Passed to a job function: progress reporting and the output directory"""
+
+    def __init__(self, store, job, result_dir, min_interval=0.5):
+        self.store = store
+        self.job_id = job['id']
+        self.token = job['token']
+        self.output_dir = os.path.join(result_dir, job['id'], job['token'])
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def progress(self, fraction, message=None, force=False):
+        """
+        Report progress (0..1); raises JobCancelled when the job should stop
+
+        Updates are rate-limited to one write per min_interval seconds.
+        """
+        now = time.monotonic()
+        if not force and now - self._last < self.min_interval:
+            return
+        self._last = now
+        if not self.store.report(self.job_id, self.token, min(max(fraction, 0.0), 1.0), message):
+            raise JobCancelled()
+
+    def output_path(self, filename):
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, filename)
+
+def _lower_priority():
+    """Process pool initializer: let interactive requests win the CPU"""
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+def execute_job(store_path, job, result_dir, func, options):
+    """
+    Run one claimed job in a pool process and record its outcome
+
+    func(params, context, **options) returns (path, download name, mimetype).
+    """
+    store = JobStore(store_path)
+    context = JobContext(store, job, result_dir)
+    try:
+        context.progress(0.0, 'started', force=True)
+        result = func(job['params'], context, **options)
+        store.finish(job['id'], job['token'], DONE, result=result)
+    except JobCancelled:
+        shutil.rmtree(context.output_dir, ignore_errors=True)
+        store.finish(job['id'], job['token'], CANCELLED)
+    except Exception as e:
+        shutil.rmtree(context.output_dir, ignore_errors=True)
+        store.finish(job['id'], job['token'], FAILED, error=str(e)[:500])
+
+class JobRunner(BackgroundWorker):
+    """
+    Per-worker dispatcher thread
+
+    Args:
+        store: JobStore shared by all workers
+        tasks: dict kind -> job function (module-level, so it can be pickled)
+        result_dir: Where job output files are written (one directory per job)
+        workers: Pool processes in this gunicorn worker
+        max_concurrent: Running jobs allowed on the host across all workers
+        options: Extra keyword arguments for every job function
+    """
+
+    def __init__(self, store, tasks, result_dir, workers=1, max_concurrent=1, poll_interval=1.0,
+                 stale_seconds=60, result_ttl=24 * 3600, options=None):
+        super().__init__('job-runner')
+        self.store = store
+        self.tasks = tasks
+        self.result_dir = result_dir
+        self.workers = workers
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.result_ttl = result_ttl
+        self.options = options or {}
+        self._pool = None
+        self._futures = {}   # job id -> (future, pool it was submitted to)
+        self._last_maintenance = 0.0
+
+    def submit(self, kind, user_id, params):
+        if kind not in self.tasks:
+            raise ValueError(f"Unknown job kind: {kind}")
+        return self.store.create(kind, user_id, params)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_priority,
+                                   mp_context=process_context())
+
+    def run(self):
+        self._pool = self._new_pool()
+        try:
+            while not self.wait(self.poll_interval):
+                try:
+                    self._tick()
+                except Exception as e:
+                    print(f"❌ Job dispatcher error: {e}")
+        finally:
+            # Running jobs are abandoned; another worker requeues them once the heartbeat is stale
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _tick(self):
+        pid = os.getpid()
+        pool_broken = False
+        for job_id, (future, pool) in list(self._futures.items()):
+            if future.done():
+                del self._futures[job_id]
+                error = future.exception()
+                if error is not None:
+                    job = self.store.get(job_id)
+                    if job and job['status'] == RUNNING and job['worker_pid'] == pid:
+                        self.store.finish(job_id, job['token'], FAILED, error=str(error)[:500] or type(error).__name__)
+                    # Every future of a broken pool fails at once; futures of an
+                    # already replaced pool must not tear down its successor
+                    if isinstance(error, BrokenProcessPool) and pool is self._pool:
+                        pool_broken = True
+        if pool_broken:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+
+        self.store.heartbeat(pid)
+
+        now = time.time()
+        if now - self._last_maintenance > self.stale_seconds:
+            self._last_maintenance = now
+            self.store.recover(self.stale_seconds)
+            self.prune_results(now - self.result_ttl)
+
+        while len(self._futures) < self.workers:
+            job = self.store.claim(self.max_concurrent, pid)
+            if job is None:
+                break
+            func = self.tasks.get(job['kind'])
+            if func is None:
+                self.store.finish(job['id'], job['token'], FAILED, error=f"Unknown job kind: {job['kind']}")
+                continue
+            future = self._pool.submit(execute_job, self.store.path, job, self.result_dir, func, self.options)
+            self._futures[job['id']] = (future, self._pool)
+
+    def prune_results(self, older_than):
+        """Delete finished jobs (and their files) older than the result TTL"""
+        for job in self.store.expired(older_than):
+            shutil.rmtree(os.path.join(self.result_dir, job['id']), ignore_errors=True)
+            self.store.delete(job['id'])
+
+    def stats(self):
+        return {'pid': os.getpid(), 'workers': self.workers, 'max_concurrent': self.max_concurrent,
+                'running_here': len(self._futures)}
+
+def public_job(job):
+    """Job fields safe to return to the client"""
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': round(job['progress'], 3),
+        'message': job['message'],
+        'error': job['error'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished'],
+        'result_name': job['result_name'] if job['status'] == DONE else None,
+    }
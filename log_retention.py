@@ -0,0 +1,283 @@
+"""
+Log retention: archive old activity_logs / user_logs rows to Parquet
+Rows older than the retention window are copied, in bounded batches, to one
+zstd-compressed Parquet file per table and month, then deleted from the live
+table in short transactions. Archived rows can still be read lazily for
+reports that reach past the retention window.
+
+Usage:
+    python log_retention.py --days 180
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import MetaData, Table, create_engine, delete, inspect, select, text
+from sqlalchemy.types import DateTime, Integer
+
+from config import Config
+from models import get_thailand_time
+
+# Parquet archives need pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    ARCHIVE_AVAILABLE = True
+except ImportError:
+    ARCHIVE_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+LOG_TABLES = ['activity_logs', 'user_logs']
+
+def get_archive_dir():
+    return Config.LOG_ARCHIVE_DIR
+
+def retention_cutoff(days=None):
+    """Rows with timestamp before this are archived (naive Thai time, like the stored timestamps)"""
+    days = Config.LOG_RETENTION_DAYS if days is None else days
+    return get_thailand_time().replace(tzinfo=None) - timedelta(days=days)
+
+def archive_path(archive_dir, table, month):
+    return os.path.join(archive_dir, table, f"{table}-{month:%Y-%m}.parquet")
+
+def _staging_dir(archive_dir, table, month):
+    return os.path.join(archive_dir, table, '_staging', f"{month:%Y-%m}")
+
+def _arrow_schema(table):
+    """Parquet schema from the reflected table (JSON / text -> string)"""
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def _to_arrow(rows, schema):
+    columns = {name: [] for name in schema.names}
+    for row in rows:
+        for name in schema.names:
+            value = row[name]
+            if schema.field(name).type == pa.string() and value is not None and not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                value = value.replace(tzinfo=None)
+            columns[name].append(value)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+def _dedupe_ids(table):
+    """
+    Table sorted by id with one row per id
+
+    A batch whose DELETE or commit failed after its staging file was written
+    is archived again on the next run; the first (already archived) copy wins.
+    """
+    table = table.sort_by('id')   # stable: existing archive rows come first
+    if table.num_rows < 2:
+        return table
+    ids = table.column('id').combine_chunks()
+    changed = pc.not_equal(ids.slice(1), ids.slice(0, len(ids) - 1))
+    return table.filter(pa.concat_arrays([pa.array([True]), changed]))
+
+def _compact_month(archive_dir, table_name, month, schema):
+    """Merge staged batches (and any existing archive) into the month file, without duplicate ids"""
+    staged = sorted(glob.glob(os.path.join(_staging_dir(archive_dir, table_name, month), '*.parquet')))
+    if not staged:
+        return
+    target = archive_path(archive_dir, table_name, month)
+    parts = [target] if os.path.exists(target) else []
+    merged = pa.concat_tables([pq.read_table(path, schema=schema) for path in parts + staged])
+
+    tmp = target + '.tmp'
+    pq.write_table(_dedupe_ids(merged), tmp, compression='zstd')
+    os.replace(tmp, target)
+    for path in staged:
+        os.remove(path)
+    os.rmdir(_staging_dir(archive_dir, table_name, month))
+
+def _compact_all(archive_dir, table_name, schema):
+    for month_dir in glob.glob(os.path.join(archive_dir, table_name, '_staging', '*')):
+        month = datetime.strptime(os.path.basename(month_dir), '%Y-%m').date()
+        _compact_month(archive_dir, table_name, month, schema)
+
+def _drop_empty_partitions(conn, table_name, cutoff):
+    """Drop monthly partitions that lie entirely before the cutoff and are empty"""
+    from schema_upgrade import partition_name
+
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :table
+    """), {'table': table_name}).scalars().all()
+    last_full_month = date(cutoff.year, cutoff.month, 1)
+    for name in rows:
+        try:
+            month = datetime.strptime(name[len(table_name) + 2:], '%Y%m').date()
+        except ValueError:
+            continue  # DEFAULT partition
+        if name != partition_name(table_name, month) or month >= last_full_month:
+            continue
+        if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is None:
+            conn.execute(text(f"DROP TABLE {name}"))
+            print(f"Dropped empty partition {name}")
+
+def archive_table(engine, table_name, cutoff, archive_dir=None, batch_size=None, pause=0.05):
+    """
+    Move rows older than cutoff from table_name to monthly Parquet archives
+
+    Each batch is written to a staged Parquet file before its rows are
+    deleted (one short transaction per batch), so an interrupted run loses
+    nothing; staged files are compacted into the month file at the end (or
+    on the next run).
+
+    Returns:
+        Number of rows archived
+    """
+    if not ARCHIVE_AVAILABLE:
+        raise RuntimeError("Log archiving requires pyarrow")
+
+    archive_dir = archive_dir or get_archive_dir()
+    batch_size = batch_size or Config.LOG_ARCHIVE_BATCH_SIZE
+    if not inspect(engine).has_table(table_name):
+        return 0
+
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    schema = _arrow_schema(table)
+    _compact_all(archive_dir, table_name, schema)
+
+    archived = 0
+    batch_number = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.timestamp < cutoff).order_by(table.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                month = date(row['timestamp'].year, row['timestamp'].month, 1)
+                by_month.setdefault(month, []).append(row)
+
+            for month, month_rows in by_month.items():
+                staging = _staging_dir(archive_dir, table_name, month)
+                os.makedirs(staging, exist_ok=True)
+                path = os.path.join(staging, f"{int(time.time() * 1000)}-{batch_number:06d}.parquet")
+                pq.write_table(_to_arrow(month_rows, schema), path, compression='zstd')
+
+            conn.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+
+        archived += len(rows)
+        batch_number += 1
+        print(f"  {table_name}: archived {archived:,} rows", end='\r')
+        if pause:
+            time.sleep(pause)  # let other transactions in between batches
+
+    if archived:
+        print()
+    _compact_all(archive_dir, table_name, schema)
+
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            _drop_empty_partitions(conn, table_name, cutoff)
+    return archived
+
+def _lock(archive_dir):
+    """Only one retention run at a time (per host)"""
+    os.makedirs(archive_dir, exist_ok=True)
+    handle = open(os.path.join(archive_dir, '.retention.lock'), 'w')
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+    return handle
+
+def run_retention(engine, days=None, archive_dir=None, tables=None):
+    """
+    Archive every log table
+
+    Returns:
+        dict of table -> rows archived (None if another run holds the lock)
+    """
+    archive_dir = archive_dir or get_archive_dir()
+    lock = _lock(archive_dir)
+    if lock is None:
+        print("Retention already running, skipping")
+        return None
+
+    try:
+        cutoff = retention_cutoff(days)
+        return {
+            table_name: archive_table(engine, table_name, cutoff, archive_dir)
+            for table_name in (tables or LOG_TABLES)
+        }
+    finally:
+        lock.close()
+
+def query_archive(table_name, start, end, filters=None, archive_dir=None, limit=None):
+    """
+    Read archived rows with start <= timestamp < end
+
+    Only the month files overlapping the range are opened.
+
+    Args:
+        filters: dict of column -> value equality filters
+        limit: Maximum rows (newest first)
+
+    Returns:
+        list of dicts
+    """
+    if not ARCHIVE_AVAILABLE:
+        return []
+
+    archive_dir = archive_dir or get_archive_dir()
+    paths = []
+    month = date(start.year, start.month, 1)
+    while month < end.date() if isinstance(end, datetime) else month < end:
+        path = archive_path(archive_dir, table_name, month)
+        if os.path.exists(path):
+            paths.append(path)
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    if not paths:
+        return []
+
+    dataset = ds.dataset(paths, format='parquet')
+    expression = (ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us'))) & \
+        (ds.field('timestamp') < pa.scalar(end, pa.timestamp('us')))
+    for column, value in (filters or {}).items():
+        expression = expression & (ds.field(column) == value)
+
+    result = dataset.to_table(filter=expression).sort_by([('timestamp', 'descending')])
+    if limit is not None:
+        result = result.slice(0, limit)
+    return result.to_pylist()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=Config.LOG_RETENTION_DAYS)
+    parser.add_argument('--archive-dir', default=get_archive_dir())
+    parser.add_argument('--database-url', default=Config.DATABASE_URL or 'sqlite:///instance/app.db')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    print(f"Archiving log rows older than {args.days} days to {args.archive_dir}")
+    print(run_retention(engine, args.days, args.archive_dir))
+
+if __name__ == '__main__':
+    main()
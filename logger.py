@@ -2,17 +2,41 @@
 Logging utilities for tracking user activity
 """
 from datetime import datetime
-from flask import request
+from flask import request, current_app
 from flask_login import current_user
+from config import Config
 
 # Import database models (with fallback if not available)
 try:
-    from db import db, UserLog, update_session_activity
+    from db import db, UserLog, DailyEventRollup, ActiveSession, remove_session, update_daily_rollup
+    from batch_logger import BatchLogWriter
+    from session_tracker import SessionTracker
     DB_AVAILABLE = True
 except ImportError:
     DB_AVAILABLE = False
     print("⚠️  Database not available - logging disabled")
 
+# Events are queued and bulk-inserted by a background thread
+if DB_AVAILABLE:
+    log_writer = BatchLogWriter(
+        'user-log-writer', db, UserLog,
+        batch_size=Config.LOG_BATCH_SIZE,
+        flush_interval_ms=Config.LOG_FLUSH_INTERVAL_MS,
+        max_queue=Config.LOG_QUEUE_SIZE,
+        enqueue_timeout_ms=Config.LOG_ENQUEUE_TIMEOUT_MS
+    )
+    # Keep daily_event_rollup in step with every written batch
+    log_writer.on_flush(update_daily_rollup)
+
+    # Session heartbeats are kept in memory and written at most once a minute
+    session_tracker = SessionTracker(
+        db, ActiveSession,
+        persist_interval=Config.SESSION_PERSIST_INTERVAL,
+        session_timeout_minutes=Config.SESSION_TIMEOUT_MINUTES,
+        online_window_minutes=Config.ONLINE_WINDOW_MINUTES,
+        refresh_interval=Config.ONLINE_COUNT_REFRESH
+    )
+
 def get_client_ip():
     """Get client IP address"""
     if request.environ.get('HTTP_X_FORWARDED_FOR'):
@@ -21,33 +45,36 @@ def get_client_ip():
 
 def log_event(event_type, event_data=None, user_id=None):
     """
-    Log user activity to database
+    Queue user activity for the background log writer
 
     Args:
         event_type: Type of event (login, logout, navigate, filter, etc.)
         event_data: Additional data (dict)
         user_id: User ID (defaults to current_user.id)
+
+    Returns:
+        True if queued, False if dropped (queue full) or logging disabled
     """
     if not DB_AVAILABLE:
-        return None
+        return False
 
     try:
         if user_id is None and current_user.is_authenticated:
             user_id = current_user.id
 
-        log = UserLog(
-            user_id=user_id,
-            event_type=event_type,
-            event_data=event_data,
-            ip_address=get_client_ip()
-        )
-        db.session.add(log)
-        db.session.commit()
-        return log
+        if log_writer.app is None:
+            log_writer.init_app(current_app._get_current_object())
+
+        return log_writer.enqueue({
+            'user_id': user_id,
+            'event_type': event_type,
+            'event_data': event_data,
+            'ip_address': get_client_ip(),
+            'timestamp': datetime.utcnow()
+        })
     except Exception as e:
         print(f"❌ Error logging event: {e}")
-        db.session.rollback()
-        return None
+        return False
 
 def log_login(username, success=True):
     """Log login attempt"""
@@ -111,16 +138,44 @@ def update_user_activity(user_id, session_id):
         return
 
     try:
-        update_session_activity(user_id, session_id)
+        if session_tracker.app is None:
+            session_tracker.init_app(current_app._get_current_object())
+        session_tracker.touch(user_id, session_id)
     except Exception as e:
         print(f"❌ Error updating session: {e}")
 
-def get_user_stats(days=30):
+def end_user_session(session_id):
+    """Remove a session from the online counter (on logout)"""
+    if not DB_AVAILABLE:
+        return
+
+    try:
+        session_tracker.forget(session_id)
+        remove_session(session_id)
+    except Exception as e:
+        print(f"❌ Error removing session: {e}")
+
+def get_online_users_count():
+    """Cached count of active sessions (refreshed every ONLINE_COUNT_REFRESH seconds)"""
+    if not DB_AVAILABLE:
+        return 0
+
+    try:
+        if session_tracker.app is None:
+            session_tracker.init_app(current_app._get_current_object())
+        return session_tracker.online_count()
+    except Exception as e:
+        print(f"❌ Error counting online users: {e}")
+        return 0
+
+def get_user_stats(days=30, use_rollup=True):
     """
     Get user activity statistics
 
     Args:
         days: Number of days to look back
+        use_rollup: Read the daily_event_rollup table (whole days, at most
+            days x K rows) instead of aggregating user_logs directly
 
     Returns:
         dict with statistics
@@ -129,74 +184,115 @@ def get_user_stats(days=30):
         return {}
 
     try:
-        from datetime import timedelta
-        from sqlalchemy import func
-
-        since = datetime.utcnow() - timedelta(days=days)
-
-        # Total events
-        total_events = UserLog.query.filter(UserLog.timestamp >= since).count()
-
-        # Events by type
-        events_by_type = db.session.query(
-            UserLog.event_type,
-            func.count(UserLog.id).label('count')
-        ).filter(
-            UserLog.timestamp >= since
-        ).group_by(UserLog.event_type).all()
-
-        # Most active users
-        most_active_users = db.session.query(
-            UserLog.user_id,
-            func.count(UserLog.id).label('count')
-        ).filter(
-            UserLog.timestamp >= since,
-            UserLog.user_id.isnot(None)
-        ).group_by(UserLog.user_id).order_by(
-            func.count(UserLog.id).desc()
-        ).limit(10).all()
-
-        # Most navigated locations
-        navigate_logs = UserLog.query.filter(
-            UserLog.event_type == 'navigate',
-            UserLog.timestamp >= since
-        ).all()
-
-        location_counts = {}
-        for log in navigate_logs:
-            if log.event_data and 'destination' in log.event_data:
-                dest = log.event_data['destination']
-                location_counts[dest] = location_counts.get(dest, 0) + 1
-
-        top_locations = sorted(
-            location_counts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
-
-        return {
-            'total_events': total_events,
-            'events_by_type': {et: count for et, count in events_by_type},
-            'most_active_users': [
-                {'user_id': uid, 'count': count}
-                for uid, count in most_active_users
-            ],
-            'top_locations': [
-                {'location': loc, 'count': count}
-                for loc, count in top_locations
-            ]
-        }
+        if use_rollup:
+            return _user_stats_from_rollup(days)
+        return _user_stats_from_logs(days)
     except Exception as e:
         print(f"❌ Error getting stats: {e}")
         return {}
 
+def _format_stats(total_events, events_by_type, most_active_users, top_locations):
+    return {
+        'total_events': int(total_events or 0),
+        'events_by_type': {et: int(count) for et, count in events_by_type},
+        'most_active_users': [
+            {'user_id': uid, 'count': int(count)}
+            for uid, count in most_active_users
+        ],
+        'top_locations': [
+            {'location': loc, 'count': int(count)}
+            for loc, count in top_locations
+        ]
+    }
+
+def _user_stats_from_rollup(days):
+    """Statistics from daily_event_rollup"""
+    from datetime import timedelta
+    from sqlalchemy import func
+
+    since_day = (datetime.utcnow() - timedelta(days=days)).date()
+    total = func.sum(DailyEventRollup.count)
+    in_window = DailyEventRollup.day >= since_day
+
+    total_events = db.session.query(total).filter(in_window).scalar()
+
+    events_by_type = db.session.query(
+        DailyEventRollup.event_type, total
+    ).filter(in_window).group_by(DailyEventRollup.event_type).all()
+
+    most_active_users = db.session.query(
+        DailyEventRollup.user_id, total
+    ).filter(
+        in_window,
+        DailyEventRollup.user_id != 0
+    ).group_by(DailyEventRollup.user_id).order_by(total.desc()).limit(10).all()
+
+    top_locations = db.session.query(
+        DailyEventRollup.destination, total
+    ).filter(
+        in_window,
+        DailyEventRollup.event_type == 'navigate',
+        DailyEventRollup.destination != ''
+    ).group_by(DailyEventRollup.destination).order_by(total.desc()).limit(10).all()
+
+    return _format_stats(total_events, events_by_type, most_active_users, top_locations)
+
+def _user_stats_from_logs(days):
+    """Statistics aggregated directly from user_logs (exact time window)"""
+    from datetime import timedelta
+    from sqlalchemy import func
+
+    since = datetime.utcnow() - timedelta(days=days)
+
+    # Total events
+    total_events = UserLog.query.filter(UserLog.timestamp >= since).count()
+
+    # Events by type
+    events_by_type = db.session.query(
+        UserLog.event_type,
+        func.count(UserLog.id).label('count')
+    ).filter(
+        UserLog.timestamp >= since
+    ).group_by(UserLog.event_type).all()
+
+    # Most active users
+    most_active_users = db.session.query(
+        UserLog.user_id,
+        func.count(UserLog.id).label('count')
+    ).filter(
+        UserLog.timestamp >= since,
+        UserLog.user_id.isnot(None)
+    ).group_by(UserLog.user_id).order_by(
+        func.count(UserLog.id).desc()
+    ).limit(10).all()
+
+    # Most navigated locations (JSON path extract + GROUP BY in the database)
+    destination = UserLog.event_data['destination'].as_string()
+    top_locations = db.session.query(
+        destination,
+        func.count(UserLog.id).label('count')
+    ).filter(
+        UserLog.event_type == 'navigate',
+        UserLog.timestamp >= since,
+        destination.isnot(None)
+    ).group_by(destination).order_by(
+        func.count(UserLog.id).desc()
+    ).limit(10).all()
+
+    return _format_stats(total_events, events_by_type, most_active_users, top_locations)
+
 def get_recent_activity(limit=50):
     """Get recent activity logs"""
     if not DB_AVAILABLE:
         return []
 
+    from sqlalchemy.orm import joinedload
+
     try:
-        logs = UserLog.query.order_by(
+        # to_dict() reads log.user: load the users in the same query
+        logs = UserLog.query.options(
+            joinedload(UserLog.user)
+        ).order_by(
             UserLog.timestamp.desc()
         ).limit(limit).all()
 
@@ -0,0 +1,196 @@
+"""
+Prometheus text exposition for /metrics
+Every gunicorn worker writes a snapshot of its own metrics to
+SHARED_STATE_DIR/metrics/<pid>.json (periodically and whenever it serves a
+scrape); /metrics merges the snapshots of all live workers, so a scrape
+reports the whole host whichever worker answers it.
+"""
+import json
+import os
+import tempfile
+import time
+
+from background import BackgroundWorker
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def process_rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MetricsSnapshot:
+    """
+    Metric families of one process
+
+    merge decides how workers are combined: 'sum' (counters, queue depths,
+    histograms), 'max' (host-wide values every worker reports the same) or
+    'worker' (kept per worker with a `worker` label, e.g. RSS).
+    """
+
+    def __init__(self):
+        self.families = {}
+
+    def _family(self, name, metric_type, help_text, merge):
+        return self.families.setdefault(name, {'type': metric_type, 'help': help_text,
+                                               'merge': merge, 'samples': []})
+
+    def counter(self, name, help_text, value, labels=None):
+        self._family(name, 'counter', help_text, 'sum')['samples'].append([labels or {}, value])
+
+    def gauge(self, name, help_text, value, labels=None, merge='sum'):
+        if value is None:
+            return
+        self._family(name, 'gauge', help_text, merge)['samples'].append([labels or {}, value])
+
+    def histogram(self, name, help_text, snapshot, labels=None):
+        """snapshot: instrumentation.Histogram.snapshot() (seconds)"""
+        self._family(name, 'histogram', help_text, 'sum')['samples'].append([labels or {}, snapshot])
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def merge_snapshots(snapshots):
+    """
+    Combine worker snapshots
+
+    Args:
+        snapshots: list of (pid, families) tuples
+
+    Returns:
+        families dict in the MetricsSnapshot layout
+    """
+    merged = {}
+    for pid, families in snapshots:
+        for name, family in families.items():
+            target = merged.setdefault(name, {'type': family['type'], 'help': family['help'],
+                                              'merge': family['merge'], 'samples': {}})
+            for labels, value in family['samples']:
+                if family['merge'] == 'worker':
+                    labels = dict(labels, worker=str(pid))
+                key = _label_key(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = (labels, value)
+                elif family['type'] == 'histogram':
+                    target['samples'][key] = (labels, {
+                        'buckets': [[le, a + b] for (le, a), (_, b) in zip(current[1]['buckets'], value['buckets'])],
+                        'sum': current[1]['sum'] + value['sum'],
+                        'count': current[1]['count'] + value['count'],
+                    })
+                elif family['merge'] == 'max':
+                    target['samples'][key] = (labels, max(current[1], value))
+                else:
+                    target['samples'][key] = (labels, current[1] + value)
+    return {name: dict(family, samples=list(family['samples'].values())) for name, family in merged.items()}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+def _number(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+def render(families):
+    """Prometheus text format (version 0.0.4)"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family['samples']:
+            if family['type'] == 'histogram':
+                for le, count in value['buckets']:
+                    le = le if le == '+Inf' else _number(float(le))
+                    lines.append(f"{name}_bucket{_labels(labels, {'le': le})} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(float(value['sum']))}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+class MetricsExporter(BackgroundWorker):
+    """
+    Writes this worker's snapshot every `interval` seconds and renders the
+    merged view of all workers
+
+    Args:
+        shared_dir: Directory shared by the workers of the host
+        collect: Function returning a MetricsSnapshot for this process
+        stale_seconds: Snapshots older than this are ignored (and removed)
+    """
+
+    def __init__(self, shared_dir, collect, interval=15, stale_seconds=60):
+        super().__init__('metrics-exporter')
+        self.directory = os.path.join(shared_dir, 'metrics')
+        self.collect = collect
+        self.interval = interval
+        self.stale_seconds = stale_seconds
+
+    def run(self):
+        while not self.wait(self.interval):
+            self.write()
+        self.remove()
+
+    def _path(self, pid=None):
+        return os.path.join(self.directory, f'{pid or os.getpid()}.json')
+
+    def write(self):
+        """Write this worker's snapshot (atomic replace)"""
+        try:
+            snapshot = self.collect()
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'written': time.time(), 'families': snapshot.families}, f)
+            os.replace(tmp, self._path())
+        except Exception as e:
+            print(f"❌ Error writing metrics snapshot: {e}")
+
+    def remove(self):
+        """Drop this worker's snapshot at shutdown"""
+        try:
+            os.remove(self._path())
+        except OSError:
+            pass
+
+    def snapshots(self):
+        """(pid, families) of every worker that wrote within stale_seconds"""
+        snapshots = []
+        cutoff = time.time() - self.stale_seconds
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)   # worker exited or was killed
+                    continue
+                with open(path, encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((payload['pid'], payload['families']))
+        return snapshots
+
+    def render(self):
+        """Text exposition of all live workers (this one freshly collected)"""
+        self.write()
+        snapshots = self.snapshots()
+        families = merge_snapshots(snapshots)
+        families['tol_workers'] = {'type': 'gauge', 'help': 'Workers reporting metrics',
+                                   'merge': 'max', 'samples': [({}, len(snapshots))]}
+        return render(families)
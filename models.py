@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from datetime import datetime, timedelta
 import pytz
+from passwords import hash_password
 
 db = SQLAlchemy()
 
@@ -25,7 +26,7 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Hash and store the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Check the hashed password."""
@@ -33,6 +34,10 @@ class User(UserMixin, db.Model):
 
 class PageView(db.Model):
     __tablename__ = "page_views"
+    __table_args__ = (
+        # Required by the INSERT ... ON CONFLICT (page_path) upsert
+        db.Index('uq_page_views_page_path', 'page_path', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     page_path = db.Column(db.String(255), nullable=False)
@@ -41,11 +46,48 @@ class PageView(db.Model):
 
 class ActivityLog(db.Model):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Per-user login count / last login (admin_stats)
+        db.Index('ix_activity_logs_user_action_ts', 'user_id', 'action', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    action = db.Column(db.String(100), nullable=False)  # 'login', 'logout', 'view_dashboard', 'filter_applied'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)  # NULL for anonymous events
+    action = db.Column(db.String(100), nullable=False, index=True)  # 'login', 'logout', 'view_dashboard', 'filter_applied'
     details = db.Column(db.Text)  # JSON string for additional details
     ip_address = db.Column(db.String(50))
     user_agent = db.Column(db.String(255))
-    timestamp = db.Column(db.DateTime, default=get_thailand_time)
+    timestamp = db.Column(db.DateTime, default=get_thailand_time, index=True)
+
+def get_user_login_stats():
+    """
+    Login count and last login for every user in a single query
+
+    Returns:
+        list of dicts (id, username, role, login_count, last_login)
+    """
+    login_stats = db.session.query(
+        ActivityLog.user_id.label('user_id'),
+        db.func.count().label('login_count'),
+        db.func.max(ActivityLog.timestamp).label('last_login')
+    ).filter(
+        ActivityLog.action == 'login'
+    ).group_by(ActivityLog.user_id).subquery()
+
+    rows = db.session.query(
+        User.id,
+        User.username,
+        User.role,
+        db.func.coalesce(login_stats.c.login_count, 0),
+        login_stats.c.last_login
+    ).outerjoin(
+        login_stats, login_stats.c.user_id == User.id
+    ).order_by(User.id).all()
+
+    return [{
+        'id': user_id,
+        'username': username,
+        'role': role,
+        'login_count': login_count,
+        'last_login': last_login
+    } for user_id, username, role, login_count, last_login in rows]
@@ -0,0 +1,117 @@
+"""
+In-memory page view counters
+Views are counted per process and flushed periodically with one atomic
+upsert, so concurrent requests never read-modify-write the same row.
+"""
+import threading
+
+from background import PeriodicTask
+from db_upsert import upsert_increment
+from models import get_thailand_time
+
+# Table reads counts() may need; views that call it budget for all of them
+COUNT_ATTEMPTS = 3
+
+class PageViewCounter:
+    """Per-process page view counters flushed by a background thread"""
+
+    def __init__(self, db, model, app=None, flush_interval=10):
+        self.db = db
+        self.model = model
+        self.app = app
+        self._pending = {}     # page_path -> [count, last_viewed]
+        self._in_flight = {}   # being written by flush()
+        self._generation = 0   # +1 when a flush starts writing and +1 when it ends (odd = writing)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task = PeriodicTask('page-view-flush', flush_interval, self.flush)
+
+    def increment(self, page_path):
+        """Count one view (no database access)"""
+        self._task.ensure_started()
+        now = get_thailand_time()
+        with self._lock:
+            entry = self._pending.setdefault(page_path, [0, now])
+            entry[0] += 1
+            entry[1] = now
+
+    def flush(self):
+        """Write pending counts with a single INSERT ... ON CONFLICT DO UPDATE"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._in_flight, self._pending = self._pending, {}
+                self._generation += 1
+                batch = dict(self._in_flight)
+
+            rows = [
+                {'page_path': path, 'view_count': count, 'last_viewed': last_viewed}
+                for path, (count, last_viewed) in batch.items()
+            ]
+            try:
+                with self.app.app_context():
+                    try:
+                        upsert_increment(self.db.session, self.model, rows,
+                                         key_columns=['page_path'],
+                                         increment_columns=['view_count'],
+                                         replace_columns=['last_viewed'])
+                        self.db.session.commit()
+                    except Exception:
+                        self.db.session.rollback()
+                        raise
+                    finally:
+                        self.db.session.remove()
+            except Exception as e:
+                print(f"Error flushing page views: {e}")
+                # Keep the counts for the next flush
+                with self._lock:
+                    for path, (count, last_viewed) in batch.items():
+                        entry = self._pending.setdefault(path, [0, last_viewed])
+                        entry[0] += count
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+                    self._generation += 1
+
+    def _snapshot(self):
+        """(flush generation, pending counts) read atomically"""
+        with self._lock:
+            merged = {path: tuple(entry) for path, entry in self._in_flight.items()}
+            for path, (count, last_viewed) in self._pending.items():
+                previous = merged.get(path, (0, None))
+                merged[path] = (previous[0] + count, last_viewed)
+            return self._generation, merged
+
+    def pending(self):
+        """Counts not yet written to the database: {page_path: (count, last_viewed)}"""
+        return self._snapshot()[1]
+
+    def counts(self, attempts=COUNT_ATTEMPTS):
+        """
+        Flushed plus pending counts, as a list of dicts
+
+        The table is read without blocking the flush thread. If a flush was
+        writing or committed meanwhile, its batch may be in both the table
+        and the snapshot, so the read is retried (the last attempt is used
+        as is).
+        """
+        for _ in range(attempts):
+            generation, pending = self._snapshot()
+            flushed = self.model.query.all()
+            with self._lock:
+                if generation % 2 == 0 and generation == self._generation:
+                    break
+
+        stats = {}
+        for pv in flushed:
+            stats[pv.page_path] = {
+                'page_path': pv.page_path,
+                'view_count': pv.view_count or 0,
+                'last_viewed': pv.last_viewed
+            }
+        for path, (count, last_viewed) in pending.items():
+            entry = stats.setdefault(path, {'page_path': path, 'view_count': 0, 'last_viewed': None})
+            entry['view_count'] += count
+            entry['last_viewed'] = last_viewed
+        return sorted(stats.values(), key=lambda pv: pv['page_path'])
@@ -0,0 +1,146 @@
+"""
+Password hashing helpers
+Hashing is deliberately slow, so it runs in worker processes: bulk work is
+spread over a process pool, and logins use a small bounded pool so a burst
+of logins cannot hold the GIL that the Dash callback threads need.
+Pool workers start from forkserver / spawn, not a fork of the app. They
+import this module (werkzeug, config and background only) and also re-run the
+parent's main script, which is cheap under gunicorn but loads the whole app
+when it is started directly with `python app_sales_v2.py`.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from background import process_context
+from config import Config
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool is saturated (too many pending tasks or a timeout)"""
+
+def hash_password(password, method=None):
+    """Hash one password with the configured method"""
+    return generate_password_hash(password, method=method or Config.PASSWORD_HASH_METHOD)
+
+def hash_parameters(password_hash):
+    """Method and cost part of a werkzeug hash ("scrypt:32768:8:1")"""
+    return password_hash.split('$', 1)[0]
+
+_configured_parameters = {}
+
+def configured_parameters(method=None):
+    """hash_parameters() of the configured method, with werkzeug's defaults filled in"""
+    method = method or Config.PASSWORD_HASH_METHOD
+    if method not in _configured_parameters:
+        _configured_parameters[method] = hash_parameters(generate_password_hash('', method=method))
+    return _configured_parameters[method]
+
+def verify_password(password_hash, password, method=None):
+    """
+    Check a password and rehash it when the stored parameters are outdated
+
+    Returns:
+        (ok, new_hash): new_hash is None unless the password matched and
+        the stored hash does not use the configured method / cost
+    """
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if hash_parameters(password_hash) == configured_parameters(method):
+        return True, None
+    return True, hash_password(password, method)
+
+def hash_passwords(passwords, workers=None, chunksize=16):
+    """
+    Hash many passwords on all cores
+
+    Args:
+        passwords: list of plain-text passwords
+        workers: Process count (defaults to os.cpu_count(); 1 hashes in-process)
+        chunksize: Passwords sent to a worker at a time
+
+    Returns:
+        list of hashes in the same order
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords)), mp_context=process_context()) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=chunksize))
+
+class PasswordPool:
+    """
+    Small process pool for login-time hashing with a queue-depth limit
+
+    At most `max_pending` tasks are queued or running; beyond that calls
+    fail fast with PasswordPoolBusy instead of queueing behind the burst.
+    A slot is freed when its task finishes (or is cancelled), not when the
+    caller gives up, so timed-out hashes still count against the limit.
+    The pool is created lazily in each process (gunicorn forks workers).
+    With inline=True hashing runs in the calling thread instead (for the
+    development server, whose pool workers would re-import the whole app).
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=10, inline=False):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.inline = inline
+        self._slots = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.completed = 0
+
+    def _executor(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if self.inline:
+            result = func(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+        pool = self._executor()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        slots = self._slots
+        try:
+            future = pool.submit(func, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()   # drops it if still queued; a running hash keeps its slot
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def verify(self, password_hash, password):
+        """verify_password() in a worker process; may raise PasswordPoolBusy"""
+        return self._run(verify_password, password_hash, password)
+
+    def hash(self, password):
+        """hash_password() in a worker process; may raise PasswordPoolBusy"""
+        return self._run(hash_password, password)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': 0 if self.inline else self.workers, 'max_pending': self.max_pending,
+                    'completed': self.completed, 'rejected': self.rejected}
@@ -0,0 +1,200 @@
+"""
+SQLAlchemy query profiler
+Engine events count the statements of every request, their total DB time
+and the statements repeated within one request (the N+1 signature).
+Statements slower than a threshold go to a slow-query log with literal and
+parameter values redacted. Routes and callbacks can declare a query budget;
+in strict mode exceeding it raises, so tests fail on new N+1 patterns.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more statements than its budget (strict mode only)"""
+
+def redact_statement(statement, max_length=2000):
+    """Statement text on one line with string literals replaced by '?'"""
+    statement = ' '.join(_STRING_LITERAL.sub("'?'", statement).split())
+    return statement[:max_length]
+
+def redact_parameters(parameters):
+    """Parameter types only - values never reach the log"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):   # executemany
+            return {'rows': len(parameters), 'first': redact_parameters(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return None
+
+def query_budget(max_queries):
+    """
+    Declare the statement budget of a Flask view
+
+    Put it below @login_required (functools.wraps copies the attribute).
+    """
+    def decorator(func):
+        func._query_budget = max_queries
+        return func
+    return decorator
+
+class QueryProfiler:
+    """
+    Per-request statement counts, duplicates, budgets and the slow-query log
+
+    Args:
+        slow_ms: Statements at least this slow are logged
+        slow_log_path: JSON-lines file for slow statements (None = print)
+        strict: Raise QueryBudgetExceeded instead of printing a warning
+        default_budget: Budget for requests without their own (None = unlimited)
+        duplicate_threshold: A statement run this many times in one request
+            counts as a duplicate (likely N+1)
+    """
+
+    def __init__(self, slow_ms=200, slow_log_path=None, strict=False, default_budget=None,
+                 duplicate_threshold=3, max_keys=500):
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self.strict = strict
+        self.default_budget = default_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.max_keys = max_keys
+        self.budgets = {}               # 'callback:<name>' -> max statements
+        self._requests = OrderedDict()  # request key -> aggregate
+        self._slow = deque(maxlen=50)
+        self._lock = threading.Lock()
+        if slow_log_path:
+            os.makedirs(os.path.dirname(slow_log_path), exist_ok=True)
+
+    def set_budget(self, key, max_queries):
+        """Budget for a request key such as 'callback:update_map'"""
+        self.budgets[key] = max_queries
+
+    def instrument(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_profile_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info['_profile_started'].pop()) * 1000
+            self._record(statement, parameters, elapsed_ms)
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            if context.connection is not None and context.connection.info.get('_profile_started'):
+                context.connection.info['_profile_started'].pop()
+
+    def init_app(self, server):
+        server.after_request(self._after_request)
+
+    def _record(self, statement, parameters, elapsed_ms):
+        in_request = has_request_context()
+        if in_request:
+            profile = g.get('_query_profile')
+            if profile is None:
+                profile = g._query_profile = {'count': 0, 'ms': 0.0, 'statements': Counter()}
+            profile['count'] += 1
+            profile['ms'] += elapsed_ms
+            profile['statements'][statement] += 1
+
+        if elapsed_ms >= self.slow_ms:
+            self._log_slow({
+                'timestamp': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+                'pid': os.getpid(),
+                'duration_ms': round(elapsed_ms, 1),
+                'request': self._request_key() if in_request else None,
+                'statement': redact_statement(statement),
+                'parameters': redact_parameters(parameters),
+            })
+
+    def _log_slow(self, entry):
+        with self._lock:
+            self._slow.append(entry)
+        if not self.slow_log_path:
+            print(f"🐢 Slow query {entry['duration_ms']} ms ({entry['request']}): {entry['statement'][:200]}")
+            return
+        try:
+            # One short line per write with O_APPEND, so workers do not interleave
+            with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"❌ Error writing slow query log: {e}")
+
+    def _request_key(self):
+        callback_name = g.get('_callback_name')
+        if callback_name is not None:
+            return f'callback:{callback_name}'
+        return f'route:{request.url_rule.rule if request.url_rule else "<unmatched>"}'
+
+    def _budget(self, key):
+        """@query_budget of the view, else set_budget() of the key, else the default"""
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        budget = getattr(view, '_query_budget', None)
+        if budget is None:
+            budget = self.budgets.get(key, self.default_budget)
+        return budget
+
+    def _after_request(self, response):
+        profile = g.get('_query_profile')
+        if profile is None:
+            return response
+
+        key = self._request_key()
+        duplicates = {statement: n for statement, n in profile['statements'].items()
+                      if n >= self.duplicate_threshold}
+        budget = self._budget(key)
+        over_budget = budget is not None and profile['count'] > budget
+
+        with self._lock:
+            entry = self._requests.get(key)
+            if entry is None:
+                entry = self._requests[key] = {'requests': 0, 'statements': 0, 'max_statements': 0,
+                                               'db_ms': 0.0, 'with_duplicates': 0, 'over_budget': 0,
+                                               'duplicates': {}}
+                while len(self._requests) > self.max_keys:
+                    self._requests.popitem(last=False)
+            entry['requests'] += 1
+            entry['statements'] += profile['count']
+            entry['max_statements'] = max(entry['max_statements'], profile['count'])
+            entry['db_ms'] += profile['ms']
+            entry['budget'] = budget
+            if duplicates:
+                entry['with_duplicates'] += 1
+                for statement, n in duplicates.items():
+                    text = redact_statement(statement, 300)
+                    entry['duplicates'][text] = max(entry['duplicates'].get(text, 0), n)
+            if over_budget:
+                entry['over_budget'] += 1
+
+        if over_budget:
+            message = (f"{key} ran {profile['count']} SQL statements (budget {budget})"
+                       + (f"; repeated: {max(duplicates.values())}x {redact_statement(max(duplicates, key=duplicates.get), 200)}"
+                          if duplicates else ''))
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            print(f"⚠️  Query budget exceeded: {message}")
+        return response
+
+    def report(self):
+        """Per request key aggregates (sorted by total statements) and recent slow statements"""
+        with self._lock:
+            requests = [
+                dict(entry, key=key,
+                     avg_statements=entry['statements'] / entry['requests'],
+                     duplicates=dict(sorted(entry['duplicates'].items(), key=lambda item: -item[1])[:5]))
+                for key, entry in self._requests.items()
+            ]
+            slow = list(self._slow)
+        requests.sort(key=lambda entry: entry['statements'], reverse=True)
+        return {'requests': requests, 'slow': slow, 'slow_ms': self.slow_ms, 'strict': self.strict}
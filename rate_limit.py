@@ -0,0 +1,185 @@
+"""
+Token-bucket login throttling
+Buckets live in process memory by default; the SQLite backend keeps them in
+a file in SHARED_STATE_DIR so all gunicorn workers of a host share them.
+Failed logins are counted in memory and written as periodic summary rows.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class MemoryBucketStore:
+    """Buckets for this process only (LRU-bounded)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        """Take one token; returns the tokens left (negative = denied)"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                left = tokens
+            else:
+                left = tokens - 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return left
+
+class SQLiteBucketStore:
+    """Buckets shared by every process on the host through one SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def consume(self, key, capacity, rate, now):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                left = tokens
+            else:
+                left = tokens - 1
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return left
+
+    def prune(self, older_than):
+        """Delete buckets idle since before older_than (they would be full again)"""
+        conn = self._connect()
+        conn.execute('DELETE FROM buckets WHERE updated < ?', (older_than,))
+
+class TokenBucketLimiter:
+    """`burst` attempts at once, refilled at `per_minute` attempts per minute"""
+
+    def __init__(self, store, burst, per_minute):
+        self.store = store
+        self.capacity = float(burst)
+        self.rate = per_minute / 60.0
+
+    def consume(self, key):
+        """
+        Take one token for key
+
+        Returns:
+            0 if allowed, otherwise the seconds until a token is available
+        """
+        left = self.store.consume(key, self.capacity, self.rate, time.time())
+        if left >= 0:
+            return 0
+        return -left / self.rate if self.rate else 60.0
+
+class LoginThrottle:
+    """Per-IP and per-username buckets checked before any DB or hash work"""
+
+    def __init__(self, store, ip_burst=20, ip_per_minute=10, user_burst=10, user_per_minute=5):
+        self.ip_limiter = TokenBucketLimiter(store, ip_burst, ip_per_minute)
+        self.user_limiter = TokenBucketLimiter(store, user_burst, user_per_minute)
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def check(self, ip, username):
+        """
+        Returns:
+            0 if the attempt may proceed, otherwise Retry-After seconds
+        """
+        retry_after = self.ip_limiter.consume(f'ip:{ip}')
+        if not retry_after and username:
+            retry_after = self.user_limiter.consume(f'user:{username.lower()}')
+        if retry_after:
+            with self._lock:
+                self.throttled += 1
+        return retry_after
+
+    def prune(self, idle_seconds=3600):
+        """Drop long-idle buckets from a shared store (the memory store is LRU-bounded)"""
+        store = self.ip_limiter.store
+        if hasattr(store, 'prune'):
+            store.prune(time.time() - idle_seconds)
+
+class FailedLoginAggregator:
+    """
+    Failed / throttled login attempts counted in memory
+
+    drain() returns one summary row (or None) for the period since the
+    previous drain, instead of one activity row per attempt.
+    """
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self._counts = {}   # (username, ip) -> [failed, throttled]
+        self._since = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, username, ip, throttled=False):
+        with self._lock:
+            key = (username, ip)
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                key = ('*', '*')   # fold the long tail of a distributed attack
+            entry = self._counts.setdefault(key, [0, 0])
+            entry[1 if throttled else 0] += 1
+
+    def drain(self):
+        """
+        Returns:
+            dict with window_start, window_end, failed, throttled and the
+            top attempts by (username, ip), or None if nothing happened
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            since, until = self._since, time.time()
+            self._since = until
+        if not counts:
+            return None
+        attempts = sorted(
+            ({'username': username, 'ip': ip, 'failed': failed, 'throttled': throttled}
+             for (username, ip), (failed, throttled) in counts.items()),
+            key=lambda a: a['failed'] + a['throttled'], reverse=True
+        )
+        return {
+            'window_start': since,
+            'window_end': until,
+            'failed': sum(a['failed'] for a in attempts),
+            'throttled': sum(a['throttled'] for a in attempts),
+            'attempts': attempts[:50],
+            'distinct': len(attempts),
+        }
+
+def create_store(backend, shared_dir):
+    """Bucket store for LOGIN_RATE_BACKEND ('memory' or 'sqlite')"""
+    if backend == 'sqlite':
+        return SQLiteBucketStore(os.path.join(shared_dir, 'login_rate_limit.sqlite3'))
+    return MemoryBucketStore()
@@ -0,0 +1,70 @@
+"""
+Request classification for the before_request access check
+Paths are classified once against patterns compiled at startup (and the
+result is memoized), so static assets skip the user lookup entirely and
+Dash AJAX requests only check authentication.
+"""
+import re
+from functools import lru_cache
+
+from flask import jsonify, redirect, request, session
+from flask_login import current_user
+
+OTHER = 'other'                      # not ours to guard (login, admin, api, ...)
+PUBLIC_STATIC = 'public_static'      # Flask /static/ files
+DASH_STATIC = 'dash_static'          # Dash assets / component suites / favicon
+DASH_AJAX = 'dash_ajax'              # _dash-update-component, _dash-layout, ...
+DASHBOARD_PAGE = 'dashboard_page'    # the dashboard HTML page itself
+DASHBOARD_OTHER = 'dashboard_other'  # anything else under the Dash prefix
+
+DASH_STATIC_PREFIXES = ('assets/', '_dash-component-suites/', '_favicon.ico')
+DASH_AJAX_ENDPOINTS = ('_dash-update-component', '_dash-layout', '_dash-dependencies', '_reload-hash')
+
+class RequestClassifier:
+    """Map a request path to one of the kinds above"""
+
+    def __init__(self, dash_prefix='/dashboard/', static_url_path='/static', cache_size=4096):
+        self.dash_prefix = dash_prefix
+        prefix = re.escape(dash_prefix)
+        self._patterns = [
+            (re.compile(re.escape(static_url_path.rstrip('/')) + '/'), PUBLIC_STATIC),
+            (re.compile(prefix + '(?:' + '|'.join(re.escape(p) for p in DASH_STATIC_PREFIXES) + ')'), DASH_STATIC),
+            (re.compile(prefix + '(?:' + '|'.join(re.escape(e) for e in DASH_AJAX_ENDPOINTS) + ')$'), DASH_AJAX),
+            (re.compile(prefix + '$'), DASHBOARD_PAGE),
+            (re.compile(re.escape(dash_prefix.rstrip('/')) + '(?:/|$)'), DASHBOARD_OTHER),
+        ]
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, path):
+        for pattern, kind in self._patterns:
+            if pattern.match(path):
+                return kind
+        return OTHER
+
+def make_dashboard_guard(classifier, on_page_view=None, login_url='/login'):
+    """
+    before_request hook restricting the dashboard to logged-in users
+
+    - static files: no user lookup (Dash assets only need a login session cookie)
+    - Dash AJAX: one authentication check, 401 instead of a redirect
+    - dashboard page: authentication check plus on_page_view(user)
+    """
+
+    def restrict_dashboard():
+        kind = classifier.classify(request.path)
+        if kind in (OTHER, PUBLIC_STATIC):
+            return None
+        if kind == DASH_STATIC:
+            # Flask-Login keeps the user id in the signed session cookie
+            if session.get('_user_id') is None:
+                return redirect(login_url)
+            return None
+        if not current_user.is_authenticated:
+            if kind == DASH_AJAX:
+                return jsonify({'error': 'authentication required'}), 401
+            return redirect(login_url)
+        if kind == DASHBOARD_PAGE and on_page_view is not None:
+            on_page_view(current_user)
+        return None
+
+    return restrict_dashboard
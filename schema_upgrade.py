@@ -0,0 +1,200 @@
+"""
+Idempotent schema upgrades for existing databases
+db.create_all() only creates missing tables; these steps bring tables that
+already exist up to date. Safe to run on every deploy (see init_db.py).
+"""
+from datetime import date, datetime
+
+from sqlalchemy import inspect, text
+
+from config import Config
+
+# Log tables: canonical indexes (name, columns), recreated after partitioning
+LOG_TABLE_INDEXES = {
+    'activity_logs': [
+        ('ix_activity_logs_timestamp', 'timestamp'),
+        ('ix_activity_logs_user_id', 'user_id'),
+        ('ix_activity_logs_action', 'action'),
+        ('ix_activity_logs_user_action_ts', 'user_id, action, timestamp'),
+    ],
+    'user_logs': [
+        ('ix_user_logs_timestamp', 'timestamp'),
+        ('ix_user_logs_event_type', 'event_type'),
+        ('ix_user_logs_user_id', 'user_id'),
+    ],
+}
+
+def _dialect(db):
+    return db.engine.dialect.name
+
+def _table_exists(db, table):
+    return inspect(db.engine).has_table(table)
+
+def upgrade_page_views_unique_path(db):
+    """Merge duplicate page_views rows and add the unique index on page_path"""
+    db.session.execute(text("""
+        UPDATE page_views
+        SET view_count = (
+                SELECT SUM(COALESCE(p2.view_count, 0)) FROM page_views p2
+                WHERE p2.page_path = page_views.page_path
+            ),
+            last_viewed = (
+                SELECT MAX(p2.last_viewed) FROM page_views p2
+                WHERE p2.page_path = page_views.page_path
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM page_views GROUP BY page_path HAVING COUNT(*) > 1
+        )
+    """))
+    db.session.execute(text("""
+        DELETE FROM page_views
+        WHERE id NOT IN (SELECT MIN(id) FROM page_views GROUP BY page_path)
+    """))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_page_views_page_path ON page_views (page_path)"
+    ))
+
+def upgrade_activity_logs_nullable_user(db):
+    """Allow activity_logs.user_id to be NULL (anonymous events such as failed logins)"""
+    if not _table_exists(db, 'activity_logs'):
+        return
+    user_id = next(c for c in inspect(db.engine).get_columns('activity_logs') if c['name'] == 'user_id')
+    if user_id['nullable']:
+        return
+
+    if _dialect(db) != 'sqlite':
+        db.session.execute(text("ALTER TABLE activity_logs ALTER COLUMN user_id DROP NOT NULL"))
+        return
+
+    # SQLite cannot alter a column: rebuild the table from the model
+    from models import ActivityLog
+
+    columns = ', '.join(c.name for c in ActivityLog.__table__.columns)
+    for name, _ in LOG_TABLE_INDEXES['activity_logs']:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.execute(text("ALTER TABLE activity_logs RENAME TO activity_logs_legacy"))
+    ActivityLog.__table__.create(bind=db.session.connection())
+    db.session.execute(text(
+        f"INSERT INTO activity_logs ({columns}) SELECT {columns} FROM activity_logs_legacy"
+    ))
+    db.session.execute(text("DROP TABLE activity_logs_legacy"))
+
+def upgrade_log_indexes(db):
+    """Indexes on timestamp / user_id / action (+ per-user login composite) of the log tables"""
+    for table, indexes in LOG_TABLE_INDEXES.items():
+        if not _table_exists(db, table):
+            continue
+        for name, columns in indexes:
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def is_partitioned(db, table):
+    """True if table is a PostgreSQL partitioned (parent) table"""
+    if _dialect(db) != 'postgresql':
+        return False
+    return bool(db.session.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table
+    """), {'table': table}).scalar())
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+def create_month_partition(db, table, month):
+    """CREATE TABLE ... PARTITION OF for one calendar month (idempotent)"""
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+    ))
+
+def ensure_log_partitions(db, months_ahead=None):
+    """Create monthly partitions from the current month up to months_ahead"""
+    months_ahead = Config.LOG_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    for table in LOG_TABLE_INDEXES:
+        if not is_partitioned(db, table):
+            continue
+        month = _month_start(datetime.utcnow())
+        for _ in range(months_ahead + 1):
+            create_month_partition(db, table, month)
+            month = _next_month(month)
+
+def partition_log_table(db, table):
+    """
+    Convert a log table to a monthly RANGE (timestamp) partitioned table
+
+    Runs in one transaction: the existing table is renamed, a partitioned
+    copy is created with partitions covering every month that has rows
+    (plus a DEFAULT partition), rows are copied and the old table dropped.
+    The id sequence is kept, so ids continue where they left off.
+    """
+    legacy = f"{table}_legacy"
+    columns = [col['name'] for col in inspect(db.engine).get_columns(table)]
+    column_list = ', '.join(columns)
+    select_list = ', '.join(
+        'COALESCE(timestamp, now())' if col == 'timestamp' else col for col in columns
+    )
+
+    db.session.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    sequence = db.session.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': legacy}
+    ).scalar()
+
+    db.session.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+    ))
+    db.session.execute(text(f"ALTER TABLE {table} ALTER COLUMN timestamp SET NOT NULL"))
+    db.session.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, timestamp)"))
+    db.session.execute(text(
+        f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES users (id)"
+    ))
+
+    first = db.session.execute(text(f"SELECT MIN(timestamp) FROM {legacy}")).scalar()
+    month = _month_start(first or datetime.utcnow())
+    last = _month_start(datetime.utcnow())
+    while month <= last:
+        create_month_partition(db, table, month)
+        month = _next_month(month)
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+    db.session.execute(text(f"INSERT INTO {table} ({column_list}) SELECT {select_list} FROM {legacy}"))
+    if sequence:
+        db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    db.session.execute(text(f"DROP TABLE {legacy}"))
+
+    # Indexes on the parent are created on every partition
+    for name, index_columns in LOG_TABLE_INDEXES[table]:
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({index_columns})"))
+
+def upgrade_partition_log_tables(db):
+    """Monthly range partitioning of the log tables (PostgreSQL only)"""
+    if _dialect(db) != 'postgresql' or not Config.LOG_PARTITIONING:
+        return
+    for table in LOG_TABLE_INDEXES:
+        if _table_exists(db, table) and not is_partitioned(db, table):
+            print(f"Partitioning {table} by month...")
+            partition_log_table(db, table)
+    ensure_log_partitions(db)
+
+UPGRADE_STEPS = [
+    upgrade_page_views_unique_path,
+    upgrade_activity_logs_nullable_user,
+    upgrade_log_indexes,
+    upgrade_partition_log_tables,
+]
+
+def upgrade_schema(db):
+    """Run all upgrade steps (each step is idempotent)"""
+    for step in UPGRADE_STEPS:
+        print(f"Running schema upgrade: {step.__name__}")
+        try:
+            step(db)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,119 @@
+"""
+Active session heartbeats for the online-user counter
+Requests only update an in-memory last-activity map; a background thread
+persists each session at most once per persist interval, sweeps expired
+sessions and refreshes a cached online count.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from background import PeriodicTask
+from db_upsert import upsert
+
+class SessionTracker:
+    """Per-process sliding window of session activity backed by active_sessions"""
+
+    def __init__(self, db, model, app=None, persist_interval=60, session_timeout_minutes=30,
+                 online_window_minutes=5, refresh_interval=5, sweep_interval=60):
+        self.db = db
+        self.model = model
+        self.app = app
+        self.persist_interval = timedelta(seconds=persist_interval)
+        self.session_timeout = timedelta(minutes=session_timeout_minutes)
+        self.online_window = timedelta(minutes=online_window_minutes)
+        self.sweep_interval = timedelta(seconds=sweep_interval)
+
+        self._last_seen = {}        # session_id -> (user_id, last_activity)
+        self._last_persisted = {}   # session_id -> last_activity written
+        self._online_count = None
+        self._last_sweep = None
+        self._lock = threading.Lock()
+        self._task = PeriodicTask('session-tracker', refresh_interval, self.tick)
+
+    def init_app(self, app):
+        """Bind the Flask app used for the background thread's app context"""
+        self.app = app
+
+    def touch(self, user_id, session_id):
+        """Record activity for a session (no database access)"""
+        self._task.ensure_started()
+        with self._lock:
+            self._last_seen[session_id] = (user_id, datetime.utcnow())
+
+    def forget(self, session_id):
+        """Stop tracking a session (on logout); the caller deletes the row"""
+        with self._lock:
+            self._last_seen.pop(session_id, None)
+            self._last_persisted.pop(session_id, None)
+
+    def online_count(self):
+        """Sessions active within the online window (cached, refreshed in the background)"""
+        self._task.ensure_started()   # workers that only serve admin pages refresh too
+        if self._online_count is None:
+            self._refresh_count()
+        return self._online_count or 0
+
+    def tick(self):
+        """Persist due heartbeats, sweep expired sessions and refresh the count"""
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                self.persist()
+                now = datetime.utcnow()
+                if self._last_sweep is None or now - self._last_sweep >= self.sweep_interval:
+                    self.sweep()
+                    self._last_sweep = now
+                self._refresh_count()
+            finally:
+                self.db.session.remove()
+
+    def _due(self):
+        """Sessions whose activity has not been written for persist_interval"""
+        with self._lock:
+            return [
+                {'session_id': sid, 'user_id': user_id, 'last_activity': seen}
+                for sid, (user_id, seen) in self._last_seen.items()
+                if sid not in self._last_persisted
+                or seen - self._last_persisted[sid] >= self.persist_interval
+            ]
+
+    def persist(self):
+        """Upsert due sessions in one statement"""
+        rows = self._due()
+        if not rows:
+            return
+        try:
+            upsert(self.db.session, self.model, rows,
+                   key_columns=['session_id'],
+                   replace_columns=['user_id', 'last_activity'])
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"❌ Error persisting session activity: {e}")
+            return
+        with self._lock:
+            for row in rows:
+                self._last_persisted[row['session_id']] = row['last_activity']
+
+    def sweep(self):
+        """Delete sessions idle longer than the session timeout"""
+        cutoff = datetime.utcnow() - self.session_timeout
+        with self._lock:
+            for sid in [sid for sid, (_, seen) in self._last_seen.items() if seen < cutoff]:
+                self._last_seen.pop(sid, None)
+                self._last_persisted.pop(sid, None)
+        try:
+            self.model.query.filter(self.model.last_activity < cutoff).delete()
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"❌ Error sweeping sessions: {e}")
+
+    def _refresh_count(self):
+        since = datetime.utcnow() - self.online_window
+        try:
+            self._online_count = self.model.query.filter(self.model.last_activity >= since).count()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"❌ Error counting online users: {e}")
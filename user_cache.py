@@ -0,0 +1,113 @@
+"""
+TTL cache for the Flask-Login user_loader
+Authenticated requests (including every Dash callback) load the current
+user; this keeps a small per-process cache of user records and a shared
+version stamp file so every worker drops its cache when a user changes.
+"""
+import os
+import threading
+import time
+
+from flask_login import UserMixin
+
+class CachedUser(UserMixin):
+    """Lightweight, session-independent copy of the fields requests need"""
+
+    def __init__(self, id, username, role, active=True):
+        self.id = id
+        self.username = username
+        self.role = role
+        self._active = active
+
+    @property
+    def is_active(self):
+        return self._active
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+class UserCache:
+    """
+    Per-process TTL cache of CachedUser records keyed by user id
+
+    invalidate() drops the entry locally and bumps the mtime of a version
+    file in `shared_dir`; other workers compare that mtime on each lookup (one
+    stat call) and clear their cache when it changed. A record loaded while
+    an invalidation happened is returned but not stored, so a demoted or
+    deleted user is never cached for another TTL.
+    """
+
+    def __init__(self, loader, ttl=60, max_entries=10000, shared_dir=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_path = os.path.join(shared_dir, 'user_cache.version') if shared_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}   # user_id -> (expires_at, CachedUser or None)
+        self._version = self._read_version()
+        self._generation = 0  # bumped by invalidate() in this process
+        self._lock = threading.Lock()
+
+    def _read_version(self):
+        if self.version_path is None:
+            return None
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _bump_version(self):
+        if self.version_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.version_path), exist_ok=True)
+            with open(self.version_path, 'a'):
+                pass
+            now = time.time_ns()
+            os.utime(self.version_path, ns=(now, now))
+        except OSError as e:
+            print(f"❌ Error updating user cache version: {e}")
+
+    def get(self, user_id):
+        """CachedUser for user_id (None if the user does not exist)"""
+        user_id = int(user_id)
+        now = time.monotonic()
+        version = self._read_version()
+
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        user = self.loader(user_id)
+        with self._lock:
+            if self._generation != generation or self._version != version:
+                return user   # invalidated while loading: the record may be stale
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (now + self.ttl, user)
+        return user
+
+    def invalidate(self, user_id=None):
+        """Drop one user (or everyone) here and signal the other workers"""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(user_id), None)
+        # This worker also sees the new stamp on its next lookup and clears
+        self._bump_version()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'maxsize': self.max_entries, 'ttl': self.ttl}
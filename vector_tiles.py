@@ -0,0 +1,367 @@
+"""
+Mapbox Vector Tiles (MVT) of the target points
+Points are indexed by their Morton (Z-order) code at INDEX_ZOOM, so every
+tile at zoom <= INDEX_ZOOM is one contiguous slice of the sorted index.
+Tiles are encoded lazily (small hand-written protobuf encoder, MVT spec v2),
+kept in an LRU per dataset version and written to an on-disk store.
+Tiles of a filtered map only contain the rows matching the filter state.
+"""
+import math
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from background import BackgroundWorker
+from filter_engine import apply_filters, filter_state_id, is_filtered
+
+LAYER_NAME = 'targets'
+EXTENT = 4096
+INDEX_ZOOM = 16
+MAX_ZOOM = 22
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+# (attribute name, dataset column, numeric?)
+TILE_ATTRIBUTES = [
+    ('potential_score', 'Potential Score', True),
+    ('port_use', 'Port Use', True),
+    ('port_available', 'Port Available', True),
+    ('port_utilize', '%Port_Utilize', True),
+    ('net_add', 'Net Add', True),
+    ('market_share_true', 'Market Share True (%)', True),
+    ('province', 'Province', False),
+    ('district', 'District', False),
+    ('subdistrict', 'Sub-district', False),
+    ('happy_block', 'Happy Block', False),
+]
+
+# --- protobuf encoding ---------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+def _uint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+def _value(value):
+    """MVT Value message (string or double)"""
+    if isinstance(value, str):
+        return _bytes_field(1, value.encode('utf-8'))
+    return _key(3, 1) + struct.pack('<d', float(value))
+
+def encode_points_layer(name, points, attributes, extent=EXTENT):
+    """
+    Encode one MVT layer of point features
+
+    Args:
+        points: list of (x, y) tile coordinates in [0, extent)
+        attributes: list of dicts (attribute name -> str / number / None)
+
+    Returns:
+        bytes of a Tile message with a single layer
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    features = []
+
+    for feature_id, ((x, y), attrs) in enumerate(zip(points, attributes), start=1):
+        tags = []
+        for attr, value in attrs.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if attr not in key_index:
+                key_index[attr] = len(keys)
+                keys.append(attr)
+            value_key = (type(value) is str, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend((key_index[attr], value_index[value_key]))
+
+        geometry = [(1 & 0x7) | (1 << 3), _zigzag(int(x)), _zigzag(int(y))]  # MoveTo(1)
+        features.append(_bytes_field(2, (
+            _uint_field(1, feature_id)
+            + _packed_field(2, tags)
+            + _uint_field(3, 1)  # POINT
+            + _packed_field(4, geometry)
+        )))
+
+    layer = (
+        _uint_field(15, 2)
+        + _bytes_field(1, name.encode('utf-8'))
+        + b''.join(features)
+        + b''.join(_bytes_field(3, k.encode('utf-8')) for k in keys)
+        + b''.join(_bytes_field(4, _value(v)) for v in values)
+        + _uint_field(5, extent)
+    )
+    return _bytes_field(3, layer)
+
+# --- spatial index -------------------------------------------------------
+
+def _part1by1(v):
+    """Spread the low 16 bits of v to the even bit positions"""
+    v = v & 0x0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+def morton(x, y):
+    """Z-order code of cell (x, y) (ints or numpy arrays, 16 bits each)"""
+    return _part1by1(x) | (_part1by1(y) << 1)
+
+def lonlat_to_world(lon, lat):
+    """Web Mercator coordinates in [0, 1) (numpy arrays)"""
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    wx = (lon + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    wy = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return np.clip(wx, 0, 1 - 1e-12), np.clip(wy, 0, 1 - 1e-12)
+
+def tile_for_lonlat(lon, lat, z):
+    wx, wy = lonlat_to_world(np.array([lon]), np.array([lat]))
+    n = 2 ** z
+    return int(wx[0] * n), int(wy[0] * n)
+
+class PointIndex:
+    """Target points sorted by Morton code at INDEX_ZOOM"""
+
+    def __init__(self, data, max_features=5000):
+        self.max_features = max_features
+        valid = data['Latitude'].notna() & data['Longitude'].notna()
+        data = data[valid]
+        wx, wy = lonlat_to_world(data['Longitude'].to_numpy(float), data['Latitude'].to_numpy(float))
+        n = 2 ** INDEX_ZOOM
+        codes = morton((wx * n).astype(np.int64), (wy * n).astype(np.int64))
+
+        order = np.argsort(codes, kind='stable')
+        self.codes = codes[order]
+        self.wx = wx[order]
+        self.wy = wy[order]
+        self.score = data['Potential Score'].to_numpy(float)[order]
+        self.labels = data.index.to_numpy()[order]
+        self.columns = {
+            attr: (data[col].to_numpy()[order] if col in data.columns else None, numeric)
+            for attr, col, numeric in TILE_ATTRIBUTES
+        }
+
+    def __len__(self):
+        return len(self.codes)
+
+    def rows_in_tile(self, z, x, y):
+        """Positions of the points inside tile z/x/y"""
+        if z <= INDEX_ZOOM:
+            shift = 2 * (INDEX_ZOOM - z)
+            start = morton(x, y) << shift
+            lo, hi = np.searchsorted(self.codes, [start, start + (1 << shift)])
+            return np.arange(lo, hi)
+
+        # Deeper than the index: slice the ancestor cell, then test the bounds
+        shift = z - INDEX_ZOOM
+        rows = self.rows_in_tile(INDEX_ZOOM, x >> shift, y >> shift)
+        n = 2 ** z
+        inside = ((self.wx[rows] * n).astype(np.int64) == x) & ((self.wy[rows] * n).astype(np.int64) == y)
+        return rows[inside]
+
+    def mask_for(self, labels):
+        """Boolean mask over the indexed points whose dataset row label is in labels"""
+        return np.isin(self.labels, np.asarray(labels))
+
+    def encode_tile(self, z, x, y, mask=None):
+        """MVT bytes for tile z/x/y (highest scores first when thinned), only rows in mask if given"""
+        rows = self.rows_in_tile(z, x, y)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        if len(rows) > self.max_features:
+            keep = np.argpartition(-self.score[rows], self.max_features)[:self.max_features]
+            rows = rows[keep]
+
+        n = 2 ** z
+        px = np.clip(((self.wx[rows] * n - x) * EXTENT).astype(np.int64), 0, EXTENT - 1)
+        py = np.clip(((self.wy[rows] * n - y) * EXTENT).astype(np.int64), 0, EXTENT - 1)
+
+        # Geometry is delta-encoded per feature from (0, 0), so absolute coords here
+        attributes = []
+        for i in rows:
+            attrs = {}
+            for attr, (values, numeric) in self.columns.items():
+                if values is None:
+                    continue
+                value = values[i]
+                if numeric:
+                    attrs[attr] = float(value) if value == value and value is not None else None
+                else:
+                    attrs[attr] = str(value) if value == value and value is not None else None
+            attributes.append(attrs)
+        return encode_points_layer(LAYER_NAME, list(zip(px.tolist(), py.tolist())), attributes)
+
+# --- cache ---------------------------------------------------------------
+
+class TileCache:
+    """
+    Lazily generated tiles for one dataset snapshot
+
+    Tiles are kept in an in-memory LRU and written to
+    `cache_dir/<version>/<z>/<x>/<y>.mvt`, which all workers share.
+    Tiles of a filter state are kept in memory only (no per-filter files),
+    with the point mask of the last `max_filters` filter states.
+    """
+
+    def __init__(self, cache_dir, maxsize=512, max_features=5000, max_filters=8):
+        self.cache_dir = cache_dir
+        self.maxsize = maxsize
+        self.max_features = max_features
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._index = None
+        self._version = None
+        self.max_filters = max_filters
+        self._entries = OrderedDict()
+        self._masks = OrderedDict()   # (version, filter id) -> point mask
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+    def _index_for(self, dataset):
+        with self._index_lock:
+            if self._version != dataset.version:
+                self._index = PointIndex(dataset.data, self.max_features)
+                self._version = dataset.version
+                with self._lock:
+                    self._entries.clear()
+                    self._masks.clear()
+                self._prune(dataset.version)
+            return self._index
+
+    def _prune(self, current_version):
+        """Remove tile directories of older dataset versions"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name != current_version:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def path(self, version, z, x, y):
+        return os.path.join(self.cache_dir, version, str(z), str(x), f"{y}.mvt")
+
+    def _mask_for(self, dataset, index, state):
+        key = (dataset.version, filter_state_id(state))
+        with self._lock:
+            if key in self._masks:
+                self._masks.move_to_end(key)
+                return self._masks[key]
+        mask = index.mask_for(apply_filters(dataset.data, state).index)
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > self.max_filters:
+                self._masks.popitem(last=False)
+        return mask
+
+    def get(self, dataset, z, x, y, state=None):
+        """MVT bytes for tile z/x/y of the dataset (rows matching filter state only, if given)"""
+        filtered = is_filtered(state)
+        key = (dataset.version, filter_state_id(state), z, x, y)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if filtered:
+            index = self._index_for(dataset)
+            tile = index.encode_tile(z, x, y, self._mask_for(dataset, index, state))
+            with self._lock:
+                self.misses += 1
+        else:
+            path = self.path(dataset.version, z, x, y)
+            try:
+                with open(path, 'rb') as f:
+                    tile = f.read()
+                with self._lock:
+                    self.disk_hits += 1
+            except OSError:
+                tile = self._index_for(dataset).encode_tile(z, x, y)
+                self._write(path, tile)
+                with self._lock:
+                    self.misses += 1
+
+        with self._lock:
+            self._entries[key] = tile
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return tile
+
+    def _write(self, path, tile):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(tile)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"❌ Error writing tile cache {path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+def tiles_in_bounds(bounds, max_zoom, min_zoom=0):
+    """(z, x, y) of every tile covering bounds (west, south, east, north)"""
+    west, south, east, north = bounds
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0 = tile_for_lonlat(west, north, z)
+        x1, y1 = tile_for_lonlat(east, south, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+class TilePrewarmer(BackgroundWorker):
+    """Generate the low-zoom tiles of a region once, in the background"""
+
+    def __init__(self, cache, dataset, bounds, max_zoom):
+        super().__init__('tile-prewarm')
+        self.cache = cache
+        self.dataset = dataset
+        self.bounds = bounds
+        self.max_zoom = max_zoom
+        self.done = False
+
+    def run(self):
+        try:
+            for z, x, y in tiles_in_bounds(self.bounds, self.max_zoom):
+                if self.stopping():
+                    return
+                self.cache.get(self.dataset, z, x, y)
+        except Exception as e:
+            print(f"❌ Tile prewarm failed: {e}")
+        self.done = True
+
+    def ensure_started(self):
+        if not self.done:
+            super().ensure_started()